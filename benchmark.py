@@ -0,0 +1,266 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+import synthetic_data
+import data_processing
+import filter_data
+import identify_jumps
+import jump_index
+import imu_codec
+
+'''
+Times the hot paths of the processing pipeline on synthetic sessions of increasing length and saves the results as
+JSON. Per-chunk times that grow with the session length show work that scales with everything recorded so far,
+rather than with the newly arrived data. The startup benchmarks time creating the pipeline of a processed session and
+importing the modules the server needs in a new interpreter.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks')
+READINGS_PER_FILE = synthetic_data.READINGS_PER_FILE
+SESSION_DURATIONS = [60, 300, 900]  # Seconds of the generated sessions
+REPEAT = 3  # Times each benchmark is run, the fastest run is reported
+REGRESSION_THRESHOLD = 1.2  # Ratio to an earlier run above which a benchmark is reported as a regression
+STARTUP_MODULES = ['data_processing', 'server']  # Modules whose import time is measured in a new interpreter
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Hides the progress messages of the processing steps while they are timed.
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def best_time(function, repeat=REPEAT, setup=None):
+    """
+    Runs a function several times and returns the fastest run.
+
+    Args:
+        function (callable): The function to time, called without arguments.
+        repeat (int): Number of runs.
+        setup (callable): Called before every run, not included in the time.
+
+    Returns:
+        tuple: (seconds of the fastest run, return value of the last run)
+    """
+
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with quiet():
+            start_time = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+def make_result(name, duration, file_count, seconds, **extra):
+    """
+    Builds the result entry of one benchmark.
+
+    Args:
+        name (str): Name of the benchmark.
+        duration (float): Length of the session in seconds.
+        file_count (int): Number of files in the session.
+        seconds (float): Time taken for the whole session.
+        **extra: Additional values to record, such as the number of detected jumps.
+
+    Returns:
+        dict: The result.
+    """
+
+    return dict(name=name, session_seconds=duration, files=file_count, seconds=seconds,
+                ms_per_file=seconds / file_count * 1000, files_per_second=file_count / seconds, **extra)
+
+def clear_directory(directory):
+    """
+    Removes a directory and creates it again empty.
+    """
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+def benchmark_session(duration, work_dir, repeat=REPEAT, seed=0):
+    """
+    Generates a session and times every stage of the pipeline on it.
+
+    Args:
+        duration (float): Length of the session in seconds.
+        work_dir (str): Empty directory for the files of the session.
+        repeat (int): Number of runs of each benchmark.
+        seed (int): Seed of the synthetic data.
+
+    Returns:
+        list: The result of every benchmark, see make_result.
+    """
+
+    data, truth = synthetic_data.generate_session(duration, seed=seed)
+    data_dir = os.path.join(work_dir, 'raw_data')
+    processed_dir = os.path.join(work_dir, 'processed_data')
+    jumps_dir = os.path.join(work_dir, 'jumps')
+    file_count = synthetic_data.write_session(data, data_dir)
+    files = [os.path.join(data_dir, f'{n}.bin') for n in range(file_count)]
+    results = []
+
+    seconds, _ = best_time(lambda: [data_processing.read_file(f) for f in files], repeat)
+    results.append(make_result('read_file', duration, file_count, seconds))
+
+    def filter_files():
+        stream_filter = filter_data.StreamingFilter()
+        return [filter_data.read_and_process_file(f, stream_filter) for f in files]
+    seconds, filtered = best_time(filter_files, repeat)
+    results.append(make_result('read_and_process_file', duration, file_count, seconds))
+
+    x_accel = imu_codec.scale_channel(imu_codec.channel_view(np.concatenate(filtered), 0, 'accel', 'x'), 'accel')
+    seconds, detected = best_time(lambda: identify_jumps.detect_jumps(x_accel, 0), repeat)
+    results.append(make_result('detect_jumps', duration, file_count, seconds, detected_jumps=len(detected)))
+
+    processed = np.concatenate(filtered)
+    seconds, (_, _, valid) = best_time(lambda: identify_jumps.detect_jumps_batch(processed), repeat)
+    results.append(make_result('detect_jumps_batch', duration, file_count, seconds,
+                               valid_jumps=int(np.count_nonzero(valid)), expected_jumps=len(truth)))
+
+    # Processed files for detection from disk, the same ones the pipeline writes
+    os.makedirs(processed_dir, exist_ok=True)
+    for file_number, chunk in enumerate(filtered):
+        chunk.tofile(os.path.join(processed_dir, f'{file_number}.bin'))
+
+    def detect_files():
+        identify_jumps.detectors.pop(processed_dir, None)
+        return sum(len(identify_jumps.process_files_and_detect_jumps(n, processed_dir)) for n in range(file_count))
+    seconds, saved = best_time(detect_files, repeat, setup=lambda: clear_directory(jumps_dir))
+    results.append(make_result('process_files_and_detect_jumps', duration, file_count, seconds,
+                               valid_jumps=saved, expected_jumps=len(truth)))
+
+    # End to end, all files are already there
+    def reset_outputs():
+        data_processing.wait_for_writes()  # The last files of the previous run may still be queued
+        clear_directory(processed_dir)
+        clear_directory(jumps_dir)
+    for offline in (False, True):
+        seconds, _ = best_time(lambda: data_processing.Pipeline(data_dir, processed_dir).process_files(offline), repeat,
+                               setup=reset_outputs)
+        results.append(make_result('process_files_offline' if offline else 'process_files', duration, file_count,
+                                   seconds, valid_jumps=len(jump_index.list_jumps(jumps_dir)),
+                                   expected_jumps=len(truth)))
+
+    # End to end as the files arrive one at a time, like the live data
+    def process_live():
+        pipeline = data_processing.Pipeline(data_dir, processed_dir)
+        for file_number in range(file_count):
+            chunk = data[file_number * READINGS_PER_FILE:(file_number + 1) * READINGS_PER_FILE]
+            chunk.tofile(os.path.join(data_dir, f'{file_number}.bin'))
+            pipeline.process_files()
+    seconds, _ = best_time(process_live, repeat, setup=lambda: (clear_directory(data_dir), reset_outputs()))
+    results.append(make_result('process_files_live', duration, file_count, seconds,
+                               valid_jumps=len(jump_index.list_jumps(jumps_dir)), expected_jumps=len(truth)))
+
+    # Picking up a processed session, like the server restarting in the middle of a recording
+    seconds, _ = best_time(lambda: data_processing.Pipeline(data_dir, processed_dir), repeat)
+    results.append(make_result('pipeline_startup', duration, file_count, seconds))
+    return results
+
+def benchmark_imports(modules=STARTUP_MODULES, repeat=REPEAT):
+    """
+    Times importing modules in a new interpreter, which is what starting the server or the GUI waits for.
+
+    Args:
+        modules (list): Names of the modules to import.
+        repeat (int): Number of runs of each import.
+
+    Returns:
+        list: The result of every import, see make_result. The time includes starting the interpreter.
+    """
+
+    results = []
+    for module in modules:
+        def cold_import():
+            subprocess.run([sys.executable, '-c', f'import {module}'], cwd=BASE_DIR or None, check=True,
+                           stdout=subprocess.DEVNULL)
+        seconds, _ = best_time(cold_import, repeat)
+        results.append(make_result(f'import_{module}', 0, 1, seconds))
+    return results
+
+def run_benchmarks(durations=SESSION_DURATIONS, repeat=REPEAT):
+    """
+    Runs the benchmarks on a session of every duration.
+
+    Args:
+        durations (list): Lengths of the sessions in seconds.
+        repeat (int): Number of runs of each benchmark.
+
+    Returns:
+        dict: The results together with a description of the machine they were measured on.
+    """
+
+    results = []
+    for duration in durations:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for result in benchmark_session(duration, work_dir, repeat):
+                print(f"{result['name']:32} {duration:6.0f}s session: {result['ms_per_file']:8.3f} ms/file, "
+                      f"{result['files_per_second']:10.1f} files/s")
+                results.append(result)
+    for result in benchmark_imports(repeat=repeat):
+        print(f"{result['name']:32} {'':6} cold start: {result['seconds'] * 1000:8.1f} ms")
+        results.append(result)
+    return dict(created=time.strftime('%Y-%m-%dT%H:%M:%S'), python=platform.python_version(),
+                numpy=np.__version__, machine=platform.machine(), processor=platform.processor(),
+                cpu_count=os.cpu_count(), sampling_rate=synthetic_data.SAMPLING_RATE, repeat=repeat, results=results)
+
+def compare_results(results, previous):
+    """
+    Prints how the per-file time of every benchmark changed since an earlier run.
+
+    Args:
+        results (dict): Results of this run, see run_benchmarks.
+        previous (dict): Results of the earlier run.
+
+    Returns:
+        int: The number of regressions.
+    """
+
+    earlier = {(r['name'], r['session_seconds']): r for r in previous['results']}
+    regressions = 0
+    for result in results['results']:
+        before = earlier.get((result['name'], result['session_seconds']))
+        if before is None:
+            continue
+        ratio = result['ms_per_file'] / before['ms_per_file']
+        regressed = ratio > REGRESSION_THRESHOLD
+        regressions += regressed
+        print(f"{result['name']:32} {result['session_seconds']:6.0f}s session: {ratio:6.2f}x"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline on synthetic sessions.")
+    parser.add_argument('--durations', type=float, nargs='+', default=SESSION_DURATIONS,
+                        help="lengths of the sessions in seconds")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs of each benchmark, the fastest is reported")
+    parser.add_argument('--output', help="JSON file for the results, defaults to a new file in benchmarks/")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.durations, args.repeat)
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f))
+        sys.exit(1 if regressions else 0)
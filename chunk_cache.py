@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from data_processing import read_file
+from recording_store import chunk_signature
+
+# Constants
+CACHE_SIZE = 64 * 1024 * 1024  # Maximum number of bytes of decoded data kept in memory
+
+class ChunkCache:
+    """
+    Least recently used cache of decoded and scaled chunks. An entry is only used while the size and modification
+    time of its file are unchanged, so a refresh only decodes chunks that are new or have changed.
+    """
+
+    def __init__(self, max_bytes=CACHE_SIZE):
+        """
+        Args:
+            max_bytes (int): Memory limit for the cached data in bytes.
+        """
+
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # file path -> (signature, data), least recently used first
+        self.size = 0
+
+    def get(self, file_path):
+        """
+        Returns the scaled data of a chunk, decoding it only if it is not cached or its file has changed.
+
+        Args:
+            file_path (str): Path of the chunk.
+
+        Returns:
+            ndarray or None: Scaled data array, or None if the file is empty or not found.
+        """
+
+        signature = chunk_signature(file_path)
+        entry = self.entries.get(file_path)
+        if entry is not None:
+            if entry[0] == signature:
+                self.entries.move_to_end(file_path)
+                return entry[1]
+            self.remove(file_path)
+        if signature is None:
+            return None
+
+        data = read_file(file_path)
+        if data is not None:
+            self.entries[file_path] = (signature, data)
+            self.size += data.nbytes
+            # Evict the least recently used chunks, but always keep the one that was just read
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                self.remove(next(iter(self.entries)))
+        return data
+
+    def remove(self, file_path):
+        """
+        Removes a chunk from the cache.
+
+        Args:
+            file_path (str): Path of the chunk.
+        """
+
+        _, data = self.entries.pop(file_path)
+        self.size -= data.nbytes
+
+    def clear(self):
+        """
+        Removes every chunk from the cache.
+        """
+
+        self.entries.clear()
+        self.size = 0
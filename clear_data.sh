@@ -22,3 +22,6 @@ for dir in ${directories[@]}; do
     clear_directory $dir
 done
 
+# The overviews of the cleared data are rebuilt by the GUI
+rm -rf raw_data.overview processed_data.overview
+
@@ -1,13 +1,24 @@
 import os
-import sys
+import io
+import re
 import glob
+import time
+import queue
+import argparse
+import threading
+import contextlib
 import numpy as np
-from filter_data import filter_file
-from identify_jumps import process_files_and_detect_jumps  # Import the function
+from filter_data import filter_file, filter_recording, to_int16, StreamingFilter
+from identify_jumps import JumpDetector
+import jump_index
+import metrics
+import imu_codec
+from live_stream import encode_samples
+from recording_store import read_chunk, list_chunks, chunk_number, chunk_signature, store_paths
+from recording_archive import archive_path
+from reorder_buffer import ReorderBuffer
 
 # Constants
-ACCEL_SCALE = 16  # +/- 16 g
-GYRO_SCALE = 2000  # +/- 2000 deg/second
 READINGS_PER_FILE = 100
 SENSOR_COUNT = 5
 BASE_DIR = os.path.dirname(__file__)
@@ -15,27 +26,133 @@ DATA_NAME = 'raw_data'
 PROCESSED_NAME = 'processed_data'
 DATA_DIR = os.path.join(BASE_DIR, 'data/live', DATA_NAME)
 PROCESSED_DIR = os.path.join(BASE_DIR, 'data/live', PROCESSED_NAME)
+GAPS_NAME = 'gaps.txt'  # Numbers of the files of a processed data directory that were filled in, one per line
+CHECKPOINT_NAME = 'last_processed.txt'  # Number of the last processed file of a processed data directory
 PLOT_WINDOW = 10  # Number of files to display in the plot
+SESSIONS_DIR = os.path.join(BASE_DIR, 'data/sessions')  # Data of the sessions other than the default one
+DEFAULT_SESSION = 'live'  # Session of uploads without a session id, stored in data/live
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')  # Session ids are used as directory names
 
-def get_last_processed_file():
+def get_last_processed_file(processed_dir=PROCESSED_DIR):
     """
-    Determines the highest file index that has been processed in the PROCESSED_DIR.
+    Determines the highest file index that has been processed in a processed data directory. The checkpoint of the
+    directory is used if it still matches the processed files, so the directory does not have to be listed.
+
+    Args:
+        processed_dir (str): The processed data directory, defaults to the live one.
 
     Returns:
         int: The index of the last processed file, or -1 if no files have been processed.
     """
 
-    processed_files = glob.glob(os.path.join(PROCESSED_DIR, '*.bin'))
+    checkpoint = read_checkpoint(processed_dir)
+    if checkpoint is not None:
+        return checkpoint
+
+    processed_files = list_chunks(processed_dir)
     if not processed_files:
         return -1
-    file_numbers = [int(os.path.splitext(os.path.basename(f))[0]) for f in processed_files]
-    return max(file_numbers)
+    return chunk_number(processed_files[-1])
+
+def read_checkpoint(processed_dir):
+    """
+    Reads the checkpoint of a processed data directory. The checkpoint is only trusted if the file it names exists and
+    the file after it does not, which takes two lookups no matter how many files there are.
+
+    Args:
+        processed_dir (str): The processed data directory.
+
+    Returns:
+        int or None: The number of the last processed file, or None if there is no checkpoint or it is out of date.
+    """
+
+    try:
+        with open(os.path.join(processed_dir, CHECKPOINT_NAME)) as f:
+            last_processed_file = int(f.read())
+    except (OSError, ValueError):
+        return None
+    if (chunk_signature(os.path.join(processed_dir, f"{last_processed_file}.bin")) is None
+            or chunk_signature(os.path.join(processed_dir, f"{last_processed_file + 1}.bin")) is not None):
+        return None
+    return last_processed_file
 
-last_processed_file = get_last_processed_file()  # Initialize last processed file number
+def write_checkpoint(processed_dir, file_number):
+    """
+    Queues the checkpoint of a processed data directory to be written. It is written by the background disk writer
+    after the processed files queued before it, so it never names a file that is not on disk yet. Checkpoints are
+    only written when processing pauses, at the end of Pipeline.process_files and Pipeline.flush, not for every file.
+
+    Args:
+        processed_dir (str): The processed data directory.
+        file_number (int): The number of the last processed file.
+    """
+
+    write_async(os.path.join(processed_dir, CHECKPOINT_NAME), f"{file_number}\n".encode())
+
+# Files waiting to be written by the background disk writer, written in the order they were queued
+write_queue = queue.Queue()
+metrics.gauge('write_queue_depth', 'Files waiting for the background disk writer.', lambda: write_queue.qsize())
+
+chunks_processed = metrics.counter('chunks_processed_total', 'Files run through the filter and jump detection.')
+bytes_processed = metrics.counter('bytes_processed_total', 'Raw bytes run through the filter and jump detection.')
+chunks_missing = metrics.counter('chunks_missing_total', 'Files that did not arrive in time and were filled in.')
+chunks_late = metrics.counter('chunks_late_total', 'Uploaded files dropped because their place was already filled.')
+
+def disk_writer():
+    """
+    Writes queued files to disk in the background, so persisting data does not hold up processing.
+    """
+
+    while True:
+        file_path, data = write_queue.get()
+        try:
+            with metrics.timed('write'), open(file_path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error writing {file_path}: {e}")
+        finally:
+            write_queue.task_done()
+
+writer_thread = None
+writer_pid = None  # Process the writer was started in
+writer_lock = threading.Lock()
+
+def write_async(file_path, data):
+    """
+    Queues data to be written to a file by the background disk writer.
+
+    Args:
+        file_path (str): Path of the file to write.
+        data (bytes or ndarray): The data to write. Arrays are written without copying, so they must not be
+            modified afterwards.
+    """
+
+    global write_queue, writer_thread, writer_pid
+
+    # Started on first use, so worker processes forked for batch processing start their own writer. Only one writer
+    # may run, otherwise files could be written out of order, so the check is locked against other threads
+    if writer_pid != os.getpid():
+        with writer_lock:
+            if writer_pid != os.getpid():
+                if writer_pid is not None:
+                    # Forked from a process whose writer was running, its queue is left to that writer
+                    write_queue = queue.Queue()
+                writer_thread = threading.Thread(target=disk_writer, daemon=True)
+                writer_thread.start()
+                writer_pid = os.getpid()
+    write_queue.put((file_path, data))
+
+def wait_for_writes():
+    """
+    Blocks until every write queued with write_async has finished.
+    """
+
+    write_queue.join()
 
 def read_file(file_path):
     """
     Reads and scales data from a binary file according to pre-defined accelerometer and gyroscope scales.
+    The file can also be a chunk of a recording that is stored in a single file (see recording_store.py).
 
     Args:
         file_path (str): Path to the binary file containing raw sensor data.
@@ -46,66 +163,531 @@ def read_file(file_path):
 
     # Scale the data and return that array
     if file_path:
-        data = np.fromfile(file_path, dtype=np.int16)
+        data = read_chunk(file_path)
+        if data is None:
+            print(f"Warning: {file_path} does not exist.")
+            return None
         if data.size == 0:
             print(f"Warning: {file_path} is empty.")
             return None
-        data = data.reshape((-1, SENSOR_COUNT * 6))
-        scale_vector = np.tile(np.hstack([ACCEL_SCALE]*3 + [GYRO_SCALE]*3), SENSOR_COUNT)
-        scaled_data = (data / 32768.0) * scale_vector
-        return scaled_data
+        return scale_data(data)
+
+def scale_data(data):
+    """
+    Scales raw sensor readings according to pre-defined accelerometer and gyroscope scales, see imu_codec.py.
+
+    Args:
+        data (ndarray): The int16 readings.
 
-def process_files():
+    Returns:
+        ndarray: Scaled float32 data array of shape (samples, channels).
     """
-    Processes all unprocessed binary data files from the raw data directory by scaling and filtering them,
-    and then detects jumps from the processed data.
 
-    Uses a global variable `last_processed_file` to keep track of the last processed file index.
+    return imu_codec.scale(imu_codec.as_samples(data))
+
+class Pipeline:
     """
+    Processing state of one recording: the directories it reads and writes, the last processed file, and the
+    streaming filter and jump detector that carry state from one file to the next.
+    """
+
+    def __init__(self, data_dir, processed_dir):
+        """
+        Args:
+            data_dir (str): Directory containing the raw data files.
+            processed_dir (str): Directory the processed files are written to. Jumps are saved to the 'jumps'
+                directory next to it.
+        """
+
+        self.data_dir = data_dir
+        self.processed_dir = processed_dir
+        self.last_processed_file = get_last_processed_file(processed_dir)
+        self.reorder_buffer = ReorderBuffer(self.last_processed_file + 1)  # Puts uploads back in order
+        self.last_reading = None  # Last raw reading of the stream, repeated to fill in missing files
+        self.stream_filter = StreamingFilter()
+        self.detector = JumpDetector(os.path.join(os.path.dirname(processed_dir), 'jumps'), on_jump=self.handle_jump)
+        self.publish = None  # Called with (event, data) for every processed file, saved jump and classification
+        self.classifier = classifier  # Worker that classifies the saved jumps, see jump_classifier.py
+        self.unqueued = {}  # Raw bytes of the uploads that were saved without being queued, by file number
+        self.last_upload_time = time.perf_counter()  # Time of the last received upload, see close_pipeline
+
+    def handle_jump(self, jump, jump_data):
+        """
+        Publishes a saved jump to the live stream and passes it on to the jump classifier.
+
+        Args:
+            jump (dict): The jump index row of the jump.
+            jump_data (ndarray): The saved data of the jump.
+        """
+
+        if self.publish is not None:
+            self.publish('jump', jump)
+        if self.classifier is not None:
+            self.classifier.submit(self.detector.jumps_dir, jump, jump_data, self.publish_classification)
+
+    def publish_classification(self, jump, jump_type, confidence):
+        """
+        Publishes the predicted type of a saved jump to the live stream.
+
+        Args:
+            jump (dict): The jump index row of the jump.
+            jump_type (str): The predicted type.
+            confidence (float): Probability of the predicted type.
+        """
+
+        if self.publish is not None:
+            self.publish('classification', dict(jump_id=jump['jump_id'], file_name=jump['file_name'],
+                                                jump_type=jump_type, confidence=confidence))
+
+    def process_files(self, offline=False):
+        """
+        Processes all unprocessed binary data files from the raw data directory by scaling and filtering them,
+        and then detects jumps from the processed data.
+
+        Args:
+            offline (bool): If True the recording is complete, so the whole recording is filtered at once with a
+                zero-phase filter. Otherwise new files are run through the streaming filter as they arrive.
+        """
+
+        # Find all files in the directory matching the pattern XX.bin, or in its store or archive
+        files = list_chunks(self.data_dir)
+        if not files:
+            print("No files found.")
+            return
+
+        # Find the highest file number that has been recorded
+        file_numbers = [chunk_number(f) for f in files]
+        max_file_number = file_numbers[-1]
+
+        if offline and max_file_number > self.last_processed_file:
+            # Zero-phase filtering depends on the samples after each file, so the whole recording is refiltered
+            with metrics.timed('filter_recording'):
+                filter_recording(self.data_dir, self.processed_dir)
+
+        # Process files from the last processed file to the highest file number
+        first_file_number = self.last_processed_file + 1
+        present = set(file_numbers)
+        for file_number in range(self.last_processed_file + 1, max_file_number + 1):
+            if not offline and file_number not in present:
+                # A missing file may still arrive, it is only filled in once a later file is older than the latency
+                # bound. Until then processing stops here and continues on a later call
+                next_number = min(n for n in present if n > file_number)
+                next_path = os.path.join(self.data_dir, f"{next_number}.bin")
+                waited = time.time() - os.path.getmtime(next_path) if os.path.exists(next_path) else None
+                if waited is not None and waited < self.reorder_buffer.latency:
+                    break
+                previous = read_chunk(os.path.join(self.data_dir, f"{file_number - 1}.bin"))
+                if previous is not None and previous.size:
+                    reading = imu_codec.as_samples(previous)[-1]
+                elif self.last_reading is not None:
+                    reading = self.last_reading  # The file before was filled in as well
+                else:
+                    reading = imu_codec.as_samples(read_chunk(next_path))[0]
+                self.process_gap(file_number, reading)
+                continue
+            with metrics.trace_chunk(file_number):
+                self.process_file(file_number, offline)
+        if self.last_processed_file >= first_file_number:
+            write_checkpoint(self.processed_dir, self.last_processed_file)
+
+    def process_file(self, file_number, offline=False):
+        """
+        Processes a single file of the raw data directory, see process_files.
+
+        Args:
+            file_number (int): The number of the file.
+            offline (bool): If True the file was already filtered by filter_recording and is only read back.
+        """
+
+        print(f'Processing file {file_number}')
+        if offline:
+            with metrics.timed('read'):
+                filtered_data = read_chunk(os.path.join(self.processed_dir, f"{file_number}.bin"))
+        else:
+            if file_number == 0:
+                self.stream_filter.reset()  # A new recording has started
+            filtered_data = filter_file(file_number, self.data_dir, self.processed_dir, self.stream_filter)
+        self.last_processed_file = file_number
+        if filtered_data is None or filtered_data.size == 0:
+            return
+        chunks_processed.inc()
+        bytes_processed.inc(filtered_data.nbytes)
+
+        # Pass the processed data on to the jump detector, which keeps the recent files in memory
+        print(f'Processing file {file_number} for jumps')
+        self.detector.add_file(file_number, filtered_data)
+
+    def receive_chunk(self, file_number, raw_bytes, now=None):
+        """
+        Receives an uploaded file, which can arrive out of order. The raw file is written right away, but it is only
+        processed once the files before it have been processed, see reorder_buffer.py.
+
+        Args:
+            file_number (int): The number of the file.
+            raw_bytes (bytes): The raw binary data of the file.
+            now (float): Arrival time, defaults to time.perf_counter().
+
+        Returns:
+            list: The numbers of the files that were processed, including missing files that were filled in.
+        """
+
+        self.last_upload_time = time.perf_counter()
+        write_async(os.path.join(self.data_dir, f"{file_number}.bin"), raw_bytes)
+        if self.reorder_buffer.is_late(file_number):
+            chunks_late.inc()
+            print(f"Warning: file {file_number} arrived too late and is not processed.")
+        return self.process_released(self.reorder_buffer.add(file_number, raw_bytes, now))
+
+    def save_unqueued(self, file_number, raw_bytes):
+        """
+        Saves an upload the server was too busy to queue. It is not processed now, but if the reorder buffer gives up
+        waiting for it, it is processed instead of being filled in.
+
+        Args:
+            file_number (int): The number of the file.
+            raw_bytes (bytes): The raw binary data of the file.
+        """
+
+        self.last_upload_time = time.perf_counter()
+        write_async(os.path.join(self.data_dir, f"{file_number}.bin"), raw_bytes)
+        self.unqueued[file_number] = raw_bytes
+
+    def expire(self, now=None):
+        """
+        Fills in the missing files that were waited for longer than the latency bound and processes the files after
+        them. Called regularly, so a lost upload does not hold up the files after it when no more uploads arrive.
+
+        Args:
+            now (float): Current time, defaults to time.perf_counter().
+
+        Returns:
+            list: The numbers of the files that were processed.
+        """
+
+        if not len(self.reorder_buffer):
+            return []
+        return self.process_released(self.reorder_buffer.expire(now))
+
+    def flush(self):
+        """
+        Processes every received file without waiting any longer for the missing ones, e.g. on shutdown.
+
+        Returns:
+            list: The numbers of the files that were processed.
+        """
+
+        processed = self.process_released(self.reorder_buffer.flush())
+        if self.last_processed_file >= 0:
+            write_checkpoint(self.processed_dir, self.last_processed_file)
+        return processed
+
+    def process_released(self, released):
+        """
+        Processes the files released by the reorder buffer.
+
+        Args:
+            released (list): (number, raw bytes) of the files in order, the raw bytes are None for a missing file.
+
+        Returns:
+            list: The numbers of the files.
+        """
+
+        for i, (file_number, raw_bytes) in enumerate(released):
+            saved_bytes = self.unqueued.pop(file_number, None)
+            if raw_bytes is None and saved_bytes is not None:
+                print(f"File {file_number} was saved while the server was busy, processing it now.")
+                raw_bytes = saved_bytes
+            if raw_bytes is not None:
+                self.process_chunk(file_number, raw_bytes, save_raw=False)
+                continue
+            reading = self.last_reading
+            if reading is None:
+                # Nothing was received before the gap, so the first reading after it is held instead
+                reading = next(imu_codec.as_samples(data)[0] for _, data in released[i:] if data is not None)
+            self.process_gap(file_number, reading)
+        return [file_number for file_number, _ in released]
+
+    def process_gap(self, file_number, reading):
+        """
+        Fills in a file that did not arrive by holding a reading for the length of a file. The filled in file is
+        processed like any other, so the sample numbering, filter state and jump detection carry on across the gap.
+        The file number is appended to the gaps file of the processed data directory and published as a 'gap' event.
+
+        Args:
+            file_number (int): The number of the missing file.
+            reading (ndarray): The raw reading to hold, usually the last one before the gap.
 
-    global last_processed_file
+        Returns:
+            ndarray: The processed data of the filled in file.
+        """
 
-    # Find all files in the directory matching the pattern XX.bin
-    files = glob.glob(os.path.join(DATA_DIR, '*.bin'))
-    if not files:
-        print("No files found.")
-        return
+        print(f"Warning: file {file_number} did not arrive, filling it in with the last reading.")
+        chunks_missing.inc()
+        with open(os.path.join(self.processed_dir, GAPS_NAME), 'a') as f:
+            f.write(f"{file_number}\n")
+        if self.publish is not None:
+            self.publish('gap', dict(file_number=file_number, first_sample=file_number * READINGS_PER_FILE,
+                                     samples=READINGS_PER_FILE))
+        self.last_reading = reading
+        data = np.repeat(imu_codec.as_samples(reading)[-1:], READINGS_PER_FILE, axis=0)
+        return self.filter_chunk(file_number, data)
 
-    # Find the highest file number that has been recorded
-    file_numbers = [int(os.path.splitext(os.path.basename(f))[0]) for f in files]
-    max_file_number = max(file_numbers)
+    def process_chunk(self, file_number, raw_bytes, save_raw=True):
+        """
+        Processes a file that is already in memory, such as an upload. The data is filtered and passed to jump
+        detection without touching the disk, the raw and processed files are written by the background disk writer.
+        Files must be passed in order, see receive_chunk for uploads that can arrive out of order.
+
+        Args:
+            file_number (int): The number of the file.
+            raw_bytes (bytes): The raw binary data of the file.
+            save_raw (bool): If False the raw file was already written.
+
+        Returns:
+            ndarray or None: The processed data, or None if the file is empty.
+        """
+
+        if save_raw:
+            write_async(os.path.join(self.data_dir, f"{file_number}.bin"), raw_bytes)
+        data = imu_codec.as_samples(raw_bytes)
+        if data.size == 0:
+            print(f"Warning: file {file_number} is empty.")
+            return None
 
-    # Process files from the last processed file to the highest file number
-    for file_number in range(last_processed_file + 1, max_file_number + 1):
         print(f'Processing file {file_number}')
-        filter_file(file_number, DATA_DIR, PROCESSED_DIR)
-        last_processed_file = file_number
+        self.last_reading = data[-1].copy()
+        chunks_processed.inc()
+        bytes_processed.inc(len(raw_bytes))
+        return self.filter_chunk(file_number, data)
+
+    def filter_chunk(self, file_number, data):
+        """
+        Filters the raw readings of a file, writes and publishes the processed data and passes it to jump detection.
+
+        Args:
+            file_number (int): The number of the file.
+            data (ndarray): The int16 raw readings.
+
+        Returns:
+            ndarray: The processed data.
+        """
+
+        if file_number != self.last_processed_file + 1:
+            self.stream_filter.reset()  # A new recording has started, or the stream was interrupted
+        with metrics.timed('filter'):
+            filtered_data = to_int16(self.stream_filter.process(data))
+        write_async(os.path.join(self.processed_dir, f"{file_number}.bin"), filtered_data)
+        self.last_processed_file = file_number
+        if self.publish is not None:
+            with metrics.timed('publish'):
+                self.publish('samples', encode_samples(file_number, file_number * READINGS_PER_FILE, filtered_data))
+
+        self.detector.add_file(file_number, filtered_data)
+        return filtered_data
+
+# Jump classifier of new pipelines, see set_classifier
+classifier = None
 
-        # Call identify_jumps on processed files. Do not call on file 0-2 as identify jumps requires three files before it
-        if file_number > 2:
-            process_files_and_detect_jumps(file_number, PROCESSED_DIR)
+# Pipelines of the sessions currently being recorded, by session id. Each session has its own directories, filter
+# and jump detector, so several devices can upload at once without affecting each other. The pipeline of the live
+# data is created on first use like the others, so importing this module does not look at the data directories
+pipelines = {}
+pipelines_lock = threading.Lock()
+
+def is_valid_session(session_id):
+    """
+    Checks if a session id can be used, it becomes the name of the directory of the session.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        bool: True if the id only contains letters, digits, '-' and '_'.
+    """
+
+    return SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+def session_directory(session_id):
+    """
+    Returns the directory holding the raw data, processed data and jumps of a session.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        str: data/live for the default session, data/sessions/<session_id> for all others.
+    """
+
+    if session_id == DEFAULT_SESSION:
+        return os.path.dirname(DATA_DIR)
+    return os.path.join(SESSIONS_DIR, session_id)
+
+def get_pipeline(session_id=DEFAULT_SESSION):
+    """
+    Returns the pipeline of a session, creating it and its directories for the first upload of the session.
+
+    Args:
+        session_id (str): The session id, see is_valid_session.
+
+    Returns:
+        Pipeline: The pipeline of the session.
+    """
+
+    with pipelines_lock:
+        pipeline = pipelines.get(session_id)
+        if pipeline is None:
+            directory = session_directory(session_id)
+            for name in (DATA_NAME, PROCESSED_NAME, 'jumps'):
+                os.makedirs(os.path.join(directory, name), exist_ok=True)
+            pipeline = Pipeline(os.path.join(directory, DATA_NAME), os.path.join(directory, PROCESSED_NAME))
+            pipelines[session_id] = pipeline
+        return pipeline
+
+def close_pipeline(session_id):
+    """
+    Processes the files a session is still waiting on and removes its pipeline, e.g. when the session stopped
+    uploading. The next upload of the session creates a new pipeline that continues from the last processed file.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        Pipeline or None: The removed pipeline, or None if the session has no pipeline.
+    """
+
+    with pipelines_lock:
+        pipeline = pipelines.pop(session_id, None)
+    if pipeline is not None:
+        pipeline.flush()
+    return pipeline
+
+def set_classifier(jump_classifier):
+    """
+    Classifies the jumps of every session with a jump classifier from now on.
+
+    Args:
+        jump_classifier (ClassificationWorker or None): The classifier, see jump_classifier.start_classifier.
+    """
+
+    global classifier
+
+    with pipelines_lock:
+        classifier = jump_classifier
+        for pipeline in pipelines.values():
+            pipeline.classifier = jump_classifier
+
+def process_files(offline=False):
+    """
+    Processes all unprocessed files of the live data, see Pipeline.process_files.
+    """
+
+    get_pipeline(DEFAULT_SESSION).process_files(offline)
+
+def process_chunk(file_number, raw_bytes, session_id=DEFAULT_SESSION):
+    """
+    Processes an uploaded file of a session, see Pipeline.process_chunk. Files of the same session must be processed
+    one at a time and in order, files of different sessions can be processed in parallel.
+    """
+
+    return get_pipeline(session_id).process_chunk(file_number, raw_bytes)
+
+def receive_chunk(file_number, raw_bytes, session_id=DEFAULT_SESSION):
+    """
+    Receives an uploaded file of a session that can arrive out of order, see Pipeline.receive_chunk. Files of the same
+    session must be received one at a time, files of different sessions can be received in parallel.
+    """
+
+    return get_pipeline(session_id).receive_chunk(file_number, raw_bytes)
+
+def reprocess_recording(recording, fresh=False, verbose=False):
+    """
+    Processes a saved recording offline. Everything the recording needs is created here, so recordings can be
+    processed in parallel worker processes.
+
+    Args:
+        recording (str): The recording directory, e.g. data/recordings/recording_N.
+        fresh (bool): If True the processed data and jumps of the recording are deleted and recreated from the raw data.
+        verbose (bool): If True the messages of the processing steps are printed.
+
+    Returns:
+        tuple: (recording, number of processed files, number of saved jumps, seconds taken)
+    """
+
+    start_time = time.perf_counter()
+    processed_dir = os.path.join(recording, PROCESSED_NAME)
+    jumps_dir = os.path.join(recording, 'jumps')
+    if fresh:
+        stored_files = [path for path in store_paths(processed_dir) + (archive_path(processed_dir),)
+                        if os.path.exists(path)]
+        for file_path in glob.glob(os.path.join(processed_dir, '*.bin')) + glob.glob(os.path.join(jumps_dir, 'jump_*.bin')):
+            os.remove(file_path)
+        for file_path in stored_files:
+            os.remove(file_path)  # The processed data is recreated as separate files
+        if jump_index.has_index(jumps_dir):
+            os.remove(jump_index.index_path(jumps_dir))
+    os.makedirs(processed_dir, exist_ok=True)
+    os.makedirs(jumps_dir, exist_ok=True)
+
+    jump_count = len(glob.glob(os.path.join(jumps_dir, 'jump_*.bin')))
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        pipeline = Pipeline(os.path.join(recording, DATA_NAME), processed_dir)
+        first_file = pipeline.last_processed_file + 1
+        pipeline.process_files(offline=True)
+    file_count = pipeline.last_processed_file + 1 - first_file
+    jump_count = len(glob.glob(os.path.join(jumps_dir, 'jump_*.bin'))) - jump_count
+    return recording, file_count, jump_count, time.perf_counter() - start_time
+
+def reprocess_all(jobs=None, fresh=False, verbose=False):
+    """
+    Processes every saved recording, spread over a pool of worker processes. Each recording is handled by a single
+    worker, so the processed data and jump numbering are the same as when processing them one after another.
+
+    Args:
+        jobs (int): Number of worker processes, defaults to the number of cores. 1 processes the recordings in this
+            process.
+        fresh (bool): If True every recording is processed from scratch, see reprocess_recording.
+        verbose (bool): If True the messages of the processing steps are printed.
+    """
+
+    recordings = sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+    start_time = time.perf_counter()
+    if jobs == 1:
+        results = (reprocess_recording(recording, fresh, verbose) for recording in recordings)
+        for recording, file_count, jump_count, seconds in results:
+            print(f"{os.path.basename(recording)}: {file_count} files, {jump_count} jumps in {seconds:.2f}s")
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(reprocess_recording, recordings, [fresh] * len(recordings), [verbose] * len(recordings))
+            for recording, file_count, jump_count, seconds in results:
+                print(f"{os.path.basename(recording)}: {file_count} files, {jump_count} jumps in {seconds:.2f}s")
+    print(f"Processed {len(recordings)} recordings in {time.perf_counter() - start_time:.2f}s")
 
 def get_data_files(data_dir):
     """
-    Retrieves a list of all data files in the specified directory, sorted by modification time.
+    Retrieves a list of all data files in the specified directory, sorted by file number. Recordings stored in a
+    single file are listed by the paths their files had before they were stored.
 
     Args:
         data_dir (str): The directory to search for data files.
 
     Returns:
-        list: A list of file paths, sorted by the time they were last modified.
+        list: A list of file paths, sorted in the order they were recorded.
     """
 
-    return sorted(glob.glob(os.path.join(data_dir, '*.bin')), key=os.path.getmtime)
+    return list_chunks(data_dir)
 
 if __name__ == '__main__':
-    if len(sys.argv) > 1 and sys.argv[1] == 'all':
-        recordings = glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*'))
-        for recording in recordings:
-            DATA_DIR = os.path.join(recording, DATA_NAME)
-            PROCESSED_DIR = os.path.join(recording, PROCESSED_NAME)
-            last_processed_file = get_last_processed_file()  # Update last processed file number based on current directory
-            process_files()
+    parser = argparse.ArgumentParser(description="Process the live data, or every saved recording with 'all'.")
+    parser.add_argument('mode', nargs='?', choices=['all'], help="process all recordings in data/recordings")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes for 'all', defaults to the core count")
+    parser.add_argument('--fresh', action='store_true', help="recreate processed data and jumps of every recording")
+    parser.add_argument('--verbose', action='store_true', help="print the messages of every processing step")
+    args = parser.parse_args()
+
+    if args.mode == 'all':
+        reprocess_all(args.jobs, args.fresh, args.verbose)
     else:
         process_files()
-
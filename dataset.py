@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import numpy as np
+import imu_codec
+import jump_index
+
+try:
+    import torch
+    from torch.utils.data import Dataset, DataLoader
+except ImportError:
+    torch = None  # The arrays can still be loaded, only make_data_loader needs torch
+
+'''
+Training data for the AI models. The labeled jumps are read once into a single float32 array, scaled to g and deg/s,
+and cached as .npy files next to a manifest of the source files. Later loads memory-map the cache instead of reading
+every jump file again, and the cache is rebuilt as soon as a jump file is added, removed or changed.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+LABELED_DIR = os.path.join(BASE_DIR, 'data/labeled_data')
+CACHE_DIR = os.path.join(BASE_DIR, 'data/cache')
+JUMP_TYPES = jump_index.JUMP_TYPES  # Label of a jump is its index in this list, shared with the classifiers
+JUMP_LENGTH = 150
+CHANNELS = imu_codec.CHANNELS
+
+def list_source_files(labeled_dir=LABELED_DIR, jump_types=JUMP_TYPES):
+    """
+    Lists the jump files of a labeled data directory with their label and file stats.
+
+    Args:
+        labeled_dir (str): Directory with a subdirectory of jump files for every jump type.
+        jump_types (list): The jump types, the label of a jump is the index of its type.
+
+    Returns:
+        list: [relative path, label, size, modification time in ns] of every jump file, sorted by path. The order
+            does not depend on the file system, so the train/validation split of the notebooks is the same on every
+            machine. It is not the split the notebooks made before, which followed the order of os.listdir.
+    """
+
+    files = []
+    for label, jump_type in enumerate(jump_types):
+        type_dir = os.path.join(labeled_dir, jump_type)
+        if not os.path.isdir(type_dir):
+            continue
+        for entry in os.scandir(type_dir):
+            if entry.is_file() and entry.name.endswith('.bin'):
+                stat = entry.stat()
+                files.append([os.path.join(jump_type, entry.name), label, stat.st_size, stat.st_mtime_ns])
+    return sorted(files)
+
+def build_dataset(labeled_dir=LABELED_DIR, files=None):
+    """
+    Reads the jump files of a labeled data directory into one array.
+
+    Args:
+        labeled_dir (str): Directory with a subdirectory of jump files for every jump type.
+        files (list): The files to read, see list_source_files. Defaults to all of them.
+
+    Returns:
+        tuple: (data, labels), data is a float32 array of shape (jumps, JUMP_LENGTH, 30) and labels an int64 array.
+    """
+
+    if files is None:
+        files = list_source_files(labeled_dir)
+    jump_size = JUMP_LENGTH * imu_codec.FRAME_SIZE
+    for relative_path, _, size, _ in files:
+        if size != jump_size:
+            print(f"Warning: skipping {relative_path}, it is not a complete jump")
+    files = [f for f in files if f[2] == jump_size]
+
+    raw = np.empty((len(files), JUMP_LENGTH, CHANNELS), dtype=imu_codec.SAMPLE_DTYPE)
+    for i, (relative_path, _, _, _) in enumerate(files):
+        file_path = os.path.join(labeled_dir, relative_path)
+        raw[i] = imu_codec.as_samples(np.fromfile(file_path, dtype=imu_codec.SAMPLE_DTYPE))
+    labels = np.array([label for _, label, _, _ in files], dtype=np.int64)
+    return imu_codec.scale(raw), labels
+
+def cache_paths(labeled_dir, cache_dir=CACHE_DIR):
+    """
+    Returns the paths of the cache files of a labeled data directory.
+
+    Returns:
+        tuple: (data path, labels path, manifest path)
+    """
+
+    name = os.path.basename(os.path.normpath(labeled_dir))
+    prefix = os.path.join(cache_dir, name)
+    return prefix + '.npy', prefix + '.labels.npy', prefix + '.manifest.json'
+
+def save_array(path, array):
+    """
+    Saves an array so that a reader never sees a partly written file.
+    """
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporary_path, path)
+
+def load_dataset(labeled_dir=LABELED_DIR, cache_dir=CACHE_DIR, rebuild=False):
+    """
+    Loads the labeled jumps, from the cache if it matches the jump files and otherwise by building it.
+
+    Args:
+        labeled_dir (str): Directory with a subdirectory of jump files for every jump type.
+        cache_dir (str): Directory of the cache files.
+        rebuild (bool): If True the cache is rebuilt even if it is up to date.
+
+    Returns:
+        tuple: (data, labels), data is a read-only memory-mapped float32 array of shape (jumps, JUMP_LENGTH, 30)
+            and labels an int64 array.
+    """
+
+    files = list_source_files(labeled_dir)
+    manifest = dict(jump_types=JUMP_TYPES, jump_length=JUMP_LENGTH, scale=imu_codec.SCALE_VECTOR.tolist(), files=files)
+    data_path, labels_path, manifest_path = cache_paths(labeled_dir, cache_dir)
+
+    up_to_date = False
+    if not rebuild and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            up_to_date = json.load(f) == manifest
+
+    if not up_to_date:
+        data, labels = build_dataset(labeled_dir, files)
+        os.makedirs(cache_dir, exist_ok=True)
+        save_array(data_path, data)
+        save_array(labels_path, labels)
+        # The manifest is written last, so an interrupted build is redone next time
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+    return np.load(data_path, mmap_mode='r'), np.load(labels_path)
+
+if torch is not None:
+    class JumpDataset(Dataset):
+        """
+        Dataset of the labeled jumps for a DataLoader. Samples are copied out of the memory-mapped cache as they are
+        requested.
+        """
+
+        def __init__(self, data, labels, indices=None):
+            """
+            Args:
+                data (numpy.array): The jump data from load_dataset.
+                labels (numpy.array): The labels from load_dataset.
+                indices (numpy.array): The jumps to use, e.g. the training or validation split. Defaults to all.
+            """
+
+            self.data = data
+            self.labels = labels
+            self.indices = np.arange(len(labels)) if indices is None else np.asarray(indices)
+
+        def __len__(self):
+            return len(self.indices)
+
+        def __getitem__(self, i):
+            index = self.indices[i]
+            return torch.from_numpy(np.array(self.data[index])), int(self.labels[index])
+
+def make_data_loader(data, labels, indices=None, batch_size=16, shuffle=False):
+    """
+    Creates a DataLoader over the labeled jumps.
+
+    Args:
+        data (numpy.array): The jump data from load_dataset.
+        labels (numpy.array): The labels from load_dataset.
+        indices (numpy.array): The jumps to use, defaults to all.
+        batch_size (int): Jumps per batch.
+        shuffle (bool): If True the jumps are shuffled every epoch.
+
+    Returns:
+        torch.utils.data.DataLoader: Batches of (float32 data of shape (batch, JUMP_LENGTH, 30), int64 labels).
+    """
+
+    return DataLoader(JumpDataset(data, labels, indices), batch_size=batch_size, shuffle=shuffle)
+
+if __name__ == '__main__':
+    # Rebuild the cache, e.g. python dataset.py data/labeled_data
+    labeled_dir = sys.argv[1] if len(sys.argv) > 1 else LABELED_DIR
+    data, labels = load_dataset(labeled_dir, rebuild=True)
+    counts = np.bincount(labels, minlength=len(JUMP_TYPES))
+    print(f"Cached {len(labels)} jumps: " + ', '.join(f"{t} {c}" for t, c in zip(JUMP_TYPES, counts)))
@@ -1,6 +1,9 @@
 import os
+import threading
 import numpy as np
-from scipy.signal import butter, filtfilt
+import metrics
+import imu_codec
+from recording_store import list_chunks, read_chunk, chunk_number
 
 # Constants
 ACCEL_SCALE = 16  # +/- 16 g
@@ -14,9 +17,59 @@ CUTOFF_FREQUENCY = 10  # Cutoff frequency for the low-pass filter in Hz
 FS = 50  # Sampling frequency in Hz
 FILTER_ORDER = 6  # Order of the Butterworth filter
 
+def design_low_pass_filter(cutoff, fs, order):
+    """
+    Create a low-pass Butterworth filter in second-order sections form.
+
+    Parameters:
+        cutoff (float): The cutoff frequency of the filter in Hz.
+        fs (int): The sampling frequency in Hz.
+        order (int): The order of the filter.
+
+    Returns:
+        np.array: The filter coefficients as an array of second-order sections.
+    """
+
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs  # Nyquist Frequency
+    normal_cutoff = cutoff / nyq  # Normalize the frequency
+    return butter(order, normal_cutoff, btype='low', analog=False, output='sos')
+
+# Designed filters by (cutoff, fs, order). scipy.signal takes over a second to import, so it is imported and the
+# filter designed the first time a filter is needed instead of when this module is imported
+filter_designs = {}
+filter_designs_lock = threading.Lock()
+
+def get_filter(cutoff=CUTOFF_FREQUENCY, fs=FS, order=FILTER_ORDER):
+    """
+    Returns a low-pass filter, designing it only the first time it is requested. The server requests the default
+    filter in the background while it starts, so the first file does not wait for scipy to be imported.
+
+    Parameters:
+        cutoff (float): The cutoff frequency of the filter in Hz.
+        fs (int): The sampling frequency in Hz.
+        order (int): The order of the filter.
+
+    Returns:
+        tuple: (sos, zi), the second-order sections and the steady state response of every section to a unit step.
+    """
+
+    key = (cutoff, fs, order)
+    design = filter_designs.get(key)
+    if design is None:
+        with filter_designs_lock:
+            design = filter_designs.get(key)
+            if design is None:
+                from scipy.signal import sosfilt_zi
+
+                sos = design_low_pass_filter(cutoff, fs, order)
+                design = filter_designs[key] = (sos, sosfilt_zi(sos))
+    return design
+
 def apply_low_pass_filter(data, cutoff, fs, order):
     """
-    Create and apply a low-pass Butterworth filter to the provided data.
+    Create and apply a zero-phase low-pass Butterworth filter to the provided data.
 
     Parameters:
         data (np.array): The input data to filter.
@@ -28,56 +81,161 @@ def apply_low_pass_filter(data, cutoff, fs, order):
         np.array: The filtered data.
     """
 
-    nyq = 0.5 * fs  # Nyquist Frequency
-    normal_cutoff = cutoff / nyq  # Normalize the frequency
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)  # Get filter coefficients
-    filtered_data = filtfilt(b, a, data, axis=0)  # Apply filter
-    return filtered_data
+    from scipy.signal import sosfiltfilt
+
+    sos, _ = get_filter(cutoff, fs, order)
+    return sosfiltfilt(sos, data, axis=0)
+
+class StreamingFilter:
+    """
+    Causal low-pass filter for live data. The filter state of every channel is carried from one chunk to the
+    next, so consecutive chunks are filtered as one continuous signal without transients at the chunk boundaries.
+    """
 
-def read_and_process_file(file_path):
+    def __init__(self, sos=None):
+        """
+        Parameters:
+            sos (np.array): Second-order sections of the filter, defaults to the filter from get_filter. The filter is
+                only prepared when the first chunk arrives, see get_filter.
+        """
+
+        self.sos = sos
+        self.zi_template = None  # Steady state response to a unit step, shape (sections, 2)
+        self.zi = None
+
+    def reset(self):
+        """
+        Forgets the filter state, the next chunk will be treated as the start of a new signal.
+        """
+
+        self.zi = None
+
+    def process(self, data):
+        """
+        Filters the next chunk of the signal.
+
+        Parameters:
+            data (np.array): Array of shape (samples, channels) that directly follows the previous chunk.
+
+        Returns:
+            np.array: The filtered chunk, same shape as the input.
+        """
+
+        from scipy.signal import sosfilt
+
+        if self.zi_template is None:
+            if self.sos is None:
+                self.sos, self.zi_template = get_filter()
+            else:
+                from scipy.signal import sosfilt_zi
+
+                self.zi_template = sosfilt_zi(self.sos)
+        if self.zi is None:
+            # Start every channel in the steady state of its first sample to avoid a startup transient
+            self.zi = self.zi_template[:, :, np.newaxis] * data[0]
+        filtered_data, self.zi = sosfilt(self.sos, data, axis=0, zi=self.zi)
+        return filtered_data
+
+# Filter state for the live data stream
+live_filter = StreamingFilter()
+
+def to_int16(data):
     """
-    Read data from a file, scale it, and apply a low-pass filter.
+    Converts filtered data back to int16, clipping values that overshoot the range of the sensor. Values are truncated
+    toward zero rather than rounded, so the processed files stay the same as the ones written before.
+
+    Parameters:
+        data (np.array): The filtered data.
+
+    Returns:
+        np.array: The data as int16.
+    """
+
+    return np.clip(data, -32768, 32767).astype(np.int16, order='C')
+
+def read_and_process_file(file_path, stream_filter=None):
+    """
+    Read data from a file and apply the streaming low-pass filter to it. The filter is linear, so it is applied
+    directly to the raw sensor readings instead of scaling them to g and deg/s and back.
 
     Parameters:
         file_path (str): Path to the file containing raw binary data.
+        stream_filter (StreamingFilter): Filter holding the state of the stream, defaults to the live stream.
 
     Returns:
         np.array or None: The processed data as an array, or None if the file is empty.
     """
 
-    data = np.fromfile(file_path, dtype=np.int16)
+    if stream_filter is None:
+        stream_filter = live_filter
+
+    data = imu_codec.as_samples(np.fromfile(file_path, dtype=imu_codec.SAMPLE_DTYPE))
     if data.size == 0:
         print(f"Warning: {file_path} is empty.")
         return None
-    data = data.reshape((-1, SENSOR_COUNT * 6))
-    scale_vector = np.tile(np.hstack([ACCEL_SCALE]*3 + [GYRO_SCALE]*3), SENSOR_COUNT)
-    scaled_data = (data / 32768.0) * scale_vector
-    filtered_data = apply_low_pass_filter(scaled_data, CUTOFF_FREQUENCY, FS, FILTER_ORDER)
-    # Scale back to int16
-    int_data = (filtered_data * (32768.0 / scale_vector)).astype(np.int16)
-    return int_data
+    return to_int16(stream_filter.process(data))
 
-def filter_file(file_number, data_dir, processed_dir):
+def filter_file(file_number, data_dir, processed_dir, stream_filter=None):
     """
     Process a single data file from its number, apply filters, and save the processed data.
 
     Parameters:
         file_number (int): The number of the file to process.
+        data_dir (str): Directory containing the raw data files.
+        processed_dir (str): Directory the processed file is written to.
+        stream_filter (StreamingFilter): Filter holding the state of the stream, defaults to the live stream.
 
     Returns:
-        None: Outputs are saved to disk and messages are printed about the status.
+        np.array or None: The processed data, which is also saved to disk. None if the file is missing or empty.
     """
 
-    DATA_DIR = data_dir
-    PROCESSED_DIR = processed_dir
-
-    file_path = os.path.join(DATA_DIR, f"{file_number}.bin")
+    file_path = os.path.join(data_dir, f"{file_number}.bin")
     if os.path.exists(file_path):
-        filtered_data = read_and_process_file(file_path)
+        with metrics.timed('filter'):
+            filtered_data = read_and_process_file(file_path, stream_filter)
         if filtered_data is not None:
-            output_path = os.path.join(PROCESSED_DIR, f"{file_number}.bin")
-            filtered_data.tofile(output_path)
+            output_path = os.path.join(processed_dir, f"{file_number}.bin")
+            with metrics.timed('write'):
+                filtered_data.tofile(output_path)
             print(f"Processed and saved: {output_path}")
+        return filtered_data
     else:
         print(f"File {file_path} does not exist.")
+        return None
+
+def filter_recording(data_dir, processed_dir):
+    """
+    Apply a zero-phase low-pass filter to a complete recording at once and save every processed file. Unlike the
+    streaming filter this has no phase delay, but it needs the whole recording so it is only used offline.
+
+    Parameters:
+        data_dir (str): Directory containing the raw data files of the recording.
+        processed_dir (str): Directory the processed files are written to.
+
+    Returns:
+        list: The numbers of the files that were processed.
+    """
+
+    # The raw data can be separate files or a stored or archived recording, see recording_store.py
+    chunks = []
+    for file_path in list_chunks(data_dir):
+        file_number = chunk_number(file_path)
+        data = read_chunk(file_path)
+        if data.size == 0:
+            print(f"Warning: {file_number}.bin is empty.")
+            continue
+        chunks.append((file_number, imu_codec.as_samples(data)))
+    if not chunks:
+        return []
+
+    recording = np.concatenate([data for _, data in chunks])
+    filtered_data = to_int16(apply_low_pass_filter(recording, CUTOFF_FREQUENCY, FS, FILTER_ORDER))
 
+    # Split the filtered recording back into the original files
+    offset = 0
+    for file_number, data in chunks:
+        output_path = os.path.join(processed_dir, f"{file_number}.bin")
+        filtered_data[offset:offset + len(data)].tofile(output_path)
+        offset += len(data)
+    print(f"Processed and saved {len(chunks)} files to {processed_dir}")
+    return [file_number for file_number, _ in chunks]
@@ -1,9 +1,168 @@
 import os
+import threading
 import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLabel, QSlider, QComboBox
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, QFileSystemWatcher, QThread, pyqtSignal
 import pyqtgraph as pg
-from data_processing import read_file, get_data_files, BASE_DIR, DATA_NAME, PROCESSED_NAME, PLOT_WINDOW, READINGS_PER_FILE, SENSOR_COUNT
+from chunk_cache import ChunkCache
+from live_stream import follow_events, decode_samples, close_connection
+from data_processing import read_file, get_data_files, scale_data, BASE_DIR, DATA_NAME, PROCESSED_NAME, PLOT_WINDOW, READINGS_PER_FILE, SENSOR_COUNT
+from recording_store import store_paths, chunk_signature
+from jump_index import has_index, list_jumps
+from overview_pyramid import Overview, bin_size
+
+# Constants
+FRAME_INTERVAL = 16  # Delay between a change on disk and the refresh it triggers (ms), changes within it are combined
+FALLBACK_INTERVAL = 2000  # Interval of the polling fallback in case a change notification is missed (ms)
+LIVE_STREAM_URL = 'http://localhost:5000/stream'  # Live stream of server.py
+DEFAULT_PLOT_WIDTH = 1000  # Width in pixels assumed for choosing an overview level while the plots are not shown yet
+
+class PlotBuffer:
+    """
+    Preallocated ring buffer holding the samples of the files shown in one view. Every sample is written twice, at
+    its position and one capacity further, so the buffered samples are always one contiguous slice. Channels are
+    stored in rows, so the data of each curve is a view of the buffer and is never copied.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Number of samples the buffer can hold before it has to grow.
+        """
+
+        self.capacity = capacity
+        self.data = np.zeros((SENSOR_COUNT * 6, 2 * capacity), dtype=np.float32)
+        self.clear()
+
+    def clear(self):
+        """
+        Empties the buffer without releasing its memory.
+        """
+
+        self.head = 0  # Position the next sample is written to
+        self.count = 0  # Number of buffered samples
+        self.files = []  # Paths of the buffered files, oldest first
+        self.signatures = []  # Signature of each buffered file when it was read, see recording_store.chunk_signature
+        self.lengths = []  # Number of samples of each buffered file
+
+    def drop_oldest(self, file_count):
+        """
+        Removes the oldest files from the buffer.
+
+        Args:
+            file_count (int): Number of files to remove.
+        """
+
+        self.count -= sum(self.lengths[:file_count])
+        del self.files[:file_count]
+        del self.signatures[:file_count]
+        del self.lengths[:file_count]
+
+    def drop_newest(self, file_count):
+        """
+        Removes the newest files from the buffer.
+
+        Args:
+            file_count (int): Number of files to remove.
+        """
+
+        if file_count <= 0:
+            return
+        sample_count = sum(self.lengths[-file_count:])
+        self.count -= sample_count
+        self.head = (self.head - sample_count) % self.capacity
+        del self.files[-file_count:]
+        del self.signatures[-file_count:]
+        del self.lengths[-file_count:]
+
+    def append(self, file_path, data, signature=None):
+        """
+        Copies the data of a file into the buffer after the buffered files.
+
+        Args:
+            file_path (str): Path of the file.
+            data (ndarray): Scaled data of the file, shape (samples, channels), or None if it has no data.
+            signature (tuple): Signature of the file when it was read, see recording_store.chunk_signature.
+        """
+
+        sample_count = 0 if data is None else len(data)
+        if self.count + sample_count > self.capacity:
+            self.grow(self.count + sample_count)
+        if sample_count:
+            positions = (self.head + np.arange(sample_count)) % self.capacity
+            self.data[:, positions] = data.T
+            self.data[:, positions + self.capacity] = data.T
+            self.head = (self.head + sample_count) % self.capacity
+        self.count += sample_count
+        self.files.append(file_path)
+        self.signatures.append(signature)
+        self.lengths.append(sample_count)
+
+    def grow(self, capacity):
+        """
+        Reallocates the buffer so it can hold at least the given number of samples.
+
+        Args:
+            capacity (int): The required number of samples.
+        """
+
+        samples = self.view().copy()
+        self.capacity = max(capacity, 2 * self.capacity)
+        self.data = np.zeros((SENSOR_COUNT * 6, 2 * self.capacity), dtype=np.float32)
+        self.data[:, :self.count] = samples
+        self.data[:, self.capacity:self.capacity + self.count] = samples
+        self.head = self.count
+
+    def view(self):
+        """
+        Returns the buffered samples, oldest first.
+
+        Returns:
+            ndarray: View of the buffer with one row of samples per channel.
+        """
+
+        end = self.head + self.capacity
+        return self.data[:, end - self.count:end]
+
+class LiveStreamThread(QThread):
+    """
+    Follows the live stream of the server in the background and passes its events to the GUI thread.
+    """
+
+    samples_received = pyqtSignal(int, object)  # File number and scaled data of a processed file
+    jump_received = pyqtSignal(dict)  # Jump index row of a saved jump
+    classification_received = pyqtSignal(dict)  # Predicted type of a saved jump
+
+    def __init__(self, url, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.stop_event = threading.Event()
+        self.sock = None
+
+    def run(self):
+        for event, data in follow_events(self.url, self.stop_event, self.set_socket):
+            if event == 'samples':
+                self.samples_received.emit(data['file_number'], scale_data(decode_samples(data)))
+            elif event == 'jump':
+                self.jump_received.emit(data)
+            elif event == 'classification':
+                self.classification_received.emit(data)
+
+    def set_socket(self, sock):
+        """
+        Remembers the open connection so stop can close it.
+        """
+
+        self.sock = sock
+
+    def stop(self):
+        """
+        Stops the thread, closing the connection interrupts a read that is waiting for the next event.
+        """
+
+        self.stop_event.set()
+        if self.sock is not None:
+            close_connection(self.sock)
 
 class MainApplication(QWidget):
     """
@@ -19,6 +178,15 @@ class MainApplication(QWidget):
         self.data_name = DATA_NAME
         self.data_directory = os.path.join(BASE_DIR, self.data_path, self.data_name)
         self.jump_view_mode = False
+        self.chunk_cache = ChunkCache()  # Decoded chunks, so each refresh only reads the files that are new
+        self.plot_buffers = {}  # PlotBuffer of each data directory that has been viewed
+        self.plotted_buffer = None  # The PlotBuffer whose data is currently on the plots
+        self.live_mode = False  # Plot the processed data pushed by the server instead of reading files
+        self.live_thread = None
+        self.live_buffer = PlotBuffer(PLOT_WINDOW * READINGS_PER_FILE)
+        self.overview_mode = False  # Plot the whole session, zoomable, instead of a window of PLOT_WINDOW files
+        self.overviews = {}  # Overview of each data directory that has been viewed as a whole session
+        self.overview_directory = None  # Data directory whose whole session the x range was last set to
         self.initUI()
 
     def initUI(self):
@@ -26,9 +194,8 @@ class MainApplication(QWidget):
         Initializes the user interface, including layout, plots, buttons, and other interactive elements.
         """
 
-        # Set layout and plots
+        # Set layout, the plots are added above the controls once the window is shown, see create_plots
         self.layout = QVBoxLayout(self)
-        self.plot_widget, self.curves = self.setup_plots()
         
         # Initialize text and buttons
         self.file_range_label = QLabel("Displaying files: None")
@@ -58,20 +225,102 @@ class MainApplication(QWidget):
         self.jump_toggle_button.setFixedSize(300, 30)
         self.layout.addWidget(self.jump_toggle_button)
 
+        self.overview_button = QPushButton("View Whole Session", self)
+        self.overview_button.clicked.connect(self.toggle_overview_mode)
+        self.overview_button.setFixedSize(300, 30)
+        self.layout.addWidget(self.overview_button)
+
+        self.live_button = QPushButton("Switch to Live Stream", self)
+        self.live_button.clicked.connect(self.toggle_live_mode)
+        self.live_button.setFixedSize(300, 30)
+        self.layout.addWidget(self.live_button)
+
+        self.live_jump_label = QLabel("Last live jump: None")
+        self.layout.addWidget(self.live_jump_label)
+
         # Initilize the slider, min/max values will be changed as filesa re loaded
         self.slider = QSlider(Qt.Horizontal)
         self.slider.setMinimum(0)
         self.slider.setMaximum(0)
         self.slider.setValue(0)
+        self.slider.valueChanged.connect(self.schedule_update)
         self.layout.addWidget(self.slider)
+        self.jump_dropdown.currentIndexChanged.connect(self.schedule_update)
     
         self.setLayout(self.layout)
         self.resize(2600, 1400)
         self.show()
+
+        # Refresh when the data on disk changes instead of polling it. Notifications are combined by a single shot
+        # timer, so a burst of changes results in one refresh
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(FRAME_INTERVAL)
+        self.update_timer.timeout.connect(self.update)
+
+        # Zooming and scrolling the whole session view redraws it from the overview, at most once per frame
+        self.overview_timer = QTimer(self)
+        self.overview_timer.setSingleShot(True)
+        self.overview_timer.setInterval(FRAME_INTERVAL)
+        self.overview_timer.timeout.connect(self.draw_overview)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_update)
+        self.watcher.fileChanged.connect(self.schedule_update)
+        self.watch_data_path()
     
+        # Slow polling as a fallback, also picks up directories that did not exist yet when they were first watched
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(100)  # Update interval (ms)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(FALLBACK_INTERVAL)
+
+        # Creating the plots takes most of the startup time, so it waits until the window is on screen
+        QTimer.singleShot(0, self.create_plots)
+
+    def create_plots(self):
+        """
+        Adds the plots to the window and shows the data on them.
+        """
+
+        self.plot_widget, self.curves = self.setup_plots()
+        self.plots[0].sigXRangeChanged.connect(self.schedule_overview_draw)
+        self.schedule_update()
+
+    def watch_data_path(self):
+        """
+        Sets the file system watcher to the raw data, processed data and jumps directories of the current data path,
+        as well as the index files of recordings that are stored in a single file.
+        """
+
+        watched_paths = self.watcher.directories() + self.watcher.files()
+        paths = []
+        for name in [DATA_NAME, PROCESSED_NAME, "jumps"]:
+            directory = os.path.join(BASE_DIR, self.data_path, name)
+            paths.extend([directory, store_paths(directory)[1]])
+        paths = [path for path in paths if os.path.exists(path)]
+
+        stale_paths = [path for path in watched_paths if path not in paths]
+        if stale_paths:
+            self.watcher.removePaths(stale_paths)
+        new_paths = [path for path in paths if path not in watched_paths]
+        if new_paths:
+            self.watcher.addPaths(new_paths)
+
+    def schedule_update(self):
+        """
+        Requests a refresh of the display, the refresh happens once FRAME_INTERVAL has passed.
+        """
+
+        if not self.update_timer.isActive():
+            self.update_timer.start()
+
+    def poll(self):
+        """
+        Fallback refresh in case a change notification was missed.
+        """
+
+        self.watch_data_path()
+        self.update()
 
     def update_jump_options(self):
         """
@@ -86,9 +335,12 @@ class MainApplication(QWidget):
             self.jump_dropdown.clear()
             return
 
-        # Collect current jumps in the directory
-        current_jumps = sorted(jump for jump in os.listdir(jumps_path)
-                               if os.path.isfile(os.path.join(jumps_path, jump)) and jump.startswith("jump_"))
+        # Collect current jumps from the jump index, directories from before the index existed are listed instead
+        if has_index(jumps_path):
+            current_jumps = [jump['file_name'] for jump in list_jumps(jumps_path)]
+        else:
+            current_jumps = sorted(jump for jump in os.listdir(jumps_path)
+                                   if os.path.isfile(os.path.join(jumps_path, jump)) and jump.startswith("jump_"))
 
         # Check if the list of jumps has changed since last update
         if hasattr(self, 'last_jump_list') and self.last_jump_list == current_jumps and hasattr(self, 'last_jump_path') and self.last_jump_path == jumps_path:
@@ -103,6 +355,82 @@ class MainApplication(QWidget):
         self.last_jump_path = jumps_path
         self.last_jump_list = current_jumps    
 
+    def toggle_live_mode(self):
+        """
+        Toggles between plotting files from the data directory and plotting the live stream of the server. The live
+        stream shows processed data as soon as the server has computed it, without reading any files.
+        """
+
+        if self.live_mode:
+            self.live_mode = False
+            self.live_button.setText("Switch to Live Stream")
+            self.live_thread.stop()
+            self.live_thread = None
+            self.schedule_update()
+        else:
+            self.live_mode = True
+            self.live_button.setText("Return to Files")
+            self.live_buffer.clear()
+            self.live_thread = LiveStreamThread(LIVE_STREAM_URL, self)
+            self.live_thread.samples_received.connect(self.add_live_samples)
+            self.live_thread.jump_received.connect(self.add_live_jump)
+            self.live_thread.classification_received.connect(self.add_live_classification)
+            self.live_thread.finished.connect(self.live_thread.deleteLater)
+            self.live_thread.start()
+
+    def add_live_samples(self, file_number, data):
+        """
+        Adds a processed file received from the live stream to the plots.
+
+        Args:
+            file_number (int): The number of the file.
+            data (ndarray): The scaled data of the file.
+        """
+
+        if not self.live_mode:
+            return
+        self.live_buffer.append(f"live/{file_number}", data)
+        if len(self.live_buffer.files) > PLOT_WINDOW:
+            self.live_buffer.drop_oldest(len(self.live_buffer.files) - PLOT_WINDOW)
+        self.highest_file_label.setText(f"Current highest file: {file_number}.bin (live)")
+        if not self.jump_view_mode:
+            self.update_plots(self.live_buffer.view())
+            self.plotted_buffer = self.live_buffer
+
+    def add_live_jump(self, jump):
+        """
+        Shows a jump received from the live stream.
+
+        Args:
+            jump (dict): The jump index row of the jump.
+        """
+
+        self.live_jump_label.setText(f"Last live jump: {jump['file_name']}, {jump['rotation']:.0f} deg rotation, "
+                                     f"{jump['peak_acceleration']:.1f} g takeoff, {jump['airtime']:.2f} s airtime")
+
+    def add_live_classification(self, classification):
+        """
+        Adds the predicted type to the last live jump, if it is still the one shown.
+
+        Args:
+            classification (dict): The jump_id, file_name, jump_type and confidence of the jump.
+        """
+
+        text = self.live_jump_label.text()
+        if f"Last live jump: {classification['file_name']}," in text:
+            self.live_jump_label.setText(f"{text}, {classification['jump_type']} "
+                                         f"({classification['confidence']:.0%})")
+
+    def closeEvent(self, event):
+        """
+        Stops the live stream when the window is closed.
+        """
+
+        if self.live_thread is not None:
+            self.live_thread.stop()
+            self.live_thread.wait(1000)
+        super().closeEvent(event)
+
     def toggle_jump_view(self):
         """
         Toggles the view mode between normal data and a specific jump. When a jump is selected, the application
@@ -118,6 +446,117 @@ class MainApplication(QWidget):
             self.jump_toggle_button.setText("Return to Full View")
             self.display_selected_jump()
 
+    def toggle_overview_mode(self):
+        """
+        Toggles between the window of PLOT_WINDOW files and a view of the whole session. The whole session view links
+        the x axes of all plots, so zooming or scrolling one plot with the mouse moves all of them.
+        """
+
+        if self.overview_mode:
+            self.overview_mode = False
+            self.overview_button.setText("View Whole Session")
+            for plot in self.plots:
+                plot.setXLink(None)
+                plot.setAutoVisible(y=False)
+                plot.enableAutoRange(x=True)
+        else:
+            self.overview_mode = True
+            self.overview_button.setText("Return to File Window")
+            for plot in self.plots[1:]:
+                plot.setXLink(self.plots[0])
+            for plot in self.plots:
+                plot.setAutoVisible(y=True)  # Fit the y axis to the visible samples only
+        self.overview_directory = None
+        self.update()
+
+    def update_overview(self):
+        """
+        Adds the new files of the data directory to its overview and redraws the whole session view if they changed
+        it. The x range is set to the whole session when the view is opened, the data directory changes, or the view
+        returns from a jump or the live stream.
+        """
+
+        overview = self.overviews.get(self.data_directory)
+        if overview is None:
+            overview = Overview(self.data_directory)
+            self.overviews[self.data_directory] = overview
+        added = overview.update()
+
+        if overview.sample_count and (self.overview_directory != self.data_directory
+                                      or self.plotted_buffer is not overview):
+            self.overview_directory = self.data_directory
+            self.plots[0].setXRange(0, overview.sample_count, padding=0)
+            self.draw_overview()
+        elif added:
+            self.draw_overview()
+
+    def schedule_overview_draw(self):
+        """
+        Requests a redraw of the whole session view after the x range changed, the redraw happens once FRAME_INTERVAL
+        has passed.
+        """
+
+        if self.overview_mode and not self.overview_timer.isActive():
+            self.overview_timer.start()
+
+    def draw_overview(self):
+        """
+        Plots the visible range of the whole session view. The range is drawn from the overview level with about one
+        bin per pixel, so the amount of data plotted does not depend on the length of the session. Once zoomed in
+        past the finest level, the samples are read from the files themselves.
+        """
+
+        overview = self.overviews.get(self.data_directory)
+        if not self.overview_mode or self.jump_view_mode or self.live_mode or overview is None:
+            return
+
+        # Half a view is loaded on either side, so scrolling does not show empty space before the redraw
+        x_min, x_max = self.plots[0].viewRange()[0]
+        span = max(x_max - x_min, 1)
+        start = max(int(x_min - span / 2), 0)
+        stop = min(int(np.ceil(x_max + span / 2)), overview.sample_count)
+        level = overview.choose_level(span / (self.plots[0].vb.width() or DEFAULT_PLOT_WIDTH))
+
+        if level is None:
+            x, channel_data = self.read_samples(overview, start, stop)
+            resolution = "every sample"
+        else:
+            # A bin is drawn as a vertical line from its minimum to its maximum, followed by the next bin
+            first_sample, bins = overview.envelope(level, start, stop)
+            channel_data = scale_data(bins.reshape((-1, SENSOR_COUNT * 6))).T
+            x = first_sample + bin_size(level) * (np.arange(2 * len(bins)) // 2)
+            resolution = f"min/max of {bin_size(level)} samples"
+        self.update_plots(channel_data, x)
+        self.plotted_buffer = overview
+
+        shown_start, shown_stop = max(int(x_min), 0), min(int(x_max), overview.sample_count)
+        self.file_range_label.setText(f"Displaying samples: {shown_start} to {shown_stop} of {overview.sample_count}, "
+                                      f"{resolution}")
+
+    def read_samples(self, overview, start, stop):
+        """
+        Reads a range of the whole session at full resolution from the files that contain it.
+
+        Args:
+            overview (Overview): The overview of the data directory.
+            start (int): First sample of the range.
+            stop (int): Sample after the last sample of the range.
+
+        Returns:
+            tuple: (sample positions, scaled data with one row of samples per channel)
+        """
+
+        positions = []
+        chunks = []
+        for file_path, first_sample in overview.chunks(start, stop):
+            data = self.chunk_cache.get(file_path)
+            if data is not None:
+                positions.append(np.arange(first_sample, first_sample + len(data)))
+                chunks.append(data)
+        if not chunks:
+            return np.zeros(0), np.zeros((SENSOR_COUNT * 6, 0), dtype=np.float32)
+        return np.concatenate(positions), np.concatenate(chunks).T
+
     def display_selected_jump(self):
         """
         Displays the data for the selected jump.
@@ -127,7 +566,8 @@ class MainApplication(QWidget):
         if jump_file and os.path.exists(jump_file):
             jump_data = read_file(jump_file)
             if jump_data is not None:
-                self.update_plots([jump_data])
+                self.update_plots(jump_data.T)
+                self.plotted_buffer = None
 
     def update_recording_options(self):
         """
@@ -153,6 +593,7 @@ class MainApplication(QWidget):
         self.data_path = self.data_path_dropdown.currentData()
         self.data_directory = os.path.join(BASE_DIR, self.data_path, self.data_name)
         print(f"Data path changed to: {self.data_directory}")
+        self.watch_data_path()
         self.update_jump_options()
         self.update()  # Refresh the plot with the new data path
 
@@ -178,7 +619,8 @@ class MainApplication(QWidget):
             curves.extend([accel_plot.plot(pen='r'), accel_plot.plot(pen='g'), accel_plot.plot(pen='b'),
                            gyro_plot.plot(pen='r'), gyro_plot.plot(pen='g'), gyro_plot.plot(pen='b')])
 
-        self.layout.addWidget(plot_widget)
+        self.layout.insertWidget(0, plot_widget)
+        self.plots = plots
         return plot_widget, curves
 
     def toggle_data_source(self):
@@ -195,6 +637,7 @@ class MainApplication(QWidget):
 
         self.data_directory = os.path.join(BASE_DIR, self.data_path, self.data_name)
         print(f"Data source switched to: {self.data_directory}")
+        self.schedule_update()
 
     def update(self):
         """
@@ -221,38 +664,90 @@ class MainApplication(QWidget):
         window_end_index = min(window_start_index + PLOT_WINDOW, num_files)
         displayed_files = files[window_start_index:window_end_index]
 
-        # Read in the data from all the files and filter out none values
-        all_data = [read_file(f) for f in displayed_files if os.path.getsize(f) > 0]
-        all_data = [data for data in all_data if data is not None]
-       
         self.update_jump_options() 
         if self.jump_view_mode:
             self.display_selected_jump()
-        elif all_data:
-            self.update_plots(all_data)
+        elif self.live_mode:
+            if self.plotted_buffer is not self.live_buffer:
+                self.update_plots(self.live_buffer.view())
+                self.plotted_buffer = self.live_buffer
+        elif self.overview_mode:
+            self.update_overview()
+        else:
+            plot_buffer = self.fill_plot_buffer(displayed_files)
+            if plot_buffer is not None:
+                self.update_plots(plot_buffer.view())
+                self.plotted_buffer = plot_buffer
         
         #file_numbers = [os.path.splitext(os.path.basename(f))[0] for f in displayed_files]
-        if num_files != 0:
+        if self.overview_mode and not self.jump_view_mode and not self.live_mode:
+            pass  # The whole session view shows the range of samples instead, see draw_overview
+        elif num_files != 0:
             self.file_range_label.setText(f"Displaying files: {window_start_index} to {window_end_index}")
         else:
             self.file_range_label.setText("Displaying files: None")
 
         self.highest_file_label.setText(f"Current highest file: {os.path.basename(files[-1]) if files else 'None'}")
     
-    def update_plots(self, all_data):
+    def fill_plot_buffer(self, displayed_files):
+        """
+        Brings the plot buffer of the current data directory up to date with the displayed files. When the window moves
+        forward, only the files that were not displayed before are copied into the buffer. Buffered files that changed
+        on disk since they were read, such as a file that was still being written or a reprocessed one, are read again.
+
+        Args:
+            displayed_files (list): Paths of the files that should be displayed.
+
+        Returns:
+            PlotBuffer or None: The buffer, or None if it is already on the plots and has not changed.
+        """
+
+        plot_buffer = self.plot_buffers.get(self.data_directory)
+        if plot_buffer is None:
+            plot_buffer = PlotBuffer(PLOT_WINDOW * READINGS_PER_FILE)
+            self.plot_buffers[self.data_directory] = plot_buffer
+
+        signatures = [chunk_signature(file_path) for file_path in displayed_files]
+        if plot_buffer.files == displayed_files and plot_buffer.signatures == signatures:
+            return None if plot_buffer is self.plotted_buffer else plot_buffer
+
+        # Keep the buffered files that are still displayed if the window only moved forward
+        if displayed_files and displayed_files[0] in plot_buffer.files:
+            shift = plot_buffer.files.index(displayed_files[0])
+            kept_count = len(plot_buffer.files) - shift
+            if displayed_files[:kept_count] == plot_buffer.files[shift:]:
+                plot_buffer.drop_oldest(shift)
+            else:
+                plot_buffer.clear()
+        else:
+            plot_buffer.clear()
+
+        # The first changed file and the files after it are read again
+        changed = [i for i, signature in enumerate(plot_buffer.signatures) if signature != signatures[i]]
+        if changed:
+            plot_buffer.drop_newest(len(plot_buffer.files) - changed[0])
+
+        for i in range(len(plot_buffer.files), len(displayed_files)):
+            plot_buffer.append(displayed_files[i], self.chunk_cache.get(displayed_files[i]), signatures[i])
+        return plot_buffer
+
+    def update_plots(self, channel_data, x=None):
         """
         Updates the plots with new data.
         Args:
-            all_data (list): A list of datasets from multiple files to be plotted.
+            channel_data (ndarray): The data to be plotted, with one row of samples per channel.
+            x (ndarray): Position of every sample, defaults to counting from 0.
         """
 
-        for i, curve_group in enumerate(self.curves):
-            sensor_index = i // 6
-            measure_index = i % 6
-            sensor_data = np.vstack([file_data[:, sensor_index * 6 + measure_index] for file_data in all_data if file_data is not None])
-            if sensor_data.size > 0:
-                flattened_data = sensor_data[-READINGS_PER_FILE:].ravel()  # Flatten the data
-                curve_group.setData(flattened_data)
+        if x is None and self.overview_mode:
+            # A jump or the live stream is shown in place of the whole session view, fit the x axes to it
+            for plot in self.plots:
+                plot.enableAutoRange(x=True)
+
+        for curve_group, data in zip(self.curves, channel_data):
+            if data.size > 0 and x is None:
+                curve_group.setData(data)
+            elif data.size > 0:
+                curve_group.setData(x, data)
             else:
                 curve_group.clear()  # Clear the plot if no data is available
-
@@ -1,10 +1,15 @@
 import os
 import glob
+from collections import deque
 import numpy as np
+from recording_store import read_stream
+import jump_index
+import metrics
+import imu_codec
 
 # Constants
-ACCEL_SCALE = 16  # +/- ACCEL_SCLAE are the min/max readings of the accelerometer (
-GYRO_SCALE = 2000 # +/- GYRO_SCALE are the min/max readings of the gyroscope (deg/sec)
+ACCEL_SCALE = imu_codec.ACCEL_SCALE  # +/- ACCEL_SCLAE are the min/max readings of the accelerometer (
+GYRO_SCALE = imu_codec.GYRO_SCALE # +/- GYRO_SCALE are the min/max readings of the gyroscope (deg/sec)
 READINGS_PER_FILE = 100
 SENSOR_COUNT = 5
 BASE_DIR = os.path.dirname(__file__)
@@ -18,15 +23,20 @@ MAX_JUMP_DURATION = 0.8  # Maximum duration of a jump in seconds
 LOW_THRESHOLD = 0.5  # Acceleration must drop below this value while skater is airborn (in Gs)
 HIGH_THRESHOLD = 1.5  # Acceleration must be above this value on takeoff and landing (in Gs)
 MINIMUM_ROTATION = 180 # Minimum number of degress that must be rotated for it to be considered a jump
+MINIMUM_TAKEOFF_ACCELERATION = 5  # Skate must see at least this acceleration during the first half of the jump (in Gs)
+MIN_JUMP_SAMPLES = round(MIN_JUMP_DURATION * SAMPLING_RATE)
+MAX_JUMP_SAMPLES = round(MAX_JUMP_DURATION * SAMPLING_RATE)
+BUFFER_CHUNKS = 4  # Number of recent chunks the jump detector keeps in memory
+
+jumps_detected = metrics.counter('jumps_detected_total', 'Takeoff and landing pairs found by the state machine.')
+jumps_saved = metrics.counter('jumps_saved_total', 'Detected jumps that passed the checks and were saved.')
+jumps_rejected = metrics.counter('jumps_rejected_total', 'Detected jumps that were not saved, by reason.')
 
 # States for jump detection
 STATE_GROUNDED = 0
 STATE_TAKEOFF = 1
 STATE_IN_AIR = 2
 
-# Temporary Bugfix:
-previous_end = -1
-
 def read_accelerometer_data(file_path):
     """
     Reads a binary file containing accelerometer data and returns it as a numpy array of signed 16-bit integers.
@@ -62,12 +72,11 @@ def extract_data(data, start_index, SCALE):
         SCALE (int): The amount that the values are scalled by, either ACCEL_SCALE or GYRO_SCALE
 
     Returns:
-        numpy.array: The extracted scaled values.
+        numpy.array: The extracted scaled float32 values.
     """
 
-    extracted_data = data[start_index::30]  # Extract every 30th value starting from the start_index
-    extracted_data_scaled = (extracted_data / 32768.0) * SCALE  # Scale the readings to the accelerometer range
-    return extracted_data_scaled
+    extracted_data = imu_codec.as_samples(data)[:, start_index]  # View of every 30th value starting from start_index
+    return np.multiply(extracted_data, np.float32(SCALE / 32768.0), dtype=np.float32)
 
 def compute_total_rotation(x_gyro_data):
     """
@@ -84,6 +93,43 @@ def compute_total_rotation(x_gyro_data):
     total_rotation = np.sum(x_gyro_data) * time_interval
     return total_rotation
 
+def compute_jump_metrics(jumps):
+    """
+    Computes the values used to validate jumps for a stack of jumps at once:
+    1. Total rotation, the absolute value of the integrated x-axis gyroscope data
+    2. Peak acceleration of channel 19 (y-axis acceleration of sensor 3) during the first half of the jump (this
+       occurs at takeoff)
+
+    Args:
+        jumps (numpy.array): Raw int16 jump data of shape (jumps, samples, 30)
+
+    Returns:
+        tuple: (total_rotation, peak_acceleration), arrays with one value per jump
+    """
+
+    # The counts are summed and compared as integers, only the results are scaled
+    x_gyro_data = imu_codec.channel_view(jumps, 0, 'gyro', 'x')
+    rotation_factor = float(imu_codec.GYRO_FACTOR) / SAMPLING_RATE
+    total_rotation = np.abs(np.sum(x_gyro_data, axis=1, dtype=np.int64) * rotation_factor)
+    accel_data = imu_codec.channel_view(jumps[:, :jumps.shape[1] // 2], 3, 'accel', 'y')
+    peak_acceleration = np.max(accel_data, axis=1) * float(imu_codec.ACCEL_FACTOR)
+    return total_rotation, peak_acceleration
+
+def check_jump_metrics(total_rotation, peak_acceleration, minimum_rotation=MINIMUM_ROTATION):
+    """
+    Applies the jump criteria to the metrics from compute_jump_metrics.
+
+    Args:
+        total_rotation (numpy.array or float): Total rotation of each jump in degrees.
+        peak_acceleration (numpy.array or float): Peak takeoff acceleration of each jump in Gs.
+        minimum_rotation (float): Minimum rotation of a valid jump in degrees.
+
+    Returns:
+        numpy.array or bool: If each jump is valid.
+    """
+
+    return (total_rotation > minimum_rotation) & (peak_acceleration > MINIMUM_TAKEOFF_ACCELERATION)
+
 def is_valid_jump(data):
     """
     Runs checks to ensure the potential identified jumps meet the criteria for a jump. This includes:
@@ -96,158 +142,387 @@ def is_valid_jump(data):
     Returns:
         Bool: If jump is valid
     """
-    total_rotation = abs(compute_total_rotation(extract_data(data, 3, GYRO_SCALE)))
-    print(f"rotation: {total_rotation}")
-    accel_data = extract_data(data, 19, ACCEL_SCALE)
-    maximum = np.max(accel_data[:len(accel_data) // 2])
-    print(f"max: {maximum}")
-    return total_rotation  > MINIMUM_ROTATION and maximum > 5
+    total_rotation, maximum = compute_jump_metrics(data.reshape((1, -1, SENSOR_COUNT * 6)))
+    print(f"rotation: {total_rotation[0]}")
+    print(f"max: {maximum[0]}")
+    return bool(check_jump_metrics(total_rotation[0], maximum[0]))
 
-def detect_jumps(x_accel_data, start_time_offset):
+def step_jump_state(x_accel_data, first_sample, state, jump_start):
     """
-    Detects jumps based on x-axis acceleration data, using state machine logic to define jump phases.
+    Runs the jump detection state machine over a block of x-axis acceleration data. The state is passed in and
+    returned so that consecutive blocks can be processed as one continuous stream.
 
     Args:
         x_accel_data (numpy.array): Array of scaled x-axis acceleration data.
-        start_time_offset (float): Time offset to calculate actual time of readings.
+        first_sample (int): Sample index of the first value in x_accel_data.
+        state (int): State of the state machine before the first value.
+        jump_start (int): Sample index of the last takeoff reading, only meaningful outside of STATE_GROUNDED.
 
     Returns:
-        list of tuple: List of tuples, each representing a detected jump as (jump_start_time, jump_end_time).
+        tuple: (jumps, state, jump_start), where jumps is a list of (takeoff_sample, landing_sample) tuples.
     """
 
-    jumps = [] # Will be a list of tuples of floats containing the start and end time for a jump
-    state = STATE_GROUNDED
-    jump_start = 0.0
-    jump_start_time = 0.0
+    jumps = [] # Will be a list of tuples of ints containing the takeoff and landing sample of a jump
 
-    for i in range(len(x_accel_data)):
-        # If the first file has been analyzed and it is not currently in the middle of a jump, stop.
-        # This is because the second file will be analyzed in the next call to the function anyways
-        if i >= READINGS_PER_FILE and state == STATE_GROUNDED:
-            return jumps
+    # Nothing can happen while grounded until the acceleration goes above the high threshold
+    if state == STATE_GROUNDED and not np.any(x_accel_data > HIGH_THRESHOLD):
+        return jumps, state, jump_start
 
-        x_accel = x_accel_data[i]
-        current_time = start_time_offset + i / SAMPLING_RATE  # Calculate the current time in seconds
+    # Python floats compare much faster than numpy scalars in this loop
+    for i, x_accel in enumerate(x_accel_data.tolist(), first_sample):
         if state == STATE_GROUNDED:
             # If accel goes above threshold, register a takeoff
             if x_accel > HIGH_THRESHOLD:
                 state = STATE_TAKEOFF
                 jump_start = i
-                jump_start_time = current_time
-        
+
         elif state == STATE_TAKEOFF:
             # If still in the takeoff phase, we will reset the start time
             if x_accel > HIGH_THRESHOLD:
-                jump_start_time = current_time
+                jump_start = i
 
             # If accel drops below low threshold, set to air state
             if x_accel < LOW_THRESHOLD:
                 state = STATE_IN_AIR
 
             # Reset if the jump exceeds the maximum duration
-            current_duration = current_time - jump_start_time  # Calculate the current duration of the jump
-            if current_duration > MAX_JUMP_DURATION:
+            if i - jump_start > MAX_JUMP_SAMPLES:
                 state = STATE_GROUNDED
-        
+
         elif state == STATE_IN_AIR:
-            current_duration = current_time - jump_start_time  # Calculate the current duration of the jump
+            current_duration = i - jump_start  # The current duration of the jump in samples
 
             # If high acceleration spike after being in the air, they have landed
             if x_accel > HIGH_THRESHOLD:
-                jump_end = i
-                jump_end_time = current_time
-                if MIN_JUMP_DURATION <= current_duration <= MAX_JUMP_DURATION: # Ensure it within acceptable time range
-                    jumps.append((jump_start_time, jump_end_time))
+                if MIN_JUMP_SAMPLES <= current_duration <= MAX_JUMP_SAMPLES: # Ensure it within acceptable time range
+                    jumps.append((jump_start, i))
                 state = STATE_GROUNDED
 
             # Reset if the jump exceeds the maximum duration
-            if current_duration > MAX_JUMP_DURATION:
+            if current_duration > MAX_JUMP_SAMPLES:
                 state = STATE_GROUNDED
 
-    return jumps
+    return jumps, state, jump_start
+
+def detect_jumps(x_accel_data, start_time_offset):
+    """
+    Detects jumps based on x-axis acceleration data, using state machine logic to define jump phases.
+
+    Args:
+        x_accel_data (numpy.array): Array of scaled x-axis acceleration data.
+        start_time_offset (float): Time offset to calculate actual time of readings.
+
+    Returns:
+        list of tuple: List of tuples, each representing a detected jump as (jump_start_time, jump_end_time).
+    """
+
+    jumps, _, _ = step_jump_state(x_accel_data, 0, STATE_GROUNDED, 0)
+    return [(start_time_offset + start / SAMPLING_RATE, start_time_offset + end / SAMPLING_RATE) for start, end in jumps]
+
+def detect_jumps_batch(data, high_threshold=HIGH_THRESHOLD, low_threshold=LOW_THRESHOLD,
+                       min_jump_samples=MIN_JUMP_SAMPLES, max_jump_samples=MAX_JUMP_SAMPLES,
+                       minimum_rotation=MINIMUM_ROTATION):
+    """
+    Detects and validates all jumps in a complete recording at once. This gives the same result as running the
+    state machine in step_jump_state over the recording, but works on the threshold crossings with array operations
+    instead of looping over every sample.
+
+    The state machine only changes state on readings above the high threshold ("highs") or below the low threshold
+    ("lows"). Every high that is not a landing starts a takeoff. The skater is in the air if a low follows that high
+    within max_jump_samples before the next high, and the next high is then the landing, unless the jump timed out
+    first. A high that is a landing cannot start a takeoff, so in a run of consecutive possible landings every
+    second high is a landing.
+
+    Args:
+        data (numpy.array): Processed int16 data of the whole recording, shape (samples, 30).
+        high_threshold (float): Acceleration on takeoff and landing (in Gs).
+        low_threshold (float): Acceleration while airborn (in Gs).
+        min_jump_samples (int): Minimum duration of a jump in samples.
+        max_jump_samples (int): Maximum duration of a jump in samples.
+        minimum_rotation (float): Minimum rotation of a valid jump in degrees.
+
+    Returns:
+        tuple: (takeoffs, landings, valid), arrays with one entry per detected jump. valid is False for jumps that fail
+            is_valid_jump and for jumps too close to either end of the recording to be saved.
+    """
 
-def process_files_and_detect_jumps(index, processed_dir):
+    data = imu_codec.as_samples(data)
+    sample_count = len(data)
+    x_accel = imu_codec.scale_channel(imu_codec.channel_view(data, 0, 'accel', 'x'), 'accel')
+
+    highs = np.flatnonzero(x_accel > high_threshold)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(highs) < 2:
+        return empty, empty, np.zeros(0, dtype=bool)
+
+    # First low at or after every sample, sample_count if there is none
+    low_samples = np.where(x_accel < low_threshold, np.arange(sample_count), sample_count)
+    next_low = np.append(np.minimum.accumulate(low_samples[::-1])[::-1], sample_count)
+
+    # Look at the gap between each high and the next one
+    takeoffs = highs[:-1]
+    landings = highs[1:]
+    first_low = next_low[takeoffs + 1]
+    in_air = (first_low < landings) & (first_low - takeoffs <= max_jump_samples)
+    # While in the air, the landing is seen if it comes before the timeout one sample after max_jump_samples
+    possible_landing = in_air & (landings - takeoffs <= max_jump_samples + 1)
+
+    # A high that is a landing does not start a takeoff. Within a run of possible landings the first gap starts from a
+    # proper takeoff, so takeoffs alternate with landings
+    gap_index = np.arange(len(takeoffs))
+    run_start = np.where(possible_landing & ~np.append(False, possible_landing[:-1]), gap_index, 0)
+    run_start = np.maximum.accumulate(run_start)
+    is_takeoff = (gap_index - run_start) % 2 == 0
+
+    duration = landings - takeoffs
+    detected = possible_landing & is_takeoff & (duration >= min_jump_samples) & (duration <= max_jump_samples)
+    takeoffs = takeoffs[detected]
+    landings = landings[detected]
+
+    # Validate the jumps that can be cut out of the recording
+    end_index = landings + END_BUFFER + 1
+    start_index = end_index - JUMP_LENGTH
+    valid = (start_index >= 0) & (end_index <= sample_count)
+    if np.any(valid):
+        windows = data[start_index[valid, np.newaxis] + np.arange(JUMP_LENGTH)]
+        total_rotation, peak_acceleration = compute_jump_metrics(windows)
+        valid[valid] = check_jump_metrics(total_rotation, peak_acceleration, minimum_rotation)
+    return takeoffs, landings, valid
+
+def read_recording(processed_dir):
     """
-    Processes two consecutive accelerometer data files to detect jumps and save detected jump data.
+    Reads all processed files of a recording into one array, in the order of their file numbers.
 
     Args:
-        index (int): Index of the most recent file. Files index-1 and index-2 will be analyzed for jumps. 
-        Files index-3 and index will be used when saving a jump. This index is based on the naming convention of the files.
+        processed_dir (str): Directory containing the processed files.
 
     Returns:
-        None: Detected jumps are processed and saved to disk. Messages are printed to indicate detected jumps and save status.
-    """
-    
-    global previous_end
-    if index == 3:
-        previous_end = -1
-    
-    PROCESSED_DIR = processed_dir
-    JUMPS_DIR = os.path.join(os.path.dirname(PROCESSED_DIR), 'jumps')	
-
-    print(f'Processing file {index-1} and {index-2} for jumps')
-    # Get all of the files in the filtered_data directory
-    files = glob.glob(os.path.join(PROCESSED_DIR, '*.bin'))
-    files.sort(key=lambda x: int(os.path.splitext(os.path.basename(x))[0]))
-    all_jumps = [] # List of tuples, format is (jump_start_time, jump_end_time)
-
-    if 2 < index < len(files):
-        # Get numpy array of data for index - 1 and index - 2 files
-        data_prev = read_accelerometer_data(files[index - 2])
-        data_curr = read_accelerometer_data(files[index - 1])
-
-        data_pre = read_accelerometer_data(files[index - 3])
-        data_post = read_accelerometer_data(files[index])
-
-        if data_prev is not None and data_curr is not None:
-            # Get the acceleration data
-            x_accel_prev = extract_data(data_prev, 0, ACCEL_SCALE)
-            x_accel_curr = extract_data(data_curr, 0, ACCEL_SCALE)
-            start_time_offset = (index - 2) * READINGS_PER_FILE / SAMPLING_RATE
-            
-            # Combine the two data arrays into one and find the jumps in it
-            jumps = detect_jumps(
-                np.concatenate([x_accel_prev, x_accel_curr]),
-                start_time_offset,
-            )
-            all_jumps.extend(jumps)
-
-        # Process each new jump for saving
-        for jump in all_jumps:
-
-            jump_start_time, jump_end_time = jump
-            print(f"Detected jump from {jump_start_time:.2f}s to {jump_end_time:.2f}s")
-                
-            # Calculate the start and end index in the files, this is the index relative to the concatenation of
-            # data_prev and data_curr.
-            end_index = (int((jump_end_time - index + 2) * READINGS_PER_FILE) + END_BUFFER) * 30 + 30 + (READINGS_PER_FILE * 30)
-            start_index = end_index - (JUMP_LENGTH * 30)
-            print(f'start_index: {start_index}. end_index: {end_index}')
-            
-            if abs(end_index + 3000 - previous_end) <= 20:
-                print("Duplicate Jump Detected")
-                continue
-            previous_end = end_index
-            
-            # Determine what number jump this is
-            jump_files = glob.glob(os.path.join(JUMPS_DIR, 'jump_*.bin'))
-            if jump_files:
-                # Extract numbers from file names and find the maximum
-                jump_counter = max(int(os.path.splitext(os.path.basename(f))[0].split('_')[1]) for f in jump_files) + 1
-            else:
-                jump_counter = 0  # Start from 0 if no files are found
-            
-            # Extract and save jump data
-            jump_data = np.concatenate([data_pre, data_prev, data_curr, data_post])[start_index:end_index]
-            jump_data = jump_data.astype(np.int16)
-            
-            # Check if the jump has the minimum rotation to be considered a jump
-            if is_valid_jump(jump_data):
-                jump_file_path = os.path.join(JUMPS_DIR, f'jump_{jump_counter}.bin')
-                jump_data.tofile(jump_file_path)
-            
-                file_size = os.path.getsize(jump_file_path)
-                print(f"Jump data saved to {jump_file_path}")
-            else:
-                print("Jump not valid")
+        numpy.array: Array of shape (samples, 30).
+    """
+
+    return read_stream(processed_dir)
+
+class JumpDetector:
+    """
+    Incremental jump detector for a stream of processed data. The most recent chunks are kept in a ring buffer and
+    the state machine carries over from one chunk to the next, so every chunk is read and analyzed exactly once and
+    every jump is reported exactly once.
+    """
+
+    def __init__(self, jumps_dir, first_sample=0, on_jump=None):
+        """
+        Args:
+            jumps_dir (str): Directory that valid jumps are saved to.
+            first_sample (int): Sample index of the first chunk that will be added.
+            on_jump (callable): Called with the jump index row (as a dict) and the data of every saved jump.
+        """
+
+        self.jumps_dir = jumps_dir
+        self.on_jump = on_jump
+        self.jump_counter = None
+        self.reset(first_sample)
+
+    def reset(self, first_sample=0):
+        """
+        Clears the buffered data and the state machine, so detection starts over.
+
+        Args:
+            first_sample (int): Sample index of the next chunk that will be added.
+        """
+
+        self.chunks = deque(maxlen=BUFFER_CHUNKS)  # (first sample index, data) of the most recent chunks
+        self.sample_count = first_sample  # Sample index that the next chunk starts at
+        self.state = STATE_GROUNDED
+        self.jump_start = 0
+        self.pending_jumps = deque()  # (takeoff, landing) of detected jumps that are waiting for the data after them
+
+    def add_file(self, index, data):
+        """
+        Adds a processed file by its number. Detection starts over if the file does not directly follow the last one,
+        which happens for the first file of a new recording or when the stream was interrupted.
+
+        Args:
+            index (int): Index of the file. This index is based on the naming convention of the files.
+            data (numpy.array): The processed data of the file.
+
+        Returns:
+            list: File paths of the jumps that were saved.
+        """
+
+        if index == 0 or self.sample_count != index * READINGS_PER_FILE:
+            self.reset(index * READINGS_PER_FILE)
+        return self.add_chunk(data)
+
+    def add_chunk(self, data):
+        """
+        Adds the next chunk of processed data, runs jump detection on it, and saves any jumps that are complete.
+
+        Args:
+            data (numpy.array): Processed int16 data of the chunk that directly follows the previous one.
+
+        Returns:
+            list: File paths of the jumps that were saved.
+        """
+
+        data = imu_codec.as_samples(data)
+        first_sample = self.sample_count
+        self.chunks.append((first_sample, data))
+        self.sample_count += len(data)
+
+        with metrics.timed('detect'):
+            x_accel = imu_codec.scale_channel(imu_codec.channel_view(data, 0, 'accel', 'x'), 'accel')
+            jumps, self.state, self.jump_start = step_jump_state(x_accel, first_sample, self.state, self.jump_start)
+        jumps_detected.inc(len(jumps))
+        for jump_start, jump_end in jumps:
+            print(f"Detected jump from {jump_start / SAMPLING_RATE:.2f}s to {jump_end / SAMPLING_RATE:.2f}s")
+            self.pending_jumps.append((jump_start, jump_end))
+
+        # A jump can be saved once the data END_BUFFER samples after the landing has arrived
+        saved_jumps = []
+        while self.pending_jumps and self.pending_jumps[0][1] + END_BUFFER < self.sample_count:
+            with metrics.timed('save_jump'):
+                jump_file_path = self.save_jump(*self.pending_jumps.popleft())
+            if jump_file_path is not None:
+                saved_jumps.append(jump_file_path)
+        return saved_jumps
+
+    def get_samples(self, start, end):
+        """
+        Returns the buffered data between two sample indices.
+
+        Args:
+            start (int): First sample index.
+            end (int): Sample index after the last sample.
+
+        Returns:
+            numpy.array or None: Array of shape (end - start, 30), or None if the range is no longer buffered.
+        """
+
+        if not self.chunks or start < self.chunks[0][0] or end > self.sample_count:
+            return None
+        data = np.concatenate([chunk for _, chunk in self.chunks])
+        offset = self.chunks[0][0]
+        return data[start - offset:end - offset]
+
+    def save_jump(self, jump_start, jump_end):
+        """
+        Checks a detected jump and, if it is valid, saves its data to the jumps directory and adds it to the jump index.
+
+        Args:
+            jump_start (int): Sample index of the takeoff.
+            jump_end (int): Sample index of the landing.
+
+        Returns:
+            str or None: Path of the saved jump, or None if it was not saved.
+        """
+
+        end_index = jump_end + END_BUFFER + 1
+        start_index = end_index - JUMP_LENGTH
+        print(f'start_index: {start_index}. end_index: {end_index}')
+
+        jump_data = self.get_samples(start_index, end_index)
+        if jump_data is None:
+            print("Jump data is not available")
+            jumps_rejected.inc(reason='unavailable')
+            return None
+
+        # Check if the jump has the minimum rotation to be considered a jump
+        total_rotation, peak_acceleration = compute_jump_metrics(jump_data[np.newaxis])
+        print(f"rotation: {total_rotation[0]}")
+        print(f"max: {peak_acceleration[0]}")
+        if not check_jump_metrics(total_rotation[0], peak_acceleration[0]):
+            print("Jump not valid")
+            jumps_rejected.inc(reason='invalid')
+            return None
+
+        # Determine what number jump this is, the index only needs to be checked for the first jump
+        if self.jump_counter is None:
+            self.jump_counter = jump_index.next_jump_id(self.jumps_dir)
+
+        file_name = f'jump_{self.jump_counter}.bin'
+        jump_file_path = os.path.join(self.jumps_dir, file_name)
+        jump_data.tofile(jump_file_path)
+        jump = dict(jump_id=self.jump_counter, file_name=file_name, start_sample=start_index, end_sample=end_index,
+                    first_chunk=start_index // READINGS_PER_FILE, last_chunk=(end_index - 1) // READINGS_PER_FILE,
+                    takeoff_sample=jump_start, landing_sample=jump_end,
+                    rotation=float(total_rotation[0]), peak_acceleration=float(peak_acceleration[0]),
+                    airtime=(jump_end - jump_start) / SAMPLING_RATE)
+        jump_index.add_jump(self.jumps_dir, **jump)
+        self.jump_counter += 1
+        jumps_saved.inc()
+        print(f"Jump data saved to {jump_file_path}")
+        if self.on_jump is not None:
+            self.on_jump(jump, jump_data)
+        return jump_file_path
+
+def index_existing_jumps(jumps_dir):
+    """
+    Adds jump files that are not in the jump index yet, such as jumps saved before the index existed. Their metrics
+    are computed from the files, the sample range in the recording is unknown.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        int: The number of jumps that were added.
+    """
+
+    indexed_files = {jump['file_name'] for jump in jump_index.list_jumps(jumps_dir)}
+    jump_files = [f for f in glob.glob(os.path.join(jumps_dir, 'jump_*.bin')) if os.path.basename(f) not in indexed_files]
+    jumps = [(f, read_accelerometer_data(f)) for f in jump_files]
+    jumps = [(f, data) for f, data in jumps if data is not None and data.size == JUMP_LENGTH * SENSOR_COUNT * 6]
+    if not jumps:
+        return 0
+
+    jump_files = [f for f, _ in jumps]
+    stack = np.stack([data for _, data in jumps]).reshape((len(jumps), JUMP_LENGTH, SENSOR_COUNT * 6))
+    total_rotation, peak_acceleration = compute_jump_metrics(stack)
+    for file_path, rotation, acceleration in zip(jump_files, total_rotation, peak_acceleration):
+        file_name = os.path.basename(file_path)
+        jump_index.add_jump(jumps_dir, jump_id=int(os.path.splitext(file_name)[0].split('_')[1]), file_name=file_name,
+                            rotation=float(rotation), peak_acceleration=float(acceleration))
+    return len(jump_files)
+
+# Jump detectors of the data streams currently being processed, by processed data directory
+detectors = {}
+
+def process_files_and_detect_jumps(index, processed_dir, data=None):
+    """
+    Adds a newly processed file to the jump detector of its directory. Jumps are saved to the 'jumps' directory
+    next to processed_dir as soon as the data after them has arrived.
+
+    Args:
+        index (int): Index of the newly processed file. This index is based on the naming convention of the files.
+        processed_dir (str): Directory containing the processed files.
+        data (numpy.array): The processed data of the file. If not given, it is read from processed_dir.
+
+    Returns:
+        list: File paths of the jumps that were saved.
+    """
 
+    detector = detectors.get(processed_dir)
+    if detector is None:
+        detector = JumpDetector(os.path.join(os.path.dirname(processed_dir), 'jumps'))
+        detectors[processed_dir] = detector
+
+    if data is None:
+        data = read_accelerometer_data(os.path.join(processed_dir, f'{index}.bin'))
+        if data is None:
+            return []
+
+    print(f'Processing file {index} for jumps')
+    return detector.add_file(index, data)
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    # Re-run jump detection over recordings without writing anything, e.g. after changing the thresholds
+    recordings = sys.argv[1:] or sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+    start_time = time.perf_counter()
+    for recording in recordings:
+        takeoffs, landings, valid = detect_jumps_batch(read_recording(os.path.join(recording, 'processed_data')))
+        print(f"{os.path.basename(recording)}: {len(landings)} jumps detected, {np.count_nonzero(valid)} valid")
+        for landing in landings[valid]:
+            print(f"    landing at {landing / SAMPLING_RATE:.2f}s")
+    print(f"Processed {len(recordings)} recordings in {time.perf_counter() - start_time:.3f}s")
@@ -0,0 +1,158 @@
+import numpy as np
+
+'''
+Layout and scaling of the IMU data. Every reading (frame) holds the 3 accelerometer axes followed by the 3 gyroscope
+axes of each of the 5 sensors as little-endian int16 counts, 60 bytes in total. The functions here give views of int16
+buffers in that layout without copying them, and scale counts to g and deg/s as float32 with precomputed factors.
+'''
+
+# Constants
+ACCEL_SCALE = 16  # +/- 16 g
+GYRO_SCALE = 2000  # +/- 2000 deg/second
+SENSOR_COUNT = 5
+AXES = {'x': 0, 'y': 1, 'z': 2}
+KINDS = {'accel': 0, 'gyro': 3}  # Offset of the first axis of each kind within the 6 channels of a sensor
+CHANNELS_PER_SENSOR = 6
+CHANNELS = SENSOR_COUNT * CHANNELS_PER_SENSOR
+SAMPLE_DTYPE = np.dtype('<i2')
+FRAME_SIZE = CHANNELS * SAMPLE_DTYPE.itemsize  # Bytes of one reading
+
+# One reading as a structured type, e.g. frames['sensor3']['accel'][:, 1] is the y-axis acceleration of sensor 3
+SENSOR_DTYPE = np.dtype([('accel', SAMPLE_DTYPE, (3,)), ('gyro', SAMPLE_DTYPE, (3,))])
+FRAME_DTYPE = np.dtype([(f'sensor{n}', SENSOR_DTYPE) for n in range(SENSOR_COUNT)])
+
+# Factors from counts to g and deg/s, exact powers of two for the accelerometer
+ACCEL_FACTOR = np.float32(ACCEL_SCALE / 32768.0)
+GYRO_FACTOR = np.float32(GYRO_SCALE / 32768.0)
+FACTORS = {'accel': ACCEL_FACTOR, 'gyro': GYRO_FACTOR}
+SCALE_VECTOR = np.tile(np.array([ACCEL_FACTOR] * 3 + [GYRO_FACTOR] * 3, dtype=np.float32), SENSOR_COUNT)
+
+def channel_index(sensor, kind, axis):
+    """
+    Returns the position of a channel within a reading.
+
+    Args:
+        sensor (int): Index of the sensor, 0 to 4.
+        kind (str): 'accel' or 'gyro'.
+        axis (str): 'x', 'y' or 'z'.
+
+    Returns:
+        int: The channel index, 0 to 29.
+    """
+
+    return sensor * CHANNELS_PER_SENSOR + KINDS[kind] + AXES[axis]
+
+def as_samples(buffer):
+    """
+    Views a buffer of readings as an int16 array of shape (readings, 30), without copying it.
+
+    Args:
+        buffer (bytes or numpy.array): Raw bytes, or an int16 array of any shape holding whole readings.
+
+    Returns:
+        numpy.array: The int16 view.
+    """
+
+    if isinstance(buffer, np.ndarray):
+        return buffer.reshape((-1, CHANNELS))
+    return np.frombuffer(buffer, dtype=SAMPLE_DTYPE).reshape((-1, CHANNELS))
+
+def as_frames(buffer):
+    """
+    Views a buffer of readings as an array of FRAME_DTYPE records, one per reading, without copying it.
+
+    Args:
+        buffer (bytes or numpy.array): Raw bytes, or a contiguous int16 array holding whole readings.
+
+    Returns:
+        numpy.array: The structured view of shape (readings,).
+    """
+
+    return np.ascontiguousarray(as_samples(buffer)).view(FRAME_DTYPE).reshape(-1)
+
+def sensor_view(samples, sensor):
+    """
+    Views the 6 channels of one sensor.
+
+    Args:
+        samples (numpy.array): Readings of shape (readings, 30).
+        sensor (int): Index of the sensor.
+
+    Returns:
+        numpy.array: View of shape (readings, 6).
+    """
+
+    return samples[:, sensor * CHANNELS_PER_SENSOR:(sensor + 1) * CHANNELS_PER_SENSOR]
+
+def kind_view(samples, kind):
+    """
+    Views one kind of channel of every sensor.
+
+    Args:
+        samples (numpy.array): Readings of shape (readings, 30).
+        kind (str): 'accel' or 'gyro'.
+
+    Returns:
+        numpy.array: View of shape (readings, 5, 3).
+    """
+
+    offset = KINDS[kind]
+    return samples.reshape((-1, SENSOR_COUNT, CHANNELS_PER_SENSOR))[:, :, offset:offset + 3]
+
+def channel_view(samples, sensor, kind, axis):
+    """
+    Views a single channel.
+
+    Args:
+        samples (numpy.array): Readings of shape (..., 30), e.g. (readings, 30) or (jumps, readings, 30).
+        sensor (int): Index of the sensor.
+        kind (str): 'accel' or 'gyro'.
+        axis (str): 'x', 'y' or 'z'.
+
+    Returns:
+        numpy.array: Strided view of shape (...).
+    """
+
+    return samples[..., channel_index(sensor, kind, axis)]
+
+def scale(samples, out=None):
+    """
+    Scales readings to g and deg/s.
+
+    Args:
+        samples (numpy.array): int16 readings of shape (..., 30).
+        out (numpy.array): float32 array of the same shape to write the result to, so repeated calls do not allocate.
+
+    Returns:
+        numpy.array: The float32 scaled readings, out if it was given.
+    """
+
+    return np.multiply(samples, SCALE_VECTOR, out=out, dtype=np.float32)
+
+def scale_channel(values, kind, out=None):
+    """
+    Scales the values of channels of one kind to g or deg/s.
+
+    Args:
+        values (numpy.array): int16 values, e.g. from channel_view.
+        kind (str): 'accel' or 'gyro'.
+        out (numpy.array): float32 array of the same shape to write the result to.
+
+    Returns:
+        numpy.array: The float32 scaled values.
+    """
+
+    return np.multiply(values, FACTORS[kind], out=out, dtype=np.float32)
+
+def to_counts(scaled):
+    """
+    Converts scaled readings back to int16 counts, the inverse of scale.
+
+    Args:
+        scaled (numpy.array): Readings in g and deg/s of shape (..., 30).
+
+    Returns:
+        numpy.array: The int16 counts, clipped to the range of the sensors.
+    """
+
+    return np.clip(np.round(scaled / SCALE_VECTOR), -32768, 32767).astype(SAMPLE_DTYPE)
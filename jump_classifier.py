@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import queue
+import threading
+import importlib.util
+import numpy as np
+import jump_index
+import metrics
+import imu_codec
+import jump_features
+
+'''
+Classifies saved jumps with the LSTM trained in ai_model/training.ipynb. The model is loaded once, either as a
+TorchScript export or as a checkpoint of its weights, and runs on the CPU in a background thread. Jumps that are saved
+close together are classified as one batch, and the predicted type and its probability are recorded in the jump index.
+Without torch or a trained LSTM, the nearest centroid classifier of jump_features.py is used if it has been trained.
+
+Importing torch and loading the model takes seconds, so it happens in the background thread of the classifier. Jumps
+saved in the meantime wait in its queue.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.join(BASE_DIR, 'ai_model/jump_classifier.pt')  # TorchScript export, see export_model
+CHECKPOINT_PATH = os.path.join(BASE_DIR, 'ai_model/jump_classifier.pth')  # Weights saved by the training notebook
+JUMP_TYPES = jump_index.JUMP_TYPES  # Classes of the model, in the order of its outputs
+JUMP_LENGTH = 150
+SENSOR_COUNT = 5
+BATCH_WAIT = 0.02  # Seconds to wait for more jumps to classify together once one has arrived
+MAX_BATCH = 32  # Maximum number of jumps classified together
+THREADS = 2  # CPU threads used for inference, the rest are left to the pipeline
+
+jumps_classified = metrics.counter('jumps_classified_total', 'Saved jumps classified by the jump classifier, by type.')
+
+def torch_installed():
+    """
+    Checks if torch can be imported, without importing it.
+    """
+
+    return importlib.util.find_spec('torch') is not None
+
+def load_model(model_path=MODEL_PATH, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Loads the model for inference on the CPU, preferring the TorchScript export over the checkpoint.
+
+    Args:
+        model_path (str): Path of the TorchScript export.
+        checkpoint_path (str): Path of the checkpoint of the weights.
+
+    Returns:
+        torch.nn.Module or None: The model, or None if torch is not installed or there is no model.
+    """
+
+    if not torch_installed():
+        print("torch is not installed, the LSTM jump classifier is not available")
+        return None
+    if not os.path.exists(model_path) and not os.path.exists(checkpoint_path):
+        print(f"No jump classifier found at {model_path}")
+        return None
+
+    import torch
+
+    torch.set_num_threads(THREADS)
+    if os.path.exists(model_path):
+        model = torch.jit.load(model_path, map_location='cpu')
+    else:
+        from jump_model import JumpClassifier
+
+        model = JumpClassifier()
+        model.load_state_dict(torch.load(checkpoint_path, map_location='cpu'))
+    model.eval()
+
+    # The first run is much slower than the ones after it, so it is done before the first jump arrives
+    with torch.inference_mode():
+        model(torch.zeros((1, JUMP_LENGTH, SENSOR_COUNT * 6)))
+    return model
+
+def classify(model, jumps):
+    """
+    Predicts the type of a batch of jumps.
+
+    Args:
+        model (torch.nn.Module or jump_features.CentroidClassifier): The model from load_model, or the classifier
+            from jump_features.load_classifier.
+        jumps (numpy.array): Raw int16 jump data of shape (jumps, JUMP_LENGTH, 30).
+
+    Returns:
+        tuple: (types, confidences), the predicted type and its probability for every jump.
+    """
+
+    if isinstance(model, jump_features.CentroidClassifier):
+        return model.classify(jumps)
+
+    import torch
+
+    with torch.inference_mode():
+        probabilities = torch.softmax(model(torch.from_numpy(imu_codec.scale(jumps))), dim=1).numpy()
+    predicted = np.argmax(probabilities, axis=1)
+    return [JUMP_TYPES[i] for i in predicted], probabilities[np.arange(len(predicted)), predicted]
+
+class ClassificationWorker:
+    """
+    Classifies submitted jumps in a background thread, so saving a jump does not wait for the model.
+    """
+
+    def __init__(self, model=None, load=None):
+        """
+        Args:
+            model (torch.nn.Module or jump_features.CentroidClassifier): The model, see classify.
+            load (callable): Returns the model or None, called in the background thread if no model is given.
+        """
+
+        self.model = model
+        self.load = load
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, jumps_dir, jump, jump_data, on_result=None):
+        """
+        Queues a saved jump to be classified.
+
+        Args:
+            jumps_dir (str): The jumps directory whose index the result is recorded in.
+            jump (dict): The jump index row of the jump.
+            jump_data (numpy.array): The saved data of the jump, shape (JUMP_LENGTH, 30).
+            on_result (callable): Called with (jump, type, confidence) once the jump is classified.
+        """
+
+        self.queue.put((jumps_dir, jump, jump_data, on_result))
+
+    def next_batch(self):
+        """
+        Waits for a jump and collects the jumps that arrive shortly after it.
+
+        Returns:
+            list: Up to MAX_BATCH submitted jumps.
+        """
+
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + BATCH_WAIT
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        """
+        Classifies the submitted jumps batch by batch and records the results.
+        """
+
+        if self.model is None:
+            try:
+                self.model = self.load()
+            except Exception as e:
+                print(f"Error while loading the jump classifier, jumps will not be classified: {e}")
+        while True:
+            batch = self.next_batch()
+            try:
+                if self.model is None:
+                    continue  # No model could be loaded, the jumps stay unclassified
+                with metrics.timed('classify'):
+                    types, confidences = classify(self.model, np.stack([jump_data for _, _, jump_data, _ in batch]))
+                for (jumps_dir, jump, _, on_result), jump_type, confidence in zip(batch, types, confidences):
+                    jump_index.set_classification(jumps_dir, jump['jump_id'], jump_type, float(confidence))
+                    jumps_classified.inc(type=jump_type)
+                    print(f"{jump['file_name']} classified as {jump_type} ({confidence:.0%})")
+                    if on_result is not None:
+                        on_result(jump, jump_type, float(confidence))
+            except Exception as e:
+                print(f"Error while classifying jumps: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def wait(self):
+        """
+        Blocks until every submitted jump has been classified.
+        """
+
+        self.queue.join()
+
+def start_classifier(model_path=MODEL_PATH, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Starts a worker that loads the model in the background, falling back to the nearest centroid classifier without
+    the LSTM.
+
+    Returns:
+        ClassificationWorker or None: The worker, or None if there is no model to classify with.
+    """
+
+    lstm_found = torch_installed() and (os.path.exists(model_path) or os.path.exists(checkpoint_path))
+    if not lstm_found and not os.path.exists(jump_features.CLASSIFIER_PATH):
+        print("Jumps will not be classified")
+        return None
+
+    def load():
+        model = load_model(model_path, checkpoint_path)
+        if model is None:
+            model = jump_features.load_classifier()
+            if model is None:
+                print("Jumps will not be classified")
+            else:
+                print("Classifying jumps with the nearest centroid classifier")
+        return model
+
+    return ClassificationWorker(load=load)
+
+def export_model(checkpoint_path=CHECKPOINT_PATH, model_path=MODEL_PATH):
+    """
+    Compiles a checkpoint of the weights to TorchScript, which loads without the model code and runs faster.
+
+    Args:
+        checkpoint_path (str): Path of the checkpoint.
+        model_path (str): Path the TorchScript export is written to.
+    """
+
+    import torch
+    from jump_model import JumpClassifier
+
+    model = JumpClassifier()
+    model.load_state_dict(torch.load(checkpoint_path, map_location='cpu'))
+    model.eval()
+    torch.jit.save(torch.jit.script(model), model_path)
+
+if __name__ == '__main__':
+    if not torch_installed():
+        print("torch is not installed")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'export':
+        # e.g. python jump_classifier.py export ai_model/jump_classifier.pth ai_model/jump_classifier.pt
+        export_model(*sys.argv[2:4])
+        print("Exported the jump classifier")
+    elif len(sys.argv) > 2 and sys.argv[1] == 'classify':
+        # Classify the indexed jumps of recordings, e.g. python jump_classifier.py classify all
+        model = load_model()
+        for recording in jump_index.recording_dirs(sys.argv[2:]):
+            jumps_dir = os.path.join(recording, 'jumps')
+            jumps = [jump for jump in jump_index.list_jumps(jumps_dir)
+                     if os.path.exists(os.path.join(jumps_dir, jump['file_name']))]
+            if model is None or not jumps:
+                continue
+            data = np.stack([np.fromfile(os.path.join(jumps_dir, jump['file_name']), dtype=np.int16) for jump in jumps])
+            types, confidences = classify(model, data.reshape((len(jumps), JUMP_LENGTH, SENSOR_COUNT * 6)))
+            for jump, jump_type, confidence in zip(jumps, types, confidences):
+                jump_index.set_classification(jumps_dir, jump['jump_id'], jump_type, float(confidence))
+            print(f"{os.path.basename(recording)}: " + ', '.join(f"{t} {types.count(t)}" for t in JUMP_TYPES if t in types))
+    else:
+        print("Usage: python jump_classifier.py export [checkpoint] [model]")
+        print("       python jump_classifier.py classify <recording dir>... | all")
@@ -0,0 +1,282 @@
+import os
+import sys
+import glob
+import time
+import numpy as np
+import imu_codec
+import jump_index
+from identify_jumps import (check_jump_metrics, JUMP_LENGTH, END_BUFFER, HIGH_THRESHOLD, SAMPLING_RATE,
+                            MINIMUM_ROTATION)
+
+'''
+Features of saved jumps, computed for a whole stack of jumps at once with array operations. A stack of shape
+(jumps, JUMP_LENGTH, 30) from a jumps directory or the labeled data becomes a feature matrix with one row per jump and
+one column per name in FEATURE_NAMES. The features cover the validity checks of identify_jumps.py and feed a nearest
+centroid classifier, a lightweight alternative to the LSTM that needs nothing but numpy.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+CLASSIFIER_PATH = os.path.join(BASE_DIR, 'ai_model/jump_centroids.npz')
+JUMP_TYPES = jump_index.JUMP_TYPES
+SENSOR_COUNT = imu_codec.SENSOR_COUNT
+LANDING_INDEX = JUMP_LENGTH - END_BUFFER - 1  # Sample of the landing within a saved jump, see JumpDetector.save_jump
+LANDING_WINDOW = 5  # Samples before the landing that still count towards the landing peak
+TAKEOFF_HALF = JUMP_LENGTH // 2  # The takeoff peak is taken from the first half of the jump, as in compute_jump_metrics
+
+FEATURE_NAMES = (
+    [f'rotation_{sensor}_{axis}' for sensor in range(SENSOR_COUNT) for axis in 'xyz']  # Degrees, signed
+    + ['total_rotation',  # Absolute x-axis rotation of sensor 0 in degrees, checked by check_jump_metrics
+       'peak_acceleration',  # Peak y-axis acceleration of sensor 3 in the first half in Gs, checked as well
+       'airtime']  # Seconds from the last takeoff reading to the landing
+    + [f'takeoff_peak_{sensor}' for sensor in range(SENSOR_COUNT)]  # Peak acceleration magnitude in Gs
+    + [f'landing_peak_{sensor}' for sensor in range(SENSOR_COUNT)]
+    + [f'accel_energy_{sensor}' for sensor in range(SENSOR_COUNT)]  # Mean squared acceleration magnitude in Gs^2
+    + [f'gyro_energy_{sensor}' for sensor in range(SENSOR_COUNT)]  # Mean squared rotation rate in (deg/s)^2
+)
+FEATURES = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+def load_jumps(jumps_dir):
+    """
+    Reads the jump files of a jumps directory into one stack.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        tuple: (jumps, file names), jumps is an int16 array of shape (jumps, JUMP_LENGTH, 30). Files that are not a
+            complete jump are left out.
+    """
+
+    jump_size = JUMP_LENGTH * imu_codec.FRAME_SIZE
+    files = sorted(f for f in glob.glob(os.path.join(jumps_dir, 'jump_*.bin')) if os.path.getsize(f) == jump_size)
+    jumps = np.empty((len(files), JUMP_LENGTH, imu_codec.CHANNELS), dtype=imu_codec.SAMPLE_DTYPE)
+    for i, file_path in enumerate(files):
+        jumps[i] = imu_codec.as_samples(np.fromfile(file_path, dtype=imu_codec.SAMPLE_DTYPE))
+    return jumps, [os.path.basename(f) for f in files]
+
+def magnitude_weights():
+    """
+    Builds the matrix that sums the squared axes of every sensor: squared readings of shape (..., 30) times the
+    matrix give the squared acceleration magnitude of the 5 sensors followed by their squared rotation rate.
+    """
+
+    weights = np.zeros((imu_codec.CHANNELS, 2 * SENSOR_COUNT), dtype=np.float32)
+    for sensor in range(SENSOR_COUNT):
+        for k, kind in enumerate(('accel', 'gyro')):
+            for axis in 'xyz':
+                weights[imu_codec.channel_index(sensor, kind, axis), k * SENSOR_COUNT + sensor] = 1
+    return weights
+
+MAGNITUDE_WEIGHTS = magnitude_weights()
+
+def compute_features(jumps):
+    """
+    Computes the features of a stack of jumps, see FEATURE_NAMES.
+
+    Args:
+        jumps (numpy.array): int16 counts of shape (jumps, JUMP_LENGTH, 30), or the same scaled to g and deg/s as
+            float32, e.g. from dataset.load_dataset.
+
+    Returns:
+        numpy.array: float32 feature matrix of shape (jumps, len(FEATURE_NAMES)).
+    """
+
+    # Counts are only scaled where needed, mostly by scaling the per-jump results instead of every reading
+    counts = jumps.dtype.kind == 'i'
+    factors = imu_codec.SCALE_VECTOR if counts else np.ones(imu_codec.CHANNELS, dtype=np.float32)
+    jump_count, sample_count = jumps.shape[:2]
+    features = np.empty((jump_count, len(FEATURE_NAMES)), dtype=np.float32)
+
+    # Rotation on every axis, integrated from the counts like compute_jump_metrics so the validity checks agree
+    sums = np.sum(jumps, axis=1, dtype=np.int64 if counts else np.float64)
+    rotation = (sums * (factors / SAMPLING_RATE)).reshape((jump_count, SENSOR_COUNT, 6))[..., 3:]
+    features[:, :SENSOR_COUNT * 3] = rotation.reshape((jump_count, -1))
+    features[:, FEATURES['total_rotation']] = np.abs(rotation[:, 0, 0])
+    peak_counts = np.max(imu_codec.channel_view(jumps[:, :TAKEOFF_HALF], 3, 'accel', 'y'), axis=1)
+    features[:, FEATURES['peak_acceleration']] = peak_counts * factors[imu_codec.channel_index(3, 'accel', 'y')]
+
+    # The takeoff is the last reading above the high threshold before the landing, as in step_jump_state
+    x_accel = imu_codec.channel_view(jumps[:, LANDING_INDEX - 1::-1], 0, 'accel', 'x')
+    above = x_accel * factors[imu_codec.channel_index(0, 'accel', 'x')] > HIGH_THRESHOLD
+    samples_in_air = np.where(above.any(axis=1), np.argmax(above, axis=1) + 1, 0)
+    features[:, FEATURES['airtime']] = samples_in_air / SAMPLING_RATE
+
+    # Squared magnitudes of every reading, summed over the axes with one matrix product. The result has shape
+    # (jumps, 10, samples) so that reducing over the samples runs over contiguous memory
+    squared = np.square(jumps, dtype=np.float32)
+    weights = (MAGNITUDE_WEIGHTS * np.square(factors)[:, np.newaxis]).T
+    magnitudes = np.matmul(weights, squared.transpose(0, 2, 1))
+    first = FEATURES['takeoff_peak_0']
+    features[:, first:first + SENSOR_COUNT] = np.sqrt(np.max(magnitudes[:, :SENSOR_COUNT, :TAKEOFF_HALF], axis=2))
+    first = FEATURES['landing_peak_0']
+    landing = magnitudes[:, :SENSOR_COUNT, LANDING_INDEX - LANDING_WINDOW:]
+    features[:, first:first + SENSOR_COUNT] = np.sqrt(np.max(landing, axis=2))
+    energy = np.mean(magnitudes, axis=2)
+    first = FEATURES['accel_energy_0']
+    features[:, first:first + SENSOR_COUNT] = energy[:, :SENSOR_COUNT]
+    first = FEATURES['gyro_energy_0']
+    features[:, first:first + SENSOR_COUNT] = energy[:, SENSOR_COUNT:]
+    return features
+
+def valid_jumps(features, minimum_rotation=MINIMUM_ROTATION):
+    """
+    Applies the validity checks of identify_jumps.py to a feature matrix.
+
+    Args:
+        features (numpy.array): Features from compute_features.
+        minimum_rotation (float): Minimum rotation of a valid jump in degrees.
+
+    Returns:
+        numpy.array: If each jump is valid.
+    """
+
+    return check_jump_metrics(features[:, FEATURES['total_rotation']], features[:, FEATURES['peak_acceleration']],
+                              minimum_rotation)
+
+class CentroidClassifier:
+    """
+    Nearest centroid classifier over standardized jump features. Each jump type is represented by the mean features
+    of its labeled jumps, and a jump is given the type whose mean is closest.
+    """
+
+    def __init__(self, mean, scale, centroids, jump_types=JUMP_TYPES):
+        """
+        Args:
+            mean (numpy.array): Mean of every feature over the training jumps.
+            scale (numpy.array): Standard deviation of every feature, features are divided by it.
+            centroids (numpy.array): Mean standardized features of every jump type, shape (types, features).
+            jump_types (list): The jump types, in the order of the centroids.
+        """
+
+        self.mean = mean
+        self.scale = scale
+        self.centroids = centroids
+        self.jump_types = list(jump_types)
+
+    @classmethod
+    def fit(cls, features, labels, jump_types=JUMP_TYPES):
+        """
+        Computes the centroids of labeled jumps.
+
+        Args:
+            features (numpy.array): Features from compute_features.
+            labels (numpy.array): Index of the jump type of every jump.
+            jump_types (list): The jump types.
+
+        Returns:
+            CentroidClassifier: The classifier.
+        """
+
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1
+        standardized = (features - mean) / scale
+        centroids = np.stack([standardized[labels == label].mean(axis=0) if np.any(labels == label)
+                              else np.full(features.shape[1], np.inf) for label in range(len(jump_types))])
+        return cls(mean, scale, centroids, jump_types)
+
+    def predict(self, features):
+        """
+        Predicts the jump type of every jump.
+
+        Args:
+            features (numpy.array): Features from compute_features.
+
+        Returns:
+            tuple: (labels, confidences), the index of the predicted type and a probability-like score for it,
+                from a softmax over the negative squared distances to the centroids.
+        """
+
+        standardized = (features - self.mean) / self.scale
+        distances = np.sum((standardized[:, np.newaxis, :] - self.centroids[np.newaxis]) ** 2, axis=2)
+        labels = np.argmin(distances, axis=1)
+        weights = np.exp(-(distances - distances[np.arange(len(labels)), labels][:, np.newaxis]) / 2)
+        return labels, 1 / weights.sum(axis=1)
+
+    def classify(self, jumps):
+        """
+        Predicts the type of a stack of jumps, with the interface of jump_classifier.classify.
+
+        Args:
+            jumps (numpy.array): Raw int16 jump data of shape (jumps, JUMP_LENGTH, 30).
+
+        Returns:
+            tuple: (types, confidences), the predicted type and its score for every jump.
+        """
+
+        labels, confidences = self.predict(compute_features(jumps))
+        return [self.jump_types[label] for label in labels], confidences
+
+    def save(self, path=CLASSIFIER_PATH):
+        """
+        Saves the classifier as a .npz file.
+        """
+
+        np.savez(path, mean=self.mean, scale=self.scale, centroids=self.centroids, jump_types=np.array(self.jump_types),
+                 feature_names=np.array(FEATURE_NAMES))
+
+def load_classifier(path=CLASSIFIER_PATH):
+    """
+    Loads a classifier saved with CentroidClassifier.save.
+
+    Returns:
+        CentroidClassifier or None: The classifier, or None if there is none or it was trained on other features.
+    """
+
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        if saved['feature_names'].tolist() != FEATURE_NAMES:
+            print(f"{path} was trained on different features, train it again")
+            return None
+        return CentroidClassifier(saved['mean'], saved['scale'], saved['centroids'], saved['jump_types'].tolist())
+
+def cross_validate(features, labels, folds=5, seed=0):
+    """
+    Estimates the accuracy of the classifier by training it on all but one fold of the jumps and testing it on the
+    remaining fold, for every fold.
+
+    Args:
+        features (numpy.array): Features from compute_features.
+        labels (numpy.array): Index of the jump type of every jump.
+        folds (int): Number of folds.
+        seed (int): Seed of the split into folds.
+
+    Returns:
+        float: Fraction of the jumps whose type was predicted correctly.
+    """
+
+    fold = np.random.default_rng(seed).permutation(len(labels)) % folds
+    correct = 0
+    for k in range(folds):
+        classifier = CentroidClassifier.fit(features[fold != k], labels[fold != k])
+        predicted, _ = classifier.predict(features[fold == k])
+        correct += np.count_nonzero(predicted == labels[fold == k])
+    return correct / len(labels)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'train':
+        # Train the classifier on the labeled data, e.g. python jump_features.py train
+        import dataset  # Only needed for training, it imports torch if it is installed
+
+        data, labels = dataset.load_dataset()
+        features = compute_features(np.asarray(data))
+        print(f"Cross-validated accuracy on {len(labels)} jumps: {cross_validate(features, labels):.0%}")
+        CentroidClassifier.fit(features, labels).save()
+        print(f"Saved the classifier to {CLASSIFIER_PATH}")
+    elif len(sys.argv) > 2 and sys.argv[1] == 'features':
+        # Summarize the jumps of jumps directories, e.g. python jump_features.py features data/recordings/*/jumps
+        stacks = [load_jumps(jumps_dir)[0] for jumps_dir in sys.argv[2:]]
+        jumps = np.concatenate(stacks) if stacks else np.zeros((0, JUMP_LENGTH, imu_codec.CHANNELS), np.int16)
+        start_time = time.perf_counter()
+        features = compute_features(jumps)
+        seconds = time.perf_counter() - start_time
+        print(f"Computed {len(FEATURE_NAMES)} features of {len(jumps)} jumps in {seconds * 1000:.1f}ms, "
+              f"{np.count_nonzero(valid_jumps(features))} valid")
+        for name, column in zip(FEATURE_NAMES, features.T):
+            if len(column):
+                print(f"    {name:20} mean {column.mean():10.2f}  min {column.min():10.2f}  max {column.max():10.2f}")
+    else:
+        print("Usage: python jump_features.py train")
+        print("       python jump_features.py features <jumps dir>...")
@@ -0,0 +1,251 @@
+import os
+import sys
+import glob
+import shutil
+import sqlite3
+from contextlib import closing
+
+'''
+Persistent index of the jumps of a recording, stored in the jumps directory next to the jump files. Each row holds the
+sample range and metrics of a jump, computed once when it is detected, so listing and summarizing jumps does not need
+to scan the directory or decode the jump files.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+INDEX_NAME = 'index.sqlite'  # Name of the index file inside a jumps directory
+JUMP_TYPES = ['axel', 'flip', 'loop', 'lutz', 'salchow', 'toe']
+
+COLUMNS = ['jump_id', 'file_name', 'start_sample', 'end_sample', 'first_chunk', 'last_chunk', 'takeoff_sample',
+           'landing_sample', 'rotation', 'peak_acceleration', 'airtime', 'jump_type', 'confidence']
+ADDED_COLUMNS = {'jump_type': 'TEXT', 'confidence': 'REAL'}  # Columns added after the first version of the index
+
+def index_path(jumps_dir):
+    """
+    Returns the path of the index of a jumps directory.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        str: Path of the index file.
+    """
+
+    return os.path.join(jumps_dir, INDEX_NAME)
+
+def open_index(jumps_dir):
+    """
+    Opens the index of a jumps directory, creating it if it does not exist.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        sqlite3.Connection: Connection to the index, rows can be accessed by column name.
+    """
+
+    connection = sqlite3.connect(index_path(jumps_dir))
+    connection.row_factory = sqlite3.Row
+    connection.execute('''CREATE TABLE IF NOT EXISTS jumps (
+        jump_id INTEGER PRIMARY KEY,  -- Number in the jump file name, jump_<jump_id>.bin
+        file_name TEXT NOT NULL,
+        start_sample INTEGER,  -- Sample range of the saved data in the recording
+        end_sample INTEGER,
+        first_chunk INTEGER,  -- Numbers of the first and last file the saved data was taken from
+        last_chunk INTEGER,
+        takeoff_sample INTEGER,
+        landing_sample INTEGER,
+        rotation REAL,  -- Total rotation in degrees
+        peak_acceleration REAL,  -- Peak acceleration at takeoff in Gs
+        airtime REAL,  -- Seconds between takeoff and landing
+        jump_type TEXT,  -- Type predicted by the jump classifier, one of JUMP_TYPES
+        confidence REAL  -- Probability the classifier gave the predicted type
+    )''')
+
+    # Indexes created before a column existed get it added, the value is unknown for the jumps already in them
+    existing_columns = {row['name'] for row in connection.execute('PRAGMA table_info(jumps)')}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in existing_columns:
+            connection.execute(f'ALTER TABLE jumps ADD COLUMN {column} {column_type}')
+    return connection
+
+def has_index(jumps_dir):
+    """
+    Checks if a jumps directory has an index.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        bool: True if the index exists.
+    """
+
+    return os.path.exists(index_path(jumps_dir))
+
+def next_jump_id(jumps_dir):
+    """
+    Determines the number of the next jump of a jumps directory. Jump files without an index row, saved before the
+    index existed, are also taken into account.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        int: The next jump number.
+    """
+
+    jump_id = -1
+    if has_index(jumps_dir):
+        with closing(open_index(jumps_dir)) as connection:
+            jump_id = connection.execute('SELECT MAX(jump_id) FROM jumps').fetchone()[0]
+            jump_id = -1 if jump_id is None else jump_id
+    for file_path in glob.glob(os.path.join(jumps_dir, 'jump_*.bin')):
+        jump_id = max(jump_id, int(os.path.splitext(os.path.basename(file_path))[0].split('_')[1]))
+    return jump_id + 1
+
+def add_jump(jumps_dir, **jump):
+    """
+    Adds a jump to the index of a jumps directory.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+        **jump: The values of the row, by column name. jump_id and file_name are required.
+    """
+
+    columns = [column for column in COLUMNS if column in jump]
+    with closing(open_index(jumps_dir)) as connection, connection:
+        connection.execute(f"INSERT OR REPLACE INTO jumps ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                           [jump[column] for column in columns])
+
+def set_classification(jumps_dir, jump_id, jump_type, confidence):
+    """
+    Records the type predicted for an indexed jump.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+        jump_id (int): Number of the jump.
+        jump_type (str): The predicted type, one of JUMP_TYPES.
+        confidence (float): Probability of the predicted type.
+    """
+
+    with closing(open_index(jumps_dir)) as connection, connection:
+        connection.execute('UPDATE jumps SET jump_type = ?, confidence = ? WHERE jump_id = ?',
+                           (jump_type, confidence, jump_id))
+
+def list_jumps(jumps_dir, min_rotation=None):
+    """
+    Returns the indexed jumps of a jumps directory, ordered by jump number.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+        min_rotation (float): If given, only jumps with at least this rotation are returned.
+
+    Returns:
+        list: sqlite3.Row objects with the columns of the index, empty if there is no index.
+    """
+
+    if not has_index(jumps_dir):
+        return []
+    query = 'SELECT * FROM jumps'
+    parameters = []
+    if min_rotation is not None:
+        query += ' WHERE rotation >= ?'
+        parameters.append(min_rotation)
+    with closing(open_index(jumps_dir)) as connection:
+        return connection.execute(query + ' ORDER BY jump_id', parameters).fetchall()
+
+def jump_stats(jumps_dir):
+    """
+    Summarizes the indexed jumps of a jumps directory.
+
+    Args:
+        jumps_dir (str): The jumps directory.
+
+    Returns:
+        sqlite3.Row: Number of jumps and the average and maximum rotation, peak acceleration and airtime, None if
+            there is no index.
+    """
+
+    if not has_index(jumps_dir):
+        return None
+    with closing(open_index(jumps_dir)) as connection:
+        return connection.execute('''SELECT COUNT(*) AS jumps,
+            AVG(rotation) AS average_rotation, MAX(rotation) AS max_rotation,
+            AVG(peak_acceleration) AS average_peak_acceleration, MAX(peak_acceleration) AS max_peak_acceleration,
+            AVG(airtime) AS average_airtime, MAX(airtime) AS max_airtime FROM jumps''').fetchone()
+
+def export_jumps(jumps_dir, jump_type, labeled_dir=os.path.join(BASE_DIR, 'data/labeled_data'), min_rotation=None):
+    """
+    Copies the indexed jumps of a recording into the labeled training data of a jump type, numbered after the jumps
+    already there.
+
+    Args:
+        jumps_dir (str): The jumps directory of the recording.
+        jump_type (str): The type of jump, one of JUMP_TYPES.
+        labeled_dir (str): The labeled data directory.
+        min_rotation (float): If given, only jumps with at least this rotation are exported.
+
+    Returns:
+        int: The number of exported jumps.
+    """
+
+    type_dir = os.path.join(labeled_dir, jump_type)
+    os.makedirs(type_dir, exist_ok=True)
+    jump_id = next_jump_id(type_dir)
+    exported = 0
+    for jump in list_jumps(jumps_dir, min_rotation):
+        source_path = os.path.join(jumps_dir, jump['file_name'])
+        if not os.path.exists(source_path):
+            print(f"Warning: {source_path} is in the index but does not exist.")
+            continue
+        shutil.copyfile(source_path, os.path.join(type_dir, f'jump_{jump_id}.bin'))
+        jump_id += 1
+        exported += 1
+    return exported
+
+def recording_dirs(arguments):
+    """
+    Expands command line arguments to recording directories, 'all' meaning every saved recording.
+
+    Args:
+        arguments (list): The recording directories or ['all'].
+
+    Returns:
+        list: The recording directories.
+    """
+
+    if arguments == ['all']:
+        return sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+    return arguments
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == 'stats':
+        # e.g. python jump_index.py stats all
+        for recording in recording_dirs(sys.argv[2:]):
+            stats = jump_stats(os.path.join(recording, 'jumps'))
+            if stats is None:
+                print(f"{os.path.basename(recording)}: no index, run 'python jump_index.py rebuild' to create it")
+                continue
+            if not stats['jumps']:
+                print(f"{os.path.basename(recording)}: no indexed jumps")
+                continue
+            # Jumps indexed by 'rebuild' have no airtime
+            summary = [f"{stats['jumps']} jumps"]
+            for name, unit, digits in [('rotation', 'deg', 0), ('peak_acceleration', 'g', 1), ('airtime', 's', 2)]:
+                if stats[f'average_{name}'] is not None:
+                    summary.append(f"{name} {stats[f'average_{name}']:.{digits}f} avg / {stats[f'max_{name}']:.{digits}f} max {unit}")
+            print(f"{os.path.basename(recording)}: {', '.join(summary)}")
+    elif len(sys.argv) > 3 and sys.argv[1] == 'export' and sys.argv[3] in JUMP_TYPES:
+        # e.g. python jump_index.py export data/recordings/recording_3 salchow
+        count = export_jumps(os.path.join(sys.argv[2], 'jumps'), sys.argv[3])
+        print(f"Exported {count} jumps to {sys.argv[3]}")
+    elif len(sys.argv) > 2 and sys.argv[1] == 'rebuild':
+        # Index jumps that were saved before the index existed, e.g. python jump_index.py rebuild all
+        from identify_jumps import index_existing_jumps
+        for recording in recording_dirs(sys.argv[2:]):
+            count = index_existing_jumps(os.path.join(recording, 'jumps'))
+            print(f"{os.path.basename(recording)}: indexed {count} jumps")
+    else:
+        print("Usage: python jump_index.py stats <recording dir>... | all")
+        print(f"       python jump_index.py export <recording dir> <{'|'.join(JUMP_TYPES)}>")
+        print("       python jump_index.py rebuild <recording dir>... | all")
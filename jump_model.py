@@ -0,0 +1,22 @@
+import torch.nn as nn
+
+'''
+The model of ai_model/training.ipynb, needed to load a checkpoint of its weights. It is kept apart from
+jump_classifier.py so torch is only imported once a model is actually loaded.
+'''
+
+class JumpClassifier(nn.Module):
+    """
+    LSTM over the 30 channels of a jump, followed by a linear layer that scores the 6 jump types.
+    """
+
+    def __init__(self):
+        super(JumpClassifier, self).__init__()
+        self.lstm = nn.LSTM(input_size=30, hidden_size=50, num_layers=4, batch_first=True)
+        self.fc = nn.Linear(50, 6)  # 6 categories
+
+    def forward(self, x):
+        x, _ = self.lstm(x)
+        x = x[:, -1, :]  # Get last time step
+        x = self.fc(x)
+        return x
@@ -0,0 +1,200 @@
+import json
+import queue
+import base64
+import socket
+import threading
+import http.client
+import urllib.parse
+import numpy as np
+
+'''
+Server-Sent Events stream of the live pipeline. The server publishes every processed block of samples and every saved
+jump to a Broadcaster, which hands them to each connected viewer without touching the disk.
+'''
+
+# Constants
+SUBSCRIBER_QUEUE_SIZE = 100  # Events kept for a slow subscriber before the oldest ones are dropped
+KEEPALIVE_INTERVAL = 15  # Seconds between keepalive comments when there are no events
+RECONNECT_DELAY = 2  # Seconds the client waits before reconnecting after the stream was lost
+
+class Broadcaster:
+    """
+    Delivers published events to every subscriber. Each subscriber has its own bounded queue, so a slow viewer only
+    loses its own oldest events and never holds up the pipeline.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        """
+        Adds a subscriber.
+
+        Returns:
+            queue.Queue: Queue the subscriber receives (event, data) tuples from.
+        """
+
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Removes a subscriber.
+
+        Args:
+            subscriber (queue.Queue): The queue returned by subscribe.
+        """
+
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, event, data):
+        """
+        Sends an event to every subscriber.
+
+        Args:
+            event (str): The event type, 'samples' or 'jump'.
+            data (dict): The event data, must be JSON serializable.
+        """
+
+        message = format_event(event, data)  # Serialized once for all subscribers
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()  # Drop the oldest event to make room
+                    except queue.Empty:
+                        pass
+
+def format_event(event, data):
+    """
+    Formats an event as a Server-Sent Events message.
+
+    Args:
+        event (str): The event type.
+        data (dict): The event data.
+
+    Returns:
+        str: The message.
+    """
+
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def encode_samples(file_number, first_sample, data):
+    """
+    Builds the data of a 'samples' event.
+
+    Args:
+        file_number (int): Number of the file the samples belong to.
+        first_sample (int): Sample index of the first sample in the recording.
+        data (ndarray): The int16 samples, shape (samples, channels).
+
+    Returns:
+        dict: The event data, the samples are base64 encoded.
+    """
+
+    return {'file_number': file_number, 'first_sample': first_sample, 'shape': list(data.shape),
+            'data': base64.b64encode(np.ascontiguousarray(data, dtype=np.int16)).decode('ascii')}
+
+def decode_samples(data):
+    """
+    Decodes the samples of a 'samples' event.
+
+    Args:
+        data (dict): The event data.
+
+    Returns:
+        ndarray: The int16 samples, shape (samples, channels).
+    """
+
+    return np.frombuffer(base64.b64decode(data['data']), dtype=np.int16).reshape(data['shape'])
+
+def iter_events(url, timeout=KEEPALIVE_INTERVAL * 2, on_open=None):
+    """
+    Connects to an event stream and yields its events until the connection is closed.
+
+    Args:
+        url (str): URL of the stream.
+        timeout (float): Seconds without any data, including keepalives, before the connection is considered lost.
+        on_open (callable): Called with the socket once connected, see close_connection.
+
+    Yields:
+        tuple: (event, data) of each event.
+    """
+
+    parts = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        connection.connect()
+        if on_open is not None:
+            on_open(connection.sock)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        connection.request('GET', path, headers={'Accept': 'text/event-stream'})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise OSError(f"stream returned status {response.status}")
+        event, data_lines = 'message', []
+        for line in response:
+            line = line.decode('utf-8').rstrip('\r\n')
+            if not line:
+                # A blank line ends the event
+                if data_lines:
+                    yield event, json.loads('\n'.join(data_lines))
+                event, data_lines = 'message', []
+            elif line.startswith(':'):
+                continue  # Comment, used for keepalives
+            elif line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                data_lines.append(line[len('data:'):].lstrip())
+    finally:
+        connection.close()
+
+def close_connection(sock):
+    """
+    Ends a stream from another thread. Shutting the socket down wakes up a read that is waiting for the next event,
+    whereas closing it would not.
+
+    Args:
+        sock (socket.socket): Socket passed to on_open.
+    """
+
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # Already closed
+
+def follow_events(url, stop_event, on_open=None):
+    """
+    Yields the events of a stream, reconnecting whenever the connection is lost, until stop_event is set.
+
+    Args:
+        url (str): URL of the stream.
+        stop_event (threading.Event): Set to stop following the stream.
+        on_open (callable): Called with the socket of every connection, see iter_events.
+
+    Yields:
+        tuple: (event, data) of each event.
+    """
+
+    while not stop_event.is_set():
+        try:
+            for event in iter_events(url, on_open=on_open):
+                if stop_event.is_set():
+                    return
+                yield event
+        except (OSError, ValueError) as e:
+            if stop_event.is_set():
+                return
+            print(f"Live stream unavailable: {e}")
+        stop_event.wait(RECONNECT_DELAY)
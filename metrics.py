@@ -0,0 +1,268 @@
+import json
+import time
+import threading
+import contextlib
+
+'''
+Lightweight instrumentation of the processing pipeline. Stages are timed into histograms, events are counted, and
+everything can be read in the Prometheus text format from the /metrics endpoint of the server. Optionally, the time
+every chunk spent in each stage is appended to a trace log as one JSON line per chunk.
+'''
+
+# Constants
+PREFIX = 'skatelligence_'  # Prefix of every exported metric name
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)  # Seconds
+
+def format_labels(labels):
+    """
+    Formats label values the way Prometheus expects them, e.g. {stage="filter"}.
+
+    Args:
+        labels (tuple): (name, value) pairs.
+
+    Returns:
+        str: The formatted labels, empty if there are none.
+    """
+
+    if not labels:
+        return ''
+    values = ','.join(f'{name}="{str(value)}"' for name, value in labels)
+    return '{' + values + '}'
+
+class Counter:
+    """
+    Value that only goes up, such as the number of received chunks. Every combination of labels is counted separately.
+    """
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.values = {}  # Count by sorted (label, value) pairs
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Adds to the count of the given labels.
+
+        Args:
+            amount (int): Amount to add.
+            **labels: Label values, e.g. stage='filter'.
+        """
+
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """
+        Returns the count of the given labels.
+        """
+
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        """
+        Returns the lines of the metric in the Prometheus text format.
+        """
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(key)} {value}')
+        if not self.values:
+            lines.append(f'{self.name} 0')
+        return lines
+
+class Gauge:
+    """
+    Value that is read when the metrics are exported, such as the depth of a queue.
+    """
+
+    def __init__(self, name, description, function):
+        """
+        Args:
+            name (str): Name of the metric.
+            description (str): Help text of the metric.
+            function (callable): Returns the current value.
+        """
+
+        self.name = name
+        self.description = description
+        self.function = function
+
+    def render(self):
+        """
+        Returns the lines of the metric in the Prometheus text format.
+        """
+
+        return [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} gauge',
+                f'{self.name} {self.function()}']
+
+class Histogram:
+    """
+    Distribution of observed values, such as the time taken by a stage. Every combination of labels has its own
+    buckets.
+    """
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.series = {}  # [bucket counts, sum, count] by sorted (label, value) pairs
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records a value for the given labels.
+
+        Args:
+            value (float): The observed value.
+            **labels: Label values, e.g. stage='filter'.
+        """
+
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            # Buckets are stored per range and summed up on export, so an observation only touches one of them
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Returns the lines of the metric in the Prometheus text format.
+        """
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, (bucket_counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{format_labels(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_bucket{format_labels(key + (("le", "+Inf"),))} {count}')
+                lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+                lines.append(f'{self.name}_count{format_labels(key)} {count}')
+        return lines
+
+# Every metric by name, in the order they were registered
+registry = {}
+registry_lock = threading.Lock()
+
+def register(metric):
+    """
+    Adds a metric to the registry, or returns the metric already registered under its name. This lets modules
+    declare the metrics they use without caring which module is imported first.
+    """
+
+    with registry_lock:
+        return registry.setdefault(metric.name, metric)
+
+def counter(name, description):
+    """
+    Registers a Counter, the name is prefixed with PREFIX.
+    """
+
+    return register(Counter(PREFIX + name, description))
+
+def histogram(name, description, buckets=LATENCY_BUCKETS):
+    """
+    Registers a Histogram, the name is prefixed with PREFIX.
+    """
+
+    return register(Histogram(PREFIX + name, description, buckets))
+
+def gauge(name, description, function):
+    """
+    Registers a Gauge, the name is prefixed with PREFIX.
+    """
+
+    return register(Gauge(PREFIX + name, description, function))
+
+def render():
+    """
+    Exports every registered metric.
+
+    Returns:
+        str: The metrics in the Prometheus text format.
+    """
+
+    with registry_lock:
+        metrics = list(registry.values())
+    return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+stage_seconds = histogram('stage_seconds', 'Seconds spent in each stage of the pipeline.')
+
+# Trace of the chunk the current thread is working on, see trace_chunk
+local = threading.local()
+trace_file = None
+trace_lock = threading.Lock()
+
+def enable_trace(path):
+    """
+    Starts appending a line for every traced chunk to a trace log.
+
+    Args:
+        path (str): Path of the trace log.
+    """
+
+    global trace_file
+    trace_file = open(path, 'a', buffering=1)
+
+@contextlib.contextmanager
+def trace_chunk(file_number, **fields):
+    """
+    Collects the stage times of one chunk while the pipeline works on it and writes them to the trace log, if it is
+    enabled.
+
+    Args:
+        file_number (int): The number of the chunk.
+        **fields: Stage times measured before the chunk reached this thread, such as the time it waited in a queue.
+    """
+
+    if trace_file is None:
+        yield
+        return
+
+    trace = dict(file=file_number, time=time.time(), **fields)
+    local.trace = trace
+    try:
+        yield
+    finally:
+        local.trace = None
+        with trace_lock:
+            trace_file.write(json.dumps(trace) + '\n')
+
+def observe_stage(stage, seconds):
+    """
+    Records the time taken by a stage in the stage histogram and in the trace of the current chunk.
+
+    Args:
+        stage (str): Name of the stage.
+        seconds (float): Time taken.
+    """
+
+    stage_seconds.observe(seconds, stage=stage)
+    trace = getattr(local, 'trace', None)
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0) + seconds
+
+@contextlib.contextmanager
+def timed(stage):
+    """
+    Times the code inside the with block as a stage of the pipeline, see observe_stage.
+
+    Args:
+        stage (str): Name of the stage.
+    """
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start_time)
@@ -0,0 +1,395 @@
+import os
+import sys
+import glob
+import shutil
+import numpy as np
+from recording_store import (CHANNELS, BASE_DIR, STREAM_NAMES, list_chunks, chunk_number, chunk_signature,
+                             read_chunk)
+
+'''
+Min/max overview of whole recordings. Every stream gets a pyramid of decimated levels next to it, in
+recording_N/raw_data.overview for recording_N/raw_data. A bin of the finest level holds the minimum and maximum of
+BIN_SIZE samples of every channel, and every further level combines LEVEL_FACTOR bins of the level below. Drawing the
+minimum and maximum of each bin shows every peak of the stream, so a whole session can be plotted from a few thousand
+bins of the right level instead of every sample.
+
+The pyramid is extended as chunks arrive: only the new chunks are read, and only the bins they complete are appended
+to each level. The chunks that were added are listed in an index, so the pyramid is rebuilt from where it no longer
+matches the stream, e.g. when the processed data of a recording is recreated.
+'''
+
+# Constants
+BIN_SIZE = 10  # Samples per bin of the finest level
+LEVEL_FACTOR = 4  # Bins of a level that are combined into one bin of the next level
+OVERVIEW_EXTENSION = '.overview'  # Directory next to a stream holding its pyramid
+INDEX_NAME = 'index.bin'  # One int64 row of (file number, first sample, sample count, signature) per added chunk
+INDEX_COLUMNS = 5
+BUILD_BATCH = 512  # Chunks that are read and added at once when catching up with a stream
+
+def overview_path(data_dir):
+    """
+    Returns the directory that holds the pyramid of a stream.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files, e.g. recording_N/raw_data.
+
+    Returns:
+        str: The pyramid directory, e.g. recording_N/raw_data.overview.
+    """
+
+    return os.path.normpath(data_dir) + OVERVIEW_EXTENSION
+
+def bin_size(level):
+    """
+    Returns the number of samples covered by a bin of a level.
+    """
+
+    return BIN_SIZE * LEVEL_FACTOR ** level
+
+def bin_samples(samples):
+    """
+    Computes the finest level bins of a run of samples.
+
+    Args:
+        samples (numpy.array): int16 samples of shape (bins * BIN_SIZE, CHANNELS).
+
+    Returns:
+        numpy.array: int16 array of shape (bins, 2, CHANNELS), the minimum and maximum of every bin.
+    """
+
+    grouped = samples.reshape((-1, BIN_SIZE, CHANNELS))
+    return np.stack([grouped.min(axis=1), grouped.max(axis=1)], axis=1)
+
+def combine_bins(bins, factor=LEVEL_FACTOR):
+    """
+    Combines every factor bins into one bin of the next level.
+
+    Args:
+        bins (numpy.array): int16 array of shape (groups * factor, 2, CHANNELS).
+        factor (int): Bins per combined bin.
+
+    Returns:
+        numpy.array: int16 array of shape (groups, 2, CHANNELS).
+    """
+
+    grouped = bins.reshape((-1, factor, 2, CHANNELS))
+    return np.stack([grouped[:, :, 0].min(axis=1), grouped[:, :, 1].max(axis=1)], axis=1)
+
+class Overview:
+    """
+    The pyramid of a stream. It is brought up to date with update, which only reads the chunks added since the last
+    update, and read with choose_level and envelope. Only one process should update the pyramid of a stream.
+    """
+
+    def __init__(self, data_dir):
+        """
+        Args:
+            data_dir (str): Directory the stream is stored in as separate files, or in a store or archive.
+        """
+
+        self.data_dir = os.path.normpath(data_dir)
+        self.overview_dir = overview_path(data_dir)
+        self.index_path = os.path.join(self.overview_dir, INDEX_NAME)
+        index = np.zeros(0, dtype=np.int64)
+        if os.path.exists(self.index_path):
+            index = np.fromfile(self.index_path, dtype=np.int64)
+        self.index = index[:len(index) - len(index) % INDEX_COLUMNS].reshape((-1, INDEX_COLUMNS))
+        self.truncate(len(self.index))
+
+    @property
+    def sample_count(self):
+        """
+        int: Number of samples of the added chunks.
+        """
+
+        return int(self.index[-1, 1] + self.index[-1, 2]) if len(self.index) else 0
+
+    def level_path(self, level):
+        return os.path.join(self.overview_dir, f'level_{level}.bin')
+
+    def chunk_path(self, file_number):
+        return os.path.join(self.data_dir, f'{file_number}.bin')
+
+    def truncate(self, row_count):
+        """
+        Removes the chunks after the given number of index rows, and the bins that contain their samples. Levels are
+        cut back to the bins that are complete without those chunks, including bins written by an interrupted update.
+
+        Args:
+            row_count (int): Number of chunks to keep.
+        """
+
+        if row_count < len(self.index):
+            self.index = self.index[:row_count]
+            # The pyramid directory may have been removed while the overview is open, e.g. by clear_data.sh
+            os.makedirs(self.overview_dir, exist_ok=True)
+            with open(self.index_path, 'wb') as f:
+                f.write(self.index.tobytes())
+
+        self.bin_counts = []  # Complete bins of every level
+        bin_count = self.sample_count // BIN_SIZE
+        level = 0
+        while os.path.exists(self.level_path(level)):
+            bin_bytes = 2 * CHANNELS * 2
+            stored = os.path.getsize(self.level_path(level)) // bin_bytes
+            if stored > bin_count:
+                os.truncate(self.level_path(level), bin_count * bin_bytes)
+            self.bin_counts.append(min(stored, bin_count))
+            bin_count = self.bin_counts[-1] // LEVEL_FACTOR
+            level += 1
+        if not self.bin_counts:
+            self.bin_counts.append(0)
+        self.tail = self.read_tail()
+
+    def read_tail(self):
+        """
+        Reads the samples after the last complete bin of the finest level back from the end of the stream.
+
+        Returns:
+            numpy.array: int16 array of shape (fewer than BIN_SIZE samples, CHANNELS).
+        """
+
+        remainder = self.sample_count - self.bin_counts[0] * BIN_SIZE
+        parts = []
+        for file_number, _, sample_count, _, _ in self.index[::-1]:
+            if remainder <= 0:
+                break
+            data = read_chunk(self.chunk_path(file_number))
+            if data is None or data.size != sample_count * CHANNELS:
+                break  # The stream changed, update finds out and rebuilds from there
+            take = min(remainder, int(sample_count))
+            parts.insert(0, data.reshape((-1, CHANNELS))[sample_count - take:])
+            remainder -= take
+        if not parts:
+            return np.zeros((0, CHANNELS), dtype=np.int16)
+        return np.concatenate(parts)
+
+    def matching_rows(self, chunk_paths):
+        """
+        Counts the added chunks that still match the stream: the chunks must be the first chunks of the stream, and
+        the first and last of them must be unchanged.
+
+        Args:
+            chunk_paths (list): The chunks of the stream in order, see recording_store.list_chunks.
+
+        Returns:
+            int: The number of index rows that can be kept.
+        """
+
+        numbers = np.array([chunk_number(path) for path in chunk_paths[:len(self.index)]], dtype=np.int64)
+        mismatches = np.flatnonzero(numbers != self.index[:len(numbers), 0])
+        row_count = int(mismatches[0]) if len(mismatches) else len(numbers)
+        for row in sorted({0, row_count - 1}):
+            if row < 0 or row >= row_count:
+                continue
+            signature = chunk_signature(self.chunk_path(self.index[row, 0]))
+            if signature is None or tuple(signature) != tuple(self.index[row, 3:]):
+                row_count = row
+                break
+        return row_count
+
+    def update(self):
+        """
+        Adds the chunks that arrived since the last update. Chunks that no longer match the stream are removed first,
+        along with every chunk after them.
+
+        Returns:
+            int: Number of chunks that were added.
+        """
+
+        chunk_paths = list_chunks(self.data_dir)
+        row_count = self.matching_rows(chunk_paths)
+        if row_count < len(self.index):
+            self.truncate(row_count)
+
+        new_paths = chunk_paths[len(self.index):]
+        for batch_start in range(0, len(new_paths), BUILD_BATCH):
+            self.add_chunks(new_paths[batch_start:batch_start + BUILD_BATCH])
+        return len(new_paths)
+
+    def add_chunks(self, chunk_paths):
+        """
+        Appends chunks to the pyramid. The bins are written before the index, so an interrupted update never leaves
+        index rows whose bins are missing.
+
+        Args:
+            chunk_paths (list): Paths of the chunks that follow the added ones, in order.
+        """
+
+        rows = []
+        chunks = [self.tail]
+        first_sample = self.sample_count
+        for file_path in chunk_paths:
+            signature = chunk_signature(file_path)
+            data = read_chunk(file_path)
+            if data is None or signature is None:
+                break  # Removed since it was listed, the next update will see that
+            data = data.reshape((-1, CHANNELS))
+            chunks.append(data)
+            rows.append([chunk_number(file_path), first_sample, len(data), *signature])
+            first_sample += len(data)
+        if not rows:
+            return
+
+        os.makedirs(self.overview_dir, exist_ok=True)
+        samples = np.concatenate(chunks)
+        complete = len(samples) // BIN_SIZE * BIN_SIZE
+        self.append_bins(0, bin_samples(samples[:complete]))
+        self.tail = samples[complete:].copy()
+
+        # Every level is extended by the bins that the new bins of the level below complete
+        level = 1
+        while self.bin_counts[level - 1] >= LEVEL_FACTOR:
+            if level == len(self.bin_counts):
+                self.bin_counts.append(0)
+            first = self.bin_counts[level] * LEVEL_FACTOR
+            stop = self.bin_counts[level - 1] // LEVEL_FACTOR * LEVEL_FACTOR
+            if stop > first:
+                self.append_bins(level, combine_bins(self.read_level(level - 1, first, stop)))
+            level += 1
+
+        rows = np.array(rows, dtype=np.int64)
+        with open(self.index_path, 'ab') as f:
+            f.write(rows.tobytes())
+        self.index = np.concatenate([self.index, rows])
+
+    def append_bins(self, level, bins):
+        """
+        Appends complete bins to a level.
+        """
+
+        with open(self.level_path(level), 'ab') as f:
+            f.write(np.ascontiguousarray(bins, dtype=np.int16).tobytes())
+        self.bin_counts[level] += len(bins)
+
+    def read_level(self, level, first, stop):
+        """
+        Reads complete bins of a level.
+
+        Args:
+            level (int): The level.
+            first (int): First bin.
+            stop (int): Bin after the last bin, at most the number of complete bins.
+
+        Returns:
+            numpy.array: int16 array of shape (bins, 2, CHANNELS).
+        """
+
+        count = max(stop - first, 0)
+        bin_values = 2 * CHANNELS
+        if count == 0:
+            return np.zeros((0, 2, CHANNELS), dtype=np.int16)
+        with open(self.level_path(level), 'rb') as f:
+            f.seek(first * bin_values * 2)
+            bins = np.fromfile(f, dtype=np.int16, count=count * bin_values)
+        return bins.reshape((-1, 2, CHANNELS))
+
+    def partial_bin(self, level):
+        """
+        Computes the bin after the complete bins of a level from the levels below it, so the end of a stream that is
+        still growing is shown on every level.
+
+        Returns:
+            numpy.array or None: int16 array of shape (1, 2, CHANNELS), or None if there are no samples after the
+                complete bins.
+        """
+
+        if level == 0:
+            return np.stack([self.tail.min(axis=0), self.tail.max(axis=0)])[np.newaxis] if len(self.tail) else None
+        bins = self.read_level(level - 1, self.bin_counts[level] * LEVEL_FACTOR, self.bin_counts[level - 1])
+        partial = self.partial_bin(level - 1)
+        if partial is not None:
+            bins = np.concatenate([bins, partial])
+        if not len(bins):
+            return None
+        return combine_bins(bins, len(bins))
+
+    def choose_level(self, samples_per_pixel):
+        """
+        Picks the coarsest level that still has at least one bin per pixel.
+
+        Args:
+            samples_per_pixel (float): Samples of the visible range divided by the width of the plot in pixels.
+
+        Returns:
+            int or None: The level, or None if the samples should be shown at full resolution.
+        """
+
+        level = None
+        for candidate in range(len(self.bin_counts)):
+            if bin_size(candidate) <= samples_per_pixel:
+                level = candidate
+        return level
+
+    def envelope(self, level, start, stop):
+        """
+        Returns the bins of a level that cover a range of samples.
+
+        Args:
+            level (int): The level, see choose_level.
+            start (int): First sample of the range.
+            stop (int): Sample after the last sample of the range.
+
+        Returns:
+            tuple: (first sample of the first bin, int16 array of shape (bins, 2, CHANNELS)).
+        """
+
+        size = bin_size(level)
+        complete = self.bin_counts[level]
+        first = min(max(start, 0) // size, complete)
+        last = -(-min(stop, self.sample_count) // size)
+        bins = self.read_level(level, first, min(last, complete))
+        if last > complete:
+            partial = self.partial_bin(level)
+            if partial is not None:
+                bins = np.concatenate([bins, partial])
+        return first * size, bins
+
+    def chunks(self, start, stop):
+        """
+        Lists the chunks that contain a range of samples, to show it at full resolution.
+
+        Args:
+            start (int): First sample of the range.
+            stop (int): Sample after the last sample of the range.
+
+        Returns:
+            list: (chunk path, first sample) of every chunk in the range, in order.
+        """
+
+        ends = self.index[:, 1] + self.index[:, 2]
+        rows = np.flatnonzero((ends > start) & (self.index[:, 1] < stop))
+        return [(self.chunk_path(self.index[row, 0]), int(self.index[row, 1])) for row in rows]
+
+def build_recording(recording_dir):
+    """
+    Builds or updates the pyramids of the streams of a recording.
+
+    Args:
+        recording_dir (str): The recording directory, e.g. data/recordings/recording_N.
+    """
+
+    for stream_name in STREAM_NAMES:
+        overview = Overview(os.path.join(recording_dir, stream_name))
+        count = overview.update()
+        print(f"Added {count} files to the overview of {overview.data_dir}, "
+              f"{len(overview.bin_counts)} levels for {overview.sample_count} samples")
+
+def remove_overview(data_dir):
+    """
+    Deletes the pyramid of a stream, it is rebuilt by the next update.
+    """
+
+    if os.path.isdir(overview_path(data_dir)):
+        shutil.rmtree(overview_path(data_dir))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Build the overviews of recordings, e.g. python overview_pyramid.py data/recordings/recording_0 or all
+        recordings = sys.argv[1:]
+        if recordings == ['all']:
+            recordings = sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+        for recording in recordings:
+            build_recording(recording)
+    else:
+        print("Usage: python overview_pyramid.py <recording dir>... | all")
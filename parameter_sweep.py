@@ -0,0 +1,316 @@
+import os
+import csv
+import sys
+import glob
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import dataset
+import imu_codec
+from identify_jumps import (detect_jumps_batch, HIGH_THRESHOLD, LOW_THRESHOLD, MIN_JUMP_DURATION, MAX_JUMP_DURATION,
+                            MINIMUM_ROTATION, SAMPLING_RATE)
+from jump_features import LANDING_INDEX
+from recording_store import read_stream
+
+'''
+Tunes the jump detector without touching any files. The processed data of the recordings is loaded once, then every
+combination of a grid of detector parameters is run through detect_jumps_batch in a pool of worker processes. The
+valid jumps of each setting are matched to known jumps by their landing, giving the precision and recall of the
+setting along with the time it took.
+
+Known jumps come from a ground truth CSV file with a recording,landing_sample row per jump, or by default from the
+labeled data: every labeled jump was cut out of the processed data of a recording, so its landing is found by sliding
+it along the recordings to where it fits best. The fit does not have to be exact, so the labeled jumps are still found
+after the recordings are reprocessed, e.g. with the zero-phase filter. Only the recordings with known jumps are scored.
+
+The labeled jumps are a biased ground truth: they were saved by this jump detector with its default setting, so that
+setting finds all of them on the recordings they came from, and jumps it missed are not labeled at all. They show how
+far other settings move away from the default one. Use a ground truth file from an independent source to find out
+which setting detects the most real jumps.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+RECORDINGS_DIR = os.path.join(BASE_DIR, 'data/recordings')
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks')
+MATCH_TOLERANCE = 10  # Samples a detected landing can be off from a known landing and still match it
+FIT_BLOCK = 512  # Samples per FFT when fitting labeled jumps to the recordings, see fit_errors
+MAX_FIT_ERROR = 0.35  # Largest difference between a labeled jump and the data where it fits, relative to the jump
+PARAMETER_NAMES = ['high_threshold', 'low_threshold', 'min_jump_duration', 'max_jump_duration', 'minimum_rotation']
+DEFAULT_GRID = dict(high_threshold=[1.25, 1.5, 1.75, 2.0], low_threshold=[0.3, 0.5, 0.7],
+                    min_jump_duration=[0.15, 0.2, 0.25], max_jump_duration=[0.8, 1.0],
+                    minimum_rotation=[90, 180, 270])
+DEFAULT_SETTING = (HIGH_THRESHOLD, LOW_THRESHOLD, MIN_JUMP_DURATION, MAX_JUMP_DURATION, MINIMUM_ROTATION)
+
+def load_recordings(recordings):
+    """
+    Reads the processed data of recordings.
+
+    Args:
+        recordings (list): Recording directories, e.g. data/recordings/recording_N.
+
+    Returns:
+        dict: int16 array of shape (samples, 30) by recording name, for the recordings that have processed data.
+    """
+
+    streams = {}
+    for recording in recordings:
+        data = read_stream(os.path.join(recording, 'processed_data'))
+        if len(data):
+            streams[os.path.basename(os.path.normpath(recording))] = np.ascontiguousarray(data)
+        else:
+            print(f"Warning: {recording} has no processed data and is skipped")
+    return streams
+
+def fit_errors(data, jumps):
+    """
+    Slides jumps along a recording and measures how well each fits at every start sample. The squared differences
+    are computed from the cross-correlation of all channels, done with FFTs of short overlapping blocks of the
+    recording (overlap-save) so every jump is correlated with the whole recording at once.
+
+    Args:
+        data (numpy.array): Processed data of the recording, shape (samples, 30).
+        jumps (numpy.array): Processed data of the jumps, shape (jumps, JUMP_LENGTH, 30). The recording must be
+            at least one jump long.
+
+    Returns:
+        numpy.array: Root of the summed squared differences relative to the jump's own, shape (jumps, start samples).
+    """
+
+    data = data.astype(np.float64)
+    jumps = jumps.astype(np.float64)
+    length = jumps.shape[1]
+    positions = len(data) - length + 1
+    hop = FIT_BLOCK - length + 1  # Start samples covered by a block, the rest of it overlaps the next block
+    block_count = -(-positions // hop)
+    padded = np.zeros((block_count * hop + length - 1, data.shape[1]))
+    padded[:len(data)] = data
+    blocks = np.lib.stride_tricks.sliding_window_view(padded, FIT_BLOCK, axis=0)[::hop]  # (blocks, channels, FIT_BLOCK)
+
+    # Products of the spectra summed over the channels, one matrix product per frequency
+    block_spectra = np.fft.rfft(blocks, axis=2).transpose(2, 0, 1)  # (frequencies, blocks, channels)
+    jump_spectra = np.conj(np.fft.rfft(jumps, n=FIT_BLOCK, axis=1)).transpose(1, 2, 0)  # (frequencies, channels, jumps)
+    correlation = np.fft.irfft(np.matmul(block_spectra, jump_spectra), n=FIT_BLOCK, axis=0)[:hop]
+    correlation = correlation.transpose(2, 1, 0).reshape(len(jumps), -1)[:, :positions]
+
+    energy = np.concatenate([[0.0], np.cumsum((data ** 2).sum(axis=1))])
+    window_energy = energy[length:] - energy[:-length]
+    jump_energy = (jumps ** 2).sum(axis=(1, 2))[:, np.newaxis]
+    return np.sqrt(np.maximum(window_energy - 2 * correlation + jump_energy, 0) / jump_energy)
+
+def labeled_truth(streams, labeled_dir=dataset.LABELED_DIR, max_error=MAX_FIT_ERROR):
+    """
+    Finds the landing of every labeled jump in the processed data of the recordings. A jump is placed where it fits
+    best over all recordings, see fit_errors, if it fits within max_error.
+
+    Args:
+        streams (dict): Processed data by recording name, see load_recordings.
+        labeled_dir (str): Directory with a subdirectory of jump files for every jump type.
+        max_error (float): Largest relative difference at which a jump is still taken to be found.
+
+    Returns:
+        dict: Sorted array of known landing samples by recording name.
+    """
+
+    jumps = np.stack([imu_codec.as_samples(np.fromfile(os.path.join(labeled_dir, relative_path),
+                                                       dtype=imu_codec.SAMPLE_DTYPE))
+                      for relative_path, _, _, _ in dataset.list_source_files(labeled_dir)])
+    best_errors = np.full(len(jumps), np.inf)
+    best_places = [None] * len(jumps)
+    for name, data in streams.items():
+        if len(data) < jumps.shape[1]:
+            continue
+        errors = fit_errors(data, jumps)
+        starts = np.argmin(errors, axis=1)
+        for i, start in enumerate(starts):
+            if errors[i, start] < best_errors[i]:
+                best_errors[i] = errors[i, start]
+                best_places[i] = (name, int(start))
+
+    landings = {}
+    missing = 0
+    for error, place in zip(best_errors, best_places):
+        if error > max_error:
+            missing += 1
+            continue
+        name, start = place
+        landings.setdefault(name, []).append(start + LANDING_INDEX)
+    if missing:
+        print(f"Warning: {missing} labeled jumps were not found in the recordings")
+    return {name: np.unique(values) for name, values in landings.items()}
+
+def read_truth(truth_path):
+    """
+    Reads a ground truth file, a CSV file with a header and a recording,landing_sample row for every jump. The
+    recording is the name of its directory, e.g. recording_3.
+
+    Args:
+        truth_path (str): Path of the file.
+
+    Returns:
+        dict: Sorted array of known landing samples by recording name.
+    """
+
+    landings = {}
+    with open(truth_path, newline='') as f:
+        for row in csv.DictReader(f):
+            landings.setdefault(row['recording'].strip(), []).append(int(row['landing_sample']))
+    return {name: np.unique(values) for name, values in landings.items()}
+
+def match_landings(detected, known, tolerance=MATCH_TOLERANCE):
+    """
+    Matches detected landings to known landings, each known landing to at most one detected landing.
+
+    Args:
+        detected (numpy.array): Sorted detected landing samples.
+        known (numpy.array): Sorted known landing samples.
+        tolerance (int): Samples a detected landing can be off from a known landing.
+
+    Returns:
+        int: The number of matched landings.
+    """
+
+    matched = 0
+    i = 0
+    for landing in known:
+        while i < len(detected) and detected[i] < landing - tolerance:
+            i += 1  # Too early for this and every later known landing
+        if i < len(detected) and detected[i] <= landing + tolerance:
+            matched += 1
+            i += 1
+    return matched
+
+# Recordings and known landings of a worker process, set once by load_worker instead of being sent with every setting
+worker_streams = None
+worker_truth = None
+
+def load_worker(streams, truth):
+    """
+    Keeps the recordings and known landings in a worker process for all the settings it evaluates.
+    """
+
+    global worker_streams, worker_truth
+
+    worker_streams = streams
+    worker_truth = truth
+
+def evaluate_setting(setting):
+    """
+    Runs the jump detector with one setting over every recording of the worker and scores the valid jumps.
+
+    Args:
+        setting (tuple): Values of the parameters in PARAMETER_NAMES.
+
+    Returns:
+        dict: The parameters, the jump counts, precision, recall, F1 score and the seconds spent detecting.
+    """
+
+    high_threshold, low_threshold, min_jump_duration, max_jump_duration, minimum_rotation = setting
+    detected_count = matched_count = 0
+    seconds = 0.0
+    for name, data in worker_streams.items():
+        start_time = time.perf_counter()
+        _, landings, valid = detect_jumps_batch(data, high_threshold, low_threshold,
+                                                round(min_jump_duration * SAMPLING_RATE),
+                                                round(max_jump_duration * SAMPLING_RATE), minimum_rotation)
+        seconds += time.perf_counter() - start_time
+        detected_count += np.count_nonzero(valid)
+        matched_count += match_landings(landings[valid], worker_truth[name])
+
+    known_count = sum(len(landings) for landings in worker_truth.values())
+    precision = matched_count / detected_count if detected_count else 0.0
+    recall = matched_count / known_count if known_count else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if matched_count else 0.0
+    result = dict(zip(PARAMETER_NAMES, setting))
+    result.update(detected=detected_count, matched=matched_count, known=known_count, precision=precision,
+                  recall=recall, f1=f1, seconds=seconds)
+    return result
+
+def run_sweep(streams, truth, grid=DEFAULT_GRID, jobs=None):
+    """
+    Evaluates every combination of the parameter values of a grid, spread over a pool of worker processes.
+
+    Args:
+        streams (dict): Processed data by recording name, see load_recordings.
+        truth (dict): Known landing samples by recording name. Only these recordings are evaluated.
+        grid (dict): List of values of every parameter in PARAMETER_NAMES.
+        jobs (int): Number of worker processes, defaults to the number of cores. 1 evaluates the settings in this
+            process.
+
+    Returns:
+        list: The result of every setting, see evaluate_setting, in the order of the grid.
+    """
+
+    streams = {name: data for name, data in streams.items() if name in truth}
+    settings = list(itertools.product(*(grid[name] for name in PARAMETER_NAMES)))
+    if jobs == 1:
+        load_worker(streams, truth)
+        return [evaluate_setting(setting) for setting in settings]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=load_worker, initargs=(streams, truth)) as executor:
+        return list(executor.map(evaluate_setting, settings, chunksize=max(1, len(settings) // 64)))
+
+def print_results(results, top=None):
+    """
+    Prints a table of the results, best F1 score first. The setting of the current constants is marked with a *.
+
+    Args:
+        results (list): Results from run_sweep.
+        top (int): Number of rows to print, defaults to all.
+    """
+
+    ranked = sorted(results, key=lambda r: (-r['f1'], -r['precision'], r['seconds']))[:top]
+    print(f"  {'high':>5} {'low':>5} {'min s':>5} {'max s':>5} {'rot':>5} | {'found':>5} {'match':>5} {'known':>5} | "
+          f"{'prec':>5} {'recall':>6} {'f1':>5} | {'ms':>6}")
+    for r in ranked:
+        marker = '*' if tuple(r[name] for name in PARAMETER_NAMES) == DEFAULT_SETTING else ' '
+        print(f"{marker} {r['high_threshold']:5.2f} {r['low_threshold']:5.2f} {r['min_jump_duration']:5.2f} "
+              f"{r['max_jump_duration']:5.2f} {r['minimum_rotation']:5.0f} | {r['detected']:5d} {r['matched']:5d} "
+              f"{r['known']:5d} | {r['precision']:5.2f} {r['recall']:6.2f} {r['f1']:5.2f} | "
+              f"{r['seconds'] * 1000:6.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep the jump detector parameters and score them against known jumps.")
+    parser.add_argument('recordings', nargs='*', default=['all'], help="recording directories, or 'all'")
+    parser.add_argument('--truth', help="ground truth CSV with recording,landing_sample rows, defaults to the labeled data")
+    parser.add_argument('--high', type=float, nargs='+', default=DEFAULT_GRID['high_threshold'], help="high thresholds (g)")
+    parser.add_argument('--low', type=float, nargs='+', default=DEFAULT_GRID['low_threshold'], help="low thresholds (g)")
+    parser.add_argument('--min-duration', type=float, nargs='+', default=DEFAULT_GRID['min_jump_duration'],
+                        help="minimum jump durations (s)")
+    parser.add_argument('--max-duration', type=float, nargs='+', default=DEFAULT_GRID['max_jump_duration'],
+                        help="maximum jump durations (s)")
+    parser.add_argument('--rotation', type=float, nargs='+', default=DEFAULT_GRID['minimum_rotation'],
+                        help="minimum rotations (deg)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes, defaults to the core count")
+    parser.add_argument('--top', type=int, default=None, help="number of settings to print, defaults to all")
+    parser.add_argument('--save', action='store_true', help="save the results as CSV to the benchmarks directory")
+    args = parser.parse_args()
+
+    recordings = args.recordings
+    if recordings == ['all']:
+        recordings = sorted(glob.glob(os.path.join(RECORDINGS_DIR, 'recording_*')))
+    start_time = time.perf_counter()
+    streams = load_recordings(recordings)
+    truth = read_truth(args.truth) if args.truth else labeled_truth(streams)
+    truth = {name: landings for name, landings in truth.items() if name in streams}
+    if not truth:
+        print("No known jumps in the given recordings")
+        sys.exit(1)
+    print(f"Loaded {len(streams)} recordings with {sum(len(l) for l in truth.values())} known jumps in "
+          f"{len(truth)} of them in {time.perf_counter() - start_time:.2f}s")
+
+    grid = dict(high_threshold=args.high, low_threshold=args.low, min_jump_duration=args.min_duration,
+                max_jump_duration=args.max_duration, minimum_rotation=args.rotation)
+    start_time = time.perf_counter()
+    results = run_sweep(streams, truth, grid, args.jobs)
+    print(f"Evaluated {len(results)} settings in {time.perf_counter() - start_time:.2f}s")
+    print_results(results, args.top)
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"sweep_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Saved the results to {output_path}")
@@ -0,0 +1,339 @@
+import os
+import sys
+import glob
+import lzma
+import zlib
+import struct
+import numpy as np
+import recording_store
+
+'''
+Compressed archives of saved recordings. A stream such as recording_N/raw_data is stored as recording_N/raw_data.arc,
+read through recording_store.py like an uncompressed store, so chunk paths keep working. Only codecs of the standard
+library are used.
+
+The samples are compressed in blocks of BLOCK_FILES files. Before compressing, every block is delta encoded along time
+and its bytes are shuffled so that the low and high bytes of each channel are stored together, which compresses IMU
+data much better than the plain samples. The archive starts with a header and ends with an index of the files and
+blocks, so a single file can be read by decompressing only its block:
+
+    header: magic, version, codec, channels, file count, block count, index offset
+    blocks: compressed data of every block
+    index:  int64 rows of (file number, first sample, sample count) for every file, followed by rows of
+            (offset, compressed size, first sample, sample count, crc32) for every block
+'''
+
+# Constants
+SENSOR_COUNT = 5
+CHANNELS = SENSOR_COUNT * 6
+BASE_DIR = os.path.dirname(__file__)
+STREAM_NAMES = ['raw_data', 'processed_data']
+ARCHIVE_EXTENSION = '.arc'
+MAGIC = b'SKAR'
+VERSION = 1
+CODECS = {'zlib': 0, 'lzma': 1}
+HEADER = struct.Struct('<4sBBHQQQ')  # magic, version, codec, channels, file count, block count, index offset
+BLOCK_FILES = 16  # Files compressed together, more compress better but reading a single file decompresses more
+ZLIB_LEVEL = 9
+
+def archive_path(data_dir):
+    """
+    Returns the path of the archive of a stream.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files, e.g. recording_N/raw_data.
+
+    Returns:
+        str: The archive path, e.g. recording_N/raw_data.arc.
+    """
+
+    return os.path.normpath(data_dir) + ARCHIVE_EXTENSION
+
+def has_archive(data_dir):
+    """
+    Checks if a stream has been archived.
+    """
+
+    return os.path.exists(archive_path(data_dir))
+
+def encode_block(samples):
+    """
+    Delta encodes a block of samples along time and shuffles its bytes, see the module description.
+
+    Args:
+        samples (numpy.array): int16 samples of shape (samples, CHANNELS).
+
+    Returns:
+        bytes: The encoded block, the same size as the samples.
+    """
+
+    delta = np.diff(samples, axis=0, prepend=np.zeros((1, samples.shape[1]), dtype=np.int16)).astype('<i2')
+    return np.ascontiguousarray(delta.view(np.uint8).reshape((len(samples), -1, 2)).transpose(2, 1, 0)).tobytes()
+
+def decode_block(data, sample_count, channels=CHANNELS):
+    """
+    Reverses encode_block.
+
+    Args:
+        data (bytes): The encoded block.
+        sample_count (int): Number of samples in the block.
+        channels (int): Number of channels of every sample.
+
+    Returns:
+        numpy.array: int16 samples of shape (samples, channels).
+    """
+
+    shuffled = np.frombuffer(data, dtype=np.uint8).reshape((2, channels, sample_count))
+    delta = np.ascontiguousarray(shuffled.transpose(2, 1, 0)).view('<i2').reshape((sample_count, channels))
+    return np.cumsum(delta, axis=0, dtype=np.int16)  # Wraps around like the differences did
+
+def compress(data, codec):
+    """
+    Compresses an encoded block with the codec of an archive, see CODECS.
+    """
+
+    if codec == CODECS['lzma']:
+        return lzma.compress(data, preset=6)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(data, codec):
+    """
+    Decompresses a block with the codec of an archive, see CODECS.
+    """
+
+    if codec == CODECS['lzma']:
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+def write_archive(chunks, path, codec='zlib'):
+    """
+    Writes the files of a stream to an archive. The archive is written to a temporary file first, so it is never
+    seen half written.
+
+    Args:
+        chunks (list): (file number, int16 data) of the files, in order.
+        path (str): Path of the archive.
+        codec (str): 'zlib', or 'lzma' which compresses a bit better but is several times slower.
+
+    Returns:
+        int: Size of the archive in bytes.
+    """
+
+    codec_id = CODECS[codec]
+    files = []
+    blocks = []
+    first_sample = 0
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        for start in range(0, len(chunks), BLOCK_FILES):
+            block_chunks = [(file_number, np.asarray(data, dtype=np.int16).reshape((-1, CHANNELS)))
+                            for file_number, data in chunks[start:start + BLOCK_FILES]]
+            samples = np.concatenate([data for _, data in block_chunks])
+            for file_number, data in block_chunks:
+                files.append((file_number, first_sample, len(data)))
+                first_sample += len(data)
+            encoded = encode_block(samples)
+            compressed = compress(encoded, codec_id)
+            blocks.append((f.tell(), len(compressed), first_sample - len(samples), len(samples), zlib.crc32(encoded)))
+            f.write(compressed)
+        index_offset = f.tell()
+        f.write(np.array(files, dtype='<i8').reshape((-1, 3)).tobytes())
+        f.write(np.array(blocks, dtype='<i8').reshape((-1, 5)).tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, codec_id, CHANNELS, len(files), len(blocks), index_offset))
+        size = index_offset + (len(files) * 3 + len(blocks) * 5) * 8
+    os.replace(temporary_path, path)
+    return size
+
+class ArchiveReader:
+    """
+    Read access to the archive of a stream, with the interface of recording_store.RecordingReader. The last
+    decompressed block is kept, so reading the files of a block one after another decompresses it once.
+    """
+
+    def __init__(self, data_dir):
+        self.path = archive_path(data_dir)
+        self.index_path = self.path  # Checked for changes by recording_store.open_store
+        self.index_size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            magic, version, self.codec, self.channels, file_count, block_count, index_offset = HEADER.unpack(
+                f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a recording archive")
+            f.seek(index_offset)
+            self.index = np.frombuffer(f.read(file_count * 3 * 8), dtype='<i8').reshape((file_count, 3))
+            self.blocks = np.frombuffer(f.read(block_count * 5 * 8), dtype='<i8').reshape((block_count, 5))
+        self.sample_count = int(self.blocks[-1, 2] + self.blocks[-1, 3]) if block_count else 0
+        self.rows = {int(file_number): row for row, file_number in enumerate(self.index[:, 0])}
+        self.cached_block = None  # (block number, samples)
+
+    @property
+    def file_numbers(self):
+        """
+        list: The numbers of the archived files, in the order they were archived.
+        """
+
+        return self.index[:, 0].tolist()
+
+    def block(self, block_number):
+        """
+        Decompresses a block.
+
+        Args:
+            block_number (int): Index of the block.
+
+        Returns:
+            numpy.array: Read-only int16 samples of the block, shape (samples, channels).
+        """
+
+        if self.cached_block is not None and self.cached_block[0] == block_number:
+            return self.cached_block[1]
+        offset, size, _, sample_count, crc = self.blocks[block_number]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            encoded = decompress(f.read(size), self.codec)
+        if zlib.crc32(encoded) != crc:
+            raise ValueError(f"Block {block_number} of {self.path} is corrupted")
+        samples = decode_block(encoded, int(sample_count), self.channels)
+        samples.flags.writeable = False
+        self.cached_block = (block_number, samples)
+        return samples
+
+    def samples(self, start=0, stop=None):
+        """
+        Returns a range of samples, decompressing only the blocks it covers.
+
+        Args:
+            start (int): First sample.
+            stop (int): Sample after the last sample, defaults to the end of the stream.
+
+        Returns:
+            numpy.array: int16 array of shape (samples, channels).
+        """
+
+        start, stop, _ = slice(start, stop).indices(self.sample_count)
+        if stop <= start:
+            return np.zeros((0, self.channels), dtype=np.int16)
+        first_samples = self.blocks[:, 2]
+        first_block = np.searchsorted(first_samples, start, side='right') - 1
+        last_block = np.searchsorted(first_samples, stop - 1, side='right') - 1
+        if first_block == last_block:
+            block_start = first_samples[first_block]
+            return self.block(first_block)[start - block_start:stop - block_start]
+        data = np.concatenate([self.block(b) for b in range(first_block, last_block + 1)])
+        return data[start - first_samples[first_block]:stop - first_samples[first_block]]
+
+    def chunk(self, file_number):
+        """
+        Returns the data of one of the original files.
+
+        Args:
+            file_number (int): The number of the file.
+
+        Returns:
+            numpy.array or None: int16 array of shape (samples, channels), or None if it is not archived.
+        """
+
+        row = self.rows.get(file_number)
+        if row is None:
+            return None
+        _, first_sample, sample_count = self.index[row]
+        return self.samples(first_sample, first_sample + sample_count)
+
+def read_files(data_dir):
+    """
+    Reads the separate files of a stream, or its uncompressed store if it has no separate files.
+
+    Returns:
+        list: (file number, int16 data) of the files, in order.
+    """
+
+    return [(recording_store.chunk_number(path), recording_store.read_chunk(path))
+            for path in recording_store.list_chunks(data_dir)]
+
+def archive_stream(source_dir, data_dir, codec='zlib'):
+    """
+    Archives a stream.
+
+    Args:
+        source_dir (str): Directory of the stream, stored as separate files or in an uncompressed store.
+        data_dir (str): Directory whose archive is written, may be the same as source_dir.
+        codec (str): 'zlib' or 'lzma'.
+
+    Returns:
+        tuple: (number of files, bytes before compression, bytes of the archive)
+    """
+
+    chunks = read_files(source_dir)
+    size = write_archive(chunks, archive_path(data_dir), codec)
+    return len(chunks), sum(data.nbytes for _, data in chunks), size
+
+def archive_recording(recording_dir, codec='zlib', remove=False):
+    """
+    Archives the streams of a saved recording.
+
+    Args:
+        recording_dir (str): The recording directory, e.g. data/recordings/recording_N.
+        codec (str): 'zlib' or 'lzma'.
+        remove (bool): If True the separate files and the uncompressed store are deleted once they are archived.
+    """
+
+    for stream_name in STREAM_NAMES:
+        data_dir = os.path.join(recording_dir, stream_name)
+        store_files = [path for path in recording_store.store_paths(data_dir) if os.path.exists(path)]
+        if not glob.glob(os.path.join(data_dir, '*.bin')) and not store_files:
+            continue  # Nothing to archive, or already archived
+        file_count, original_size, size = archive_stream(data_dir, data_dir, codec)
+        print(f"Archived {file_count} files of {data_dir}: {original_size} to {size} bytes")
+        if remove:
+            if os.path.isdir(data_dir):
+                recording_store.remove_chunks(data_dir)
+            for path in store_files:
+                os.remove(path)
+
+def extract_recording(recording_dir):
+    """
+    Writes the archived streams of a recording back to separate files, e.g. to edit them.
+
+    Args:
+        recording_dir (str): The recording directory.
+    """
+
+    for stream_name in STREAM_NAMES:
+        data_dir = os.path.join(recording_dir, stream_name)
+        if not has_archive(data_dir):
+            continue
+        reader = ArchiveReader(data_dir)
+        os.makedirs(data_dir, exist_ok=True)
+        for file_number in reader.file_numbers:
+            reader.chunk(file_number).tofile(os.path.join(data_dir, f'{file_number}.bin'))
+        print(f"Extracted {len(reader.file_numbers)} files of {data_dir}")
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    codec = 'lzma' if '--lzma' in sys.argv else 'zlib'
+    if len(args) > 2 and args[0] == 'pack':
+        # Archive a live session, e.g. python recording_archive.py pack data/live data/recordings/recording_N
+        source_dir, recording_dir = args[1], args[2]
+        os.makedirs(recording_dir, exist_ok=True)
+        for stream_name in STREAM_NAMES:
+            file_count, original_size, size = archive_stream(os.path.join(source_dir, stream_name),
+                                                             os.path.join(recording_dir, stream_name), codec)
+            recording_store.copy_kept_files(os.path.join(source_dir, stream_name),
+                                            os.path.join(recording_dir, stream_name))
+            print(f"Archived {file_count} files of {stream_name} in {recording_dir}: {original_size} to {size} bytes")
+    elif len(args) > 1 and args[0] in ('archive', 'extract'):
+        # e.g. python recording_archive.py archive all --remove
+        recordings = args[1:]
+        if recordings == ['all']:
+            recordings = sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+        for recording in recordings:
+            if args[0] == 'archive':
+                archive_recording(recording, codec, '--remove' in sys.argv)
+            else:
+                extract_recording(recording)
+    else:
+        print("Usage: python recording_archive.py pack <live dir> <recording dir> [--lzma]")
+        print("       python recording_archive.py archive <recording dir>... | all [--lzma] [--remove]")
+        print("       python recording_archive.py extract <recording dir>... | all")
@@ -0,0 +1,376 @@
+import os
+import sys
+import glob
+import shutil
+import numpy as np
+import recording_archive
+
+'''
+Append-only single file storage for recordings. Instead of a directory with one small file per chunk, a stream such
+as recording_N/raw_data is stored as recording_N/raw_data.dat holding every sample, plus recording_N/raw_data.idx which
+records where each original file starts. The data file can be memory mapped and sliced by sample.
+
+Chunks keep their original paths (recording_N/raw_data/12.bin), read_chunk finds them in the store when the file
+itself does not exist, so code that works with chunk paths does not need to know how a recording is stored. The same
+goes for streams in a compressed archive, see recording_archive.py.
+'''
+
+# Constants
+SENSOR_COUNT = 5
+CHANNELS = SENSOR_COUNT * 6
+BASE_DIR = os.path.dirname(__file__)
+STREAM_NAMES = ['raw_data', 'processed_data']
+DATA_EXTENSION = '.dat'  # Contiguous int16 samples of a stream, shape (samples, CHANNELS)
+INDEX_EXTENSION = '.idx'  # One int64 row of (file number, first sample, sample count) per appended file
+KEPT_NAMES = ['gaps.txt']  # Files of a stream directory that are kept besides the chunks, see data_processing.GAPS_NAME
+
+def store_paths(data_dir):
+    """
+    Returns the paths of the data and index file that store a stream.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files, e.g. recording_N/raw_data.
+
+    Returns:
+        tuple: (data_path, index_path)
+    """
+
+    data_dir = os.path.normpath(data_dir)
+    return data_dir + DATA_EXTENSION, data_dir + INDEX_EXTENSION
+
+def has_store(data_dir):
+    """
+    Checks if a stream has been stored in a single file.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files.
+
+    Returns:
+        bool: True if the store exists.
+    """
+
+    return os.path.exists(store_paths(data_dir)[1])
+
+class RecordingWriter:
+    """
+    Appends files to the store of a stream. Data is written before the index, so the index never points at data that
+    is not on disk yet.
+    """
+
+    def __init__(self, data_dir):
+        self.data_path, self.index_path = store_paths(data_dir)
+        index = read_index(self.index_path)
+        self.sample_count = int(index[-1, 1] + index[-1, 2]) if len(index) else 0
+        self.file_numbers = set(index[:, 0].tolist())
+
+    def append(self, file_number, data):
+        """
+        Appends the data of a file to the end of the stream.
+
+        Args:
+            file_number (int): The number of the file.
+            data (numpy.array): The int16 data of the file.
+
+        Returns:
+            bool: False if the file was already stored.
+        """
+
+        if file_number in self.file_numbers:
+            return False
+        data = np.ascontiguousarray(data, dtype=np.int16).reshape((-1, CHANNELS))
+        with open(self.data_path, 'ab') as f:
+            f.seek(self.sample_count * CHANNELS * 2)
+            f.truncate()  # Drop data that was written without being indexed
+            f.write(data)
+        with open(self.index_path, 'ab') as f:
+            f.write(np.array([file_number, self.sample_count, len(data)], dtype=np.int64))
+        self.sample_count += len(data)
+        self.file_numbers.add(file_number)
+        return True
+
+def read_index(index_path):
+    """
+    Reads the index of a store.
+
+    Args:
+        index_path (str): Path of the index file.
+
+    Returns:
+        numpy.array: int64 array of shape (files, 3) with rows of (file number, first sample, sample count).
+    """
+
+    if not os.path.exists(index_path):
+        return np.zeros((0, 3), dtype=np.int64)
+    index = np.fromfile(index_path, dtype=np.int64)
+    return index[:len(index) - len(index) % 3].reshape((-1, 3))  # Ignore a row that is still being written
+
+class RecordingReader:
+    """
+    Memory mapped read access to the store of a stream.
+    """
+
+    def __init__(self, data_dir):
+        self.data_path, self.index_path = store_paths(data_dir)
+        self.index = read_index(self.index_path)
+        self.index_size = os.path.getsize(self.index_path)
+        self.sample_count = int(self.index[-1, 1] + self.index[-1, 2]) if len(self.index) else 0
+        self.rows = {int(file_number): row for row, file_number in enumerate(self.index[:, 0])}
+        if self.sample_count:
+            self.data = np.memmap(self.data_path, dtype=np.int16, mode='r', shape=(self.sample_count, CHANNELS))
+        else:
+            self.data = np.zeros((0, CHANNELS), dtype=np.int16)
+
+    @property
+    def file_numbers(self):
+        """
+        list: The numbers of the stored files, in the order they were appended.
+        """
+
+        return self.index[:, 0].tolist()
+
+    def samples(self, start=0, stop=None):
+        """
+        Returns a range of samples without reading the rest of the stream.
+
+        Args:
+            start (int): First sample.
+            stop (int): Sample after the last sample, defaults to the end of the stream.
+
+        Returns:
+            numpy.array: Memory mapped int16 array of shape (samples, CHANNELS).
+        """
+
+        return self.data[start:stop]
+
+    def chunk(self, file_number):
+        """
+        Returns the data of one of the original files.
+
+        Args:
+            file_number (int): The number of the file.
+
+        Returns:
+            numpy.array or None: Memory mapped int16 array of shape (samples, CHANNELS), or None if it is not stored.
+        """
+
+        row = self.rows.get(file_number)
+        if row is None:
+            return None
+        _, first_sample, sample_count = self.index[row]
+        return self.data[first_sample:first_sample + sample_count]
+
+# Open readers by data directory, reopened when the index grows or the archive is rewritten
+readers = {}
+
+def open_store(data_dir):
+    """
+    Returns a reader for the store or archive of a stream, reusing the open reader if the stream has not changed.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files.
+
+    Returns:
+        RecordingReader, recording_archive.ArchiveReader or None: The reader, or None if the stream has no store or
+            archive.
+    """
+
+    data_dir = os.path.normpath(data_dir)
+    if has_store(data_dir):
+        reader_class = RecordingReader
+    elif recording_archive.has_archive(data_dir):
+        reader_class = recording_archive.ArchiveReader
+    else:
+        readers.pop(data_dir, None)
+        return None
+    reader = readers.get(data_dir)
+    if (reader is None or type(reader) is not reader_class
+            or reader.index_size != os.path.getsize(reader.index_path)):
+        reader = reader_class(data_dir)
+        readers[data_dir] = reader
+    return reader
+
+def chunk_number(file_path):
+    """
+    Returns the file number from the path of a chunk, e.g. 12 for raw_data/12.bin.
+
+    Args:
+        file_path (str): Path of the chunk.
+
+    Returns:
+        int or None: The file number, or None if the name is not a number.
+    """
+
+    try:
+        return int(os.path.splitext(os.path.basename(file_path))[0])
+    except ValueError:
+        return None
+
+def list_chunks(data_dir):
+    """
+    Lists the chunks of a stream in order, whether they are separate files or in a store.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files.
+
+    Returns:
+        list: Chunk paths sorted by file number.
+    """
+
+    files = glob.glob(os.path.join(data_dir, '*.bin'))
+    if files:
+        return sorted(files, key=chunk_number)
+    reader = open_store(data_dir)
+    if reader is None:
+        return []
+    return [os.path.join(data_dir, f'{file_number}.bin') for file_number in sorted(reader.file_numbers)]
+
+def chunk_signature(file_path):
+    """
+    Returns a value that changes whenever the data of a chunk changes, so decoded chunks can be cached.
+
+    Args:
+        file_path (str): Path of the chunk.
+
+    Returns:
+        tuple or None: (size, modification time) of a separate file, (first sample, sample count) of a stored chunk,
+            or None if the chunk does not exist.
+    """
+
+    try:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+    except FileNotFoundError:
+        pass
+    reader = open_store(os.path.dirname(file_path))
+    file_number = chunk_number(file_path)
+    if reader is None or file_number not in reader.rows:
+        return None
+    # Stored chunks are never modified, only appended
+    _, first_sample, sample_count = reader.index[reader.rows[file_number]]
+    return int(first_sample), int(sample_count)
+
+def read_chunk(file_path):
+    """
+    Reads the int16 data of a chunk. Separate files are read directly, otherwise the chunk is looked up in the store
+    of its directory.
+
+    Args:
+        file_path (str): Path of the chunk.
+
+    Returns:
+        numpy.array or None: Flat int16 array, or None if the chunk does not exist.
+    """
+
+    if os.path.exists(file_path):
+        return np.fromfile(file_path, dtype=np.int16)
+    reader = open_store(os.path.dirname(file_path))
+    file_number = chunk_number(file_path)
+    if reader is None or file_number is None:
+        return None
+    data = reader.chunk(file_number)
+    return None if data is None else data.ravel()
+
+def read_stream(data_dir):
+    """
+    Reads a whole stream into one array, memory mapped when it is in a store.
+
+    Args:
+        data_dir (str): Directory the stream is stored in as separate files.
+
+    Returns:
+        numpy.array: int16 array of shape (samples, CHANNELS).
+    """
+
+    files = glob.glob(os.path.join(data_dir, '*.bin'))
+    if not files:
+        reader = open_store(data_dir)
+        if reader is not None:
+            return reader.samples()
+    chunks = [np.fromfile(f, dtype=np.int16) for f in sorted(files, key=chunk_number)]
+    if not chunks:
+        return np.zeros((0, CHANNELS), dtype=np.int16)
+    return np.concatenate(chunks).reshape((-1, CHANNELS))
+
+def pack_stream(source_dir, data_dir):
+    """
+    Appends the separate files of a stream to a store, in order of their file numbers.
+
+    Args:
+        source_dir (str): Directory containing the separate files.
+        data_dir (str): Directory whose store the files are appended to, may be the same as source_dir.
+
+    Returns:
+        int: The number of files that were packed, files that are already in the store are skipped.
+    """
+
+    writer = RecordingWriter(data_dir)
+    files = sorted(glob.glob(os.path.join(source_dir, '*.bin')), key=chunk_number)
+    return sum(writer.append(chunk_number(f), np.fromfile(f, dtype=np.int16)) for f in files)
+
+def copy_kept_files(source_dir, data_dir):
+    """
+    Copies the files of a stream directory that are kept besides its chunks, see KEPT_NAMES, e.g. when a live
+    session is stored as a recording.
+
+    Args:
+        source_dir (str): Directory of the stream the files are copied from.
+        data_dir (str): Directory of the stream the files are copied to.
+    """
+
+    for name in KEPT_NAMES:
+        source_path = os.path.join(source_dir, name)
+        if os.path.exists(source_path):
+            os.makedirs(data_dir, exist_ok=True)
+            shutil.copyfile(source_path, os.path.join(data_dir, name))
+
+def remove_chunks(data_dir):
+    """
+    Deletes the separate files of a stream once they are stored. The other files of the directory, such as the gaps
+    file of processed data, are kept. The directory itself is only deleted if nothing else is left in it.
+
+    Args:
+        data_dir (str): Directory of the stream.
+    """
+
+    for file_path in glob.glob(os.path.join(data_dir, '*.bin')):
+        os.remove(file_path)
+    if not os.listdir(data_dir):
+        os.rmdir(data_dir)
+
+def convert_recording(recording_dir, remove=False):
+    """
+    Converts the streams of an existing recording from separate files to stores.
+
+    Args:
+        recording_dir (str): The recording directory, e.g. data/recordings/recording_N.
+        remove (bool): If True the separate files are deleted once they are stored.
+    """
+
+    for stream_name in STREAM_NAMES:
+        data_dir = os.path.join(recording_dir, stream_name)
+        if not os.path.isdir(data_dir):
+            continue
+        count = pack_stream(data_dir, data_dir)
+        print(f"Stored {count} files of {data_dir}")
+        if remove:
+            remove_chunks(data_dir)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == 'pack':
+        # Store a live session as a recording, e.g. python recording_store.py pack data/live data/recordings/recording_N
+        source_dir, recording_dir = sys.argv[2], sys.argv[3]
+        for stream_name in STREAM_NAMES:
+            count = pack_stream(os.path.join(source_dir, stream_name), os.path.join(recording_dir, stream_name))
+            copy_kept_files(os.path.join(source_dir, stream_name), os.path.join(recording_dir, stream_name))
+            print(f"Stored {count} files of {stream_name} in {recording_dir}")
+    elif len(sys.argv) > 2 and sys.argv[1] == 'convert':
+        # Convert existing recordings, e.g. python recording_store.py convert all --remove
+        remove = '--remove' in sys.argv
+        recordings = [arg for arg in sys.argv[2:] if arg != '--remove']
+        if recordings == ['all']:
+            recordings = sorted(glob.glob(os.path.join(BASE_DIR, 'data/recordings', 'recording_*')))
+        for recording in recordings:
+            convert_recording(recording, remove)
+    else:
+        print("Usage: python recording_store.py pack <live dir> <recording dir>")
+        print("       python recording_store.py convert <recording dir>... | all [--remove]")
@@ -0,0 +1,145 @@
+import time
+
+'''
+Puts the files of a live stream back in order. Uploads over a flaky connection can arrive out of order or not at all,
+but the filter and jump detection need every file in sequence. Files that arrive early are held until the files before
+them arrive, for at most a latency bound. After that the missing files are given up on and released as gaps, so a
+lost upload delays processing by the latency bound instead of stopping it.
+'''
+
+# Constants
+REORDER_LATENCY = 2.0  # Seconds a file is held while waiting for the files before it
+MAX_GAP = 10  # Files a stream can jump by before it is treated as restarted instead of waiting for the missing files
+
+class ReorderBuffer:
+    """
+    Holds the files of a stream that arrived ahead of a missing file and releases them in order of their number.
+    """
+
+    def __init__(self, next_number=0, latency=REORDER_LATENCY, max_gap=MAX_GAP):
+        """
+        Args:
+            next_number (int): Number of the next file of the stream, the files before it count as released.
+            latency (float): Seconds a file is held while waiting for the files before it.
+            max_gap (int): Files the stream can jump by before it is treated as restarted, see add.
+        """
+
+        self.next_number = next_number
+        self.latency = latency
+        self.max_gap = max_gap
+        self.pending = {}  # (data, arrival time) of the held files by number
+        self.done = set(range(max(0, next_number - max_gap), next_number))  # Recent released files, see is_late
+
+    def add(self, number, data, now=None):
+        """
+        Adds a received file.
+
+        File 0, or any file below the next one that was never released, means the device restarted its numbering.
+        The held files of the old stream are released and the new stream starts over, waiting for the files before
+        the new one if it is close to the start. A file far above the next one means the stream was interrupted for
+        longer than it is worth waiting for, the stream continues from there. A file that was already released or
+        given up on is late and dropped.
+
+        Args:
+            number (int): Number of the file.
+            data: The data of the file.
+            now (float): Arrival time, defaults to time.perf_counter().
+
+        Returns:
+            list: (number, data) of the files that are ready, in order. data is None for a missing file.
+        """
+
+        now = time.perf_counter() if now is None else now
+        released = []
+        if self.is_late(number) or number in self.pending:
+            return []
+        if number < self.next_number:
+            released = self.flush()
+            self.done.clear()
+            self.next_number = 0 if number <= self.max_gap else number
+        elif number - self.next_number > self.max_gap:
+            released = self.flush()
+            self.done.update(range(max(self.next_number, number - self.max_gap), number))  # Given up on
+            self.next_number = number
+        self.pending[number] = (data, now)
+        return released + self.release()
+
+    def is_late(self, number):
+        """
+        Checks if a file arrived after it was released or given up on, see add. File 0 is never late, it starts a
+        new stream.
+        """
+
+        return number != 0 and number in self.done
+
+    def mark_done(self, number):
+        """
+        Records that a file was released or given up on. Only the last max_gap numbers are kept, a file further back
+        is treated as the start of a restarted stream.
+        """
+
+        self.done.add(number)
+        if len(self.done) > 2 * self.max_gap:
+            self.done = {n for n in self.done if n >= self.next_number - self.max_gap}
+
+    def release(self):
+        """
+        Releases the held files that directly follow the last released one.
+
+        Returns:
+            list: (number, data) of the released files.
+        """
+
+        released = []
+        while self.next_number in self.pending:
+            released.append((self.next_number, self.pending.pop(self.next_number)[0]))
+            self.mark_done(self.next_number)
+            self.next_number += 1
+        return released
+
+    def expire(self, now=None):
+        """
+        Gives up on missing files once a file after them has been held for the latency bound.
+
+        Args:
+            now (float): Current time, defaults to time.perf_counter().
+
+        Returns:
+            list: (number, data) of the files that are ready, in order. data is None for a missing file.
+        """
+
+        now = time.perf_counter() if now is None else now
+        released = []
+        while self.pending and min(arrival for _, arrival in self.pending.values()) + self.latency <= now:
+            released += self.skip_to(min(self.pending))
+        return released
+
+    def flush(self):
+        """
+        Gives up on every missing file, e.g. when the stream ends.
+
+        Returns:
+            list: (number, data) of all held files and the gaps between them, in order.
+        """
+
+        released = []
+        while self.pending:
+            released += self.skip_to(min(self.pending))
+        return released
+
+    def skip_to(self, number):
+        """
+        Marks the files up to a held file as missing and releases the held files from there on.
+
+        Returns:
+            list: (number, data) of the missing and released files.
+        """
+
+        released = [(missing, None) for missing in range(self.next_number, number)]
+        for missing in range(self.next_number, number):
+            self.mark_done(missing)
+        self.next_number = number
+        return released + self.release()
+
+    def __len__(self):
+        return len(self.pending)
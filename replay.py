@@ -0,0 +1,383 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import http.client
+import urllib.parse
+import numpy as np
+import data_processing
+import jump_index
+from live_stream import iter_events, close_connection
+from recording_store import list_chunks, read_chunk, chunk_number
+
+'''
+Load test of the ingest server. Saved recordings are replayed into /postdata by a number of simulated devices at once,
+each uploading its own session at real-time speed, a multiple of it, or as fast as the server accepts them. Every
+device also follows the live stream of its session, so the time from uploading a file until it is processed and until
+a jump in it is published can be measured. Afterwards the jumps each device received are compared with the jumps of
+the same recording processed without load.
+'''
+
+# Constants
+BASE_DIR = os.path.dirname(__file__)
+RECORDINGS_DIR = os.path.join(BASE_DIR, 'data/recordings')
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks')
+SERVER_URL = 'http://localhost:5000'
+READINGS_PER_FILE = data_processing.READINGS_PER_FILE
+SAMPLING_RATE = 100  # Hz of IMU sampling, a file covers READINGS_PER_FILE / SAMPLING_RATE seconds
+SETTLE_TIME = 10  # Seconds to wait for the last files to be processed after the uploads are done
+REQUEST_TIMEOUT = 30  # Seconds before an upload is counted as failed
+TAKEOFF_TOLERANCE = 10  # Samples a takeoff can differ by between the replay and the offline result and still match
+BOUNDARY = 'replay-boundary'
+
+def load_recording(recording):
+    """
+    Reads the raw files of a recording, whether they are separate files, a store or an archive.
+
+    Args:
+        recording (str): The recording directory.
+
+    Returns:
+        list: (file number, raw bytes) of every file, in order.
+    """
+
+    data_dir = os.path.join(recording, data_processing.DATA_NAME)
+    return [(chunk_number(path), read_chunk(path).tobytes()) for path in list_chunks(data_dir)]
+
+def encode_upload(file_number, raw_bytes):
+    """
+    Builds the multipart body the microcontroller uploads a file with.
+
+    Returns:
+        bytes: The request body, its content type is multipart/form-data with BOUNDARY.
+    """
+
+    return (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{file_number}.bin"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + raw_bytes + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+def percentiles(values):
+    """
+    Summarizes a list of latencies.
+
+    Returns:
+        dict: count, mean, p50, p95, p99 and max in milliseconds, or only the count if there are no values.
+    """
+
+    if not values:
+        return dict(count=0)
+    values = np.array(values) * 1000
+    return dict(count=len(values), mean=float(values.mean()), p50=float(np.percentile(values, 50)),
+                p95=float(np.percentile(values, 95)), p99=float(np.percentile(values, 99)), max=float(values.max()))
+
+class ReplayDevice:
+    """
+    A simulated device that uploads the files of a recording as its own session and follows the live stream of the
+    session.
+    """
+
+    def __init__(self, url, session_id, recording, chunks):
+        """
+        Args:
+            url (str): Base URL of the server.
+            session_id (str): Session the files are uploaded to.
+            recording (str): The recording directory that is replayed.
+            chunks (list): The files of the recording, see load_recording.
+        """
+
+        self.url = url
+        self.session_id = session_id
+        self.recording = recording
+        self.chunks = chunks
+        self.sent_times = {}  # Time every file was sent, by file number
+        self.requests = []  # (file number, status, seconds) of every upload, status is None if it failed
+        self.processed = {}  # Time every file was published as processed, by file number
+        self.jumps = []  # (time received, jump) of every published jump
+        self.gaps = []  # Numbers of the files the server filled in
+        self.socket = None
+        self.stream_open = threading.Event()
+        self.finished = threading.Event()  # Set once the last file has been processed
+
+    def upload(self, start_time, interval):
+        """
+        Uploads the files one by one on a fixed schedule, so a slow response delays the next upload but does not
+        shift the ones after it.
+
+        Args:
+            start_time (float): time.perf_counter() at which the first file is uploaded.
+            interval (float): Seconds between uploads, 0 uploads as fast as the server responds.
+        """
+
+        parts = urllib.parse.urlsplit(self.url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=REQUEST_TIMEOUT)
+        path = f'/postdata?session={self.session_id}'
+        headers = {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'}
+        try:
+            for i, (file_number, raw_bytes) in enumerate(self.chunks):
+                delay = start_time + i * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                body = encode_upload(file_number, raw_bytes)
+                sent_time = time.perf_counter()
+                self.sent_times[file_number] = sent_time
+                try:
+                    connection.request('POST', path, body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException) as e:
+                    print(f"Upload of file {file_number} of {self.session_id} failed: {e}")
+                    connection.close()
+                    status = None
+                self.requests.append((file_number, status, time.perf_counter() - sent_time))
+        finally:
+            connection.close()
+
+    def listen(self):
+        """
+        Records the events of the live stream of the session until stop is called.
+        """
+
+        last_file = self.chunks[-1][0] if self.chunks else -1
+
+        def on_open(sock):
+            self.socket = sock
+            self.stream_open.set()
+
+        try:
+            for event, data in iter_events(f'{self.url}/stream?session={self.session_id}', on_open=on_open):
+                received_time = time.perf_counter()
+                if event == 'samples':
+                    self.processed[data['file_number']] = received_time
+                    if data['file_number'] == last_file:
+                        self.finished.set()
+                elif event == 'jump':
+                    self.jumps.append((received_time, data))
+                elif event == 'gap':
+                    self.gaps.append(data['file_number'])
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            if not self.finished.is_set():
+                print(f"Live stream of {self.session_id} lost: {e}")
+        finally:
+            self.stream_open.set()  # Do not keep the uploads waiting for a stream that failed to open
+
+    def stop(self):
+        """
+        Ends the live stream of the session.
+        """
+
+        if self.socket is not None:
+            close_connection(self.socket)
+
+    def summary(self):
+        """
+        Returns the measurements of the device.
+
+        Returns:
+            dict: The uploads by status, their latencies, and the latencies from upload to processing and to jumps.
+        """
+
+        statuses = {}
+        for _, status, _ in self.requests:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        processing_latencies = [self.processed[n] - self.sent_times[n] for n in self.processed if n in self.sent_times]
+        # A jump is published once the last file of its data has been processed
+        jump_latencies = [received_time - self.sent_times[jump['last_chunk']] for received_time, jump in self.jumps
+                          if jump.get('last_chunk') in self.sent_times]
+        return dict(session=self.session_id, recording=os.path.basename(self.recording), files=len(self.chunks),
+                    statuses=statuses, upload_latency=percentiles([seconds for _, _, seconds in self.requests]),
+                    processing_latency=percentiles(processing_latencies), jump_latency=percentiles(jump_latencies),
+                    processed=len(self.processed), gaps=len(self.gaps), jumps=len(self.jumps))
+
+def reference_jumps(recording):
+    """
+    Processes a recording without load, on a temporary copy of its raw data, the way the server streams it and the
+    way 'data_processing.py all' processes it offline.
+
+    Args:
+        recording (str): The recording directory.
+
+    Returns:
+        tuple: (streamed, offline) takeoff samples of the jumps.
+    """
+
+    chunks = load_recording(recording)
+    takeoffs = []
+    with tempfile.TemporaryDirectory() as temp_dir, contextlib.redirect_stdout(io.StringIO()):
+        for offline in (False, True):
+            copy = os.path.join(temp_dir, 'offline' if offline else 'streamed')
+            for name in (data_processing.DATA_NAME, data_processing.PROCESSED_NAME, 'jumps'):
+                os.makedirs(os.path.join(copy, name))
+            if offline:
+                for file_number, raw_bytes in chunks:
+                    with open(os.path.join(copy, data_processing.DATA_NAME, f'{file_number}.bin'), 'wb') as f:
+                        f.write(raw_bytes)
+                data_processing.reprocess_recording(copy)
+            else:
+                pipeline = data_processing.Pipeline(os.path.join(copy, data_processing.DATA_NAME),
+                                                    os.path.join(copy, data_processing.PROCESSED_NAME))
+                for file_number, raw_bytes in chunks:
+                    pipeline.process_chunk(file_number, raw_bytes)
+                data_processing.wait_for_writes()
+            takeoffs.append([jump['takeoff_sample'] for jump in jump_index.list_jumps(os.path.join(copy, 'jumps'))])
+    return tuple(takeoffs)
+
+def compare_jumps(received, expected, tolerance=0):
+    """
+    Matches the takeoffs of received jumps to expected ones.
+
+    Args:
+        received (list): Takeoff samples of the jumps received during the replay.
+        expected (list): Takeoff samples of the reference jumps.
+        tolerance (int): Samples a matching takeoff can be off by.
+
+    Returns:
+        dict: Numbers of matched, missing (expected only) and extra (received only) jumps.
+    """
+
+    unmatched = list(received)
+    matched = 0
+    for takeoff in expected:
+        match = next((t for t in unmatched if abs(t - takeoff) <= tolerance), None)
+        if match is not None:
+            unmatched.remove(match)
+            matched += 1
+    return dict(matched=matched, missing=len(expected) - matched, extra=len(unmatched))
+
+def run_replay(url, recordings, device_count, speed, settle_time=SETTLE_TIME, compare=True):
+    """
+    Replays recordings into the server with several simulated devices at once.
+
+    Args:
+        url (str): Base URL of the server.
+        recordings (list): The recording directories, device i replays recordings[i % len(recordings)].
+        device_count (int): Number of simulated devices.
+        speed (float): Multiple of real time the files are uploaded at, 0 uploads as fast as the server responds.
+        settle_time (float): Seconds to wait for the last files to be processed after the uploads are done.
+        compare (bool): If True the received jumps are compared with the jumps processed without load.
+
+    Returns:
+        dict: The settings, the measurements of every device and their totals.
+    """
+
+    run_id = time.strftime('%Y%m%d%H%M%S')
+    recording_chunks = {recording: load_recording(recording) for recording in recordings}
+    devices = [ReplayDevice(url, f'replay-{run_id}-{i}', recordings[i % len(recordings)],
+                            recording_chunks[recordings[i % len(recordings)]]) for i in range(device_count)]
+
+    listeners = [threading.Thread(target=device.listen, daemon=True) for device in devices]
+    for listener in listeners:
+        listener.start()
+    for device in devices:
+        device.stream_open.wait(REQUEST_TIMEOUT)
+
+    # Devices are spread over the first interval, like devices that were switched on at different times. The start is
+    # delayed a little, as the server only starts sending events once the stream response has begun
+    interval = READINGS_PER_FILE / SAMPLING_RATE / speed if speed > 0 else 0
+    start_time = time.perf_counter() + 0.5
+    uploaders = [threading.Thread(target=device.upload, args=(start_time + interval * i / device_count, interval))
+                 for i, device in enumerate(devices)]
+    for uploader in uploaders:
+        uploader.start()
+    for uploader in uploaders:
+        uploader.join()
+    upload_time = time.perf_counter() - start_time
+
+    deadline = time.perf_counter() + settle_time
+    for device in devices:
+        device.finished.wait(max(0, deadline - time.perf_counter()))
+    processing_time = max((max(device.processed.values()) for device in devices if device.processed),
+                          default=start_time) - start_time
+    for device in devices:
+        device.stop()
+    for listener in listeners:
+        listener.join(1)
+
+    summaries = [device.summary() for device in devices]
+    if compare:
+        references = {recording: reference_jumps(recording) for recording in recordings}
+        for device, summary in zip(devices, summaries):
+            streamed, offline = references[device.recording]
+            takeoffs = [jump['takeoff_sample'] for _, jump in device.jumps]
+            summary['streamed'] = compare_jumps(takeoffs, streamed)
+            summary['offline'] = compare_jumps(takeoffs, offline, TAKEOFF_TOLERANCE)
+
+    file_count = sum(len(device.chunks) for device in devices)
+    uploaded = sum(status == 200 for device in devices for _, status, _ in device.requests)
+    processed = sum(len(device.processed) for device in devices)
+    totals = dict(files=file_count, uploaded=uploaded, processed=processed,
+                  upload_seconds=upload_time, processing_seconds=processing_time,
+                  upload_throughput=uploaded / upload_time if upload_time else 0,
+                  processing_throughput=processed / processing_time if processing_time else 0,
+                  upload_latency=percentiles([s for device in devices for _, _, s in device.requests]),
+                  jump_latency=percentiles([received_time - device.sent_times[jump['last_chunk']]
+                                            for device in devices for received_time, jump in device.jumps
+                                            if jump.get('last_chunk') in device.sent_times]))
+    return dict(time=time.strftime('%Y-%m-%d %H:%M:%S'), machine=platform.node(), url=url, speed=speed,
+                devices=device_count, recordings=[os.path.basename(r) for r in recordings], totals=totals,
+                sessions=summaries)
+
+def format_latency(latency):
+    """
+    Formats a latency summary from percentiles for printing.
+    """
+
+    if not latency['count']:
+        return 'none'
+    return ', '.join(f"{name} {latency[name]:.1f}ms" for name in ('p50', 'p95', 'p99', 'max'))
+
+def print_results(results):
+    """
+    Prints the totals of a replay and the sessions that did not match the reference.
+    """
+
+    totals = results['totals']
+    real_time = totals['processing_throughput'] * READINGS_PER_FILE / SAMPLING_RATE / results['devices']
+    speed = f"{results['speed']}x" if results['speed'] else 'unthrottled'
+    print(f"{results['devices']} devices at {speed}: "
+          f"{totals['uploaded']}/{totals['files']} files accepted, {totals['processed']} processed")
+    print(f"    upload throughput {totals['upload_throughput']:.1f} files/s, processing throughput "
+          f"{totals['processing_throughput']:.1f} files/s ({real_time:.1f}x real time per device)")
+    print(f"    upload latency: {format_latency(totals['upload_latency'])}")
+    print(f"    file to jump latency: {format_latency(totals['jump_latency'])}")
+    for session in results['sessions']:
+        problems = [f"{status} x{count}" for status, count in session['statuses'].items() if status != '200']
+        if session['gaps']:
+            problems.append(f"{session['gaps']} gaps")
+        for reference in ('streamed', 'offline'):
+            comparison = session.get(reference)
+            if comparison and (comparison['missing'] or comparison['extra']):
+                problems.append(f"{comparison['missing']} missing and {comparison['extra']} extra jumps "
+                                f"compared to the {reference} result")
+        if problems:
+            print(f"    {session['session']} ({session['recording']}): " + ', '.join(problems))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recordings into the server with simulated devices.")
+    parser.add_argument('recordings', nargs='*', default=['all'], help="recording directories, or 'all'")
+    parser.add_argument('--url', default=SERVER_URL, help="base URL of the server")
+    parser.add_argument('--devices', type=int, default=1, help="number of devices uploading at once")
+    parser.add_argument('--speed', type=float, default=1, help="multiple of real time, 0 for as fast as possible")
+    parser.add_argument('--settle', type=float, default=SETTLE_TIME, help="seconds to wait for processing to finish")
+    parser.add_argument('--no-compare', action='store_true', help="skip comparing the jumps with the offline result")
+    parser.add_argument('--save', action='store_true', help="save the results as JSON to the benchmarks directory")
+    args = parser.parse_args()
+
+    recordings = args.recordings
+    if recordings == ['all']:
+        recordings = sorted(glob.glob(os.path.join(RECORDINGS_DIR, 'recording_*')))
+    results = run_replay(args.url.rstrip('/'), recordings, args.devices, args.speed, args.settle, not args.no_compare)
+    print_results(results)
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"replay_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved the results to {output_path}")
+    sys.exit(0 if all(session['statuses'].keys() == {'200'} for session in results['sessions']) else 1)
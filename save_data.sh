@@ -22,10 +22,10 @@ number=$(find_lowest_unused_number)
 new_dir="$base_dir/recording_$number"
 mkdir "$new_dir"
 
-# Copy directories into the new directory
+# Copy the jumps into the new directory, raw and processed data are stored in a compressed archive each
 cp -r data/live/jumps "$new_dir/jumps"
-cp -r data/live/raw_data "$new_dir/raw_data"
-cp -r data/live/processed_data "$new_dir/processed_data"
+python recording_archive.py pack data/live "$new_dir"
+python overview_pyramid.py "$new_dir"
 
 echo "Created and set up directory $new_dir"
 
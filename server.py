@@ -1,26 +1,312 @@
-from flask import Flask, request
+from flask import Flask, Response, request
 import os
-from data_processing import process_files
+import time
+import queue
+import atexit
+import argparse
+import threading
+import metrics
+from data_processing import (wait_for_writes, get_pipeline, close_pipeline, is_valid_session, pipelines, set_classifier,
+                             DEFAULT_SESSION, SENSOR_COUNT)
+from filter_data import get_filter
+from jump_classifier import start_classifier
+from live_stream import Broadcaster, KEEPALIVE_INTERVAL
 
 app = Flask(__name__)
 
 BASE_DIR = os.path.dirname(__file__)
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'data/live/raw_data')
+QUEUE_SIZE = 50  # Maximum number of uploaded files of a worker waiting to be processed
+QUEUE_TIMEOUT = 5  # Seconds an upload waits for room in the queue before the server reports it is busy
+WORKER_COUNT = min(8, os.cpu_count() or 1)  # Threads processing uploads, each session is handled by one of them
+EXPIRE_INTERVAL = 0.25  # Seconds between checks for uploads waiting too long for a missing one, see reorder_buffer.py
+SESSION_TIMEOUT = 60  # Seconds without uploads after which the pipeline of a session is closed
+
+# Processed samples and jumps of every session are pushed to the viewers connected to /stream, by session id. A
+# broadcaster only exists while a viewer is connected or the session is uploading
+broadcasters = {}
+broadcasters_lock = threading.Lock()
+
+def get_broadcaster(session_id):
+    """
+    Returns the broadcaster of a session, creating it if there is none.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        Broadcaster: The broadcaster of the session.
+    """
+
+    with broadcasters_lock:
+        broadcaster = broadcasters.get(session_id)
+        if broadcaster is None:
+            broadcaster = broadcasters[session_id] = Broadcaster()
+        return broadcaster
+
+def subscribe(session_id):
+    """
+    Connects a viewer to the broadcaster of a session. The pipeline of the session is not created, a viewer can wait
+    for a session that has not started uploading yet.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        tuple: (broadcaster, subscriber queue), see Broadcaster.subscribe.
+    """
+
+    with broadcasters_lock:
+        broadcaster = broadcasters.get(session_id)
+        if broadcaster is None:
+            broadcaster = broadcasters[session_id] = Broadcaster()
+        return broadcaster, broadcaster.subscribe()
+
+def unsubscribe(session_id, broadcaster, subscriber):
+    """
+    Disconnects a viewer, removing the broadcaster of the session when it was the last one. A pipeline still publishing
+    to the removed broadcaster is connected to a new one with its next upload, see open_session.
+    """
+
+    with broadcasters_lock:
+        broadcaster.unsubscribe(subscriber)
+        if not broadcaster.subscribers and broadcasters.get(session_id) is broadcaster:
+            del broadcasters[session_id]
+
+def open_session(session_id):
+    """
+    Returns the pipeline of a session that is uploading, creating it and its directories the first time, and connects
+    it to the broadcaster of the session.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        Pipeline: The pipeline of the session.
+    """
+
+    pipeline = get_pipeline(session_id)
+    pipeline.publish = get_broadcaster(session_id).publish
+    return pipeline
+
+# Saved jumps are classified in the background, the model is loaded once by the classifier thread
+classifier = start_classifier()
+set_classifier(classifier)
+
+# scipy is imported and the filter designed while the server starts, instead of when the first upload arrives
+threading.Thread(target=get_filter, daemon=True).start()
+
+# Uploaded files waiting to be processed, one queue per worker. All files of a session go to the same worker, so they
+# are processed one at a time and put back in order while different sessions are processed in parallel
+worker_queues = [queue.Queue(maxsize=QUEUE_SIZE) for _ in range(WORKER_COUNT)]
+session_workers = {}  # Index of the worker queue of every session
+session_workers_lock = threading.Lock()
+
+def get_worker_queue(session_id):
+    """
+    Returns the queue of the worker that processes a session. New sessions go to the worker with the fewest sessions.
+
+    Args:
+        session_id (str): The session id.
+
+    Returns:
+        queue.Queue: The queue of the worker.
+    """
+
+    with session_workers_lock:
+        worker_index = session_workers.get(session_id)
+        if worker_index is None:
+            sessions_per_worker = [0] * WORKER_COUNT
+            for index in session_workers.values():
+                sessions_per_worker[index] += 1
+            worker_index = session_workers[session_id] = sessions_per_worker.index(min(sessions_per_worker))
+        return worker_queues[worker_index]
+
+metrics.gauge('processing_queue_depth', 'Uploaded files waiting to be processed.',
+              lambda: sum(work_queue.qsize() for work_queue in worker_queues))
+metrics.gauge('active_sessions', 'Sessions with a pipeline on this server.', lambda: len(pipelines))
+
+chunks_received = metrics.counter('chunks_received_total', 'Files uploaded to /postdata.')
+bytes_received = metrics.counter('bytes_received_total', 'Bytes of the files uploaded to /postdata.')
+uploads_rejected = metrics.counter('uploads_rejected_total', 'Uploads that were not queued for processing, by reason.')
+processing_errors = metrics.counter('processing_errors_total', 'Uploaded files whose processing raised an error.')
+
+def worker_sessions(worker_index):
+    """
+    Returns the ids of the sessions processed by a worker.
+    """
+
+    with session_workers_lock:
+        return [session_id for session_id, index in session_workers.items() if index == worker_index]
+
+def close_session(session_id):
+    """
+    Closes a session that stopped uploading: the files it is still waiting on are processed, and its pipeline and
+    worker are released. A later upload of the session opens it again.
+
+    Args:
+        session_id (str): The session id.
+    """
+
+    # Held while closing, so an upload arriving meanwhile is queued after the pipeline was flushed
+    with session_workers_lock:
+        session_workers.pop(session_id, None)
+        close_pipeline(session_id)
+    print(f"Closed session {session_id} after {SESSION_TIMEOUT}s without uploads")
+
+def processing_worker(worker_index):
+    """
+    Processes uploaded files in the background so uploads do not wait for filtering and jump detection. Uploads can
+    arrive out of order, so in between uploads the sessions of the worker are checked for files that waited too long
+    for a missing one, and sessions that stopped uploading are closed.
+
+    Args:
+        worker_index (int): Index of the queue of this worker.
+    """
+
+    work_queue = worker_queues[worker_index]
+    last_expire_time = time.perf_counter()
+    while True:
+        try:
+            session_id, file_number, raw_bytes, queued_time = work_queue.get(timeout=EXPIRE_INTERVAL)
+        except queue.Empty:
+            session_id = None
+        if session_id is not None:
+            queue_wait = time.perf_counter() - queued_time
+            metrics.observe_stage('queue_wait', queue_wait)
+            try:
+                if file_number is None:
+                    pipeline = pipelines.get(session_id)  # Queued by drain
+                    if pipeline is not None:
+                        pipeline.flush()
+                else:
+                    with metrics.trace_chunk(file_number, session=session_id, queue_wait=queue_wait), \
+                            metrics.timed('process'):
+                        open_session(session_id).receive_chunk(file_number, raw_bytes)
+            except Exception as e:
+                processing_errors.inc()
+                print(f"Error while processing file {file_number} of session {session_id}: {e}")
+            finally:
+                work_queue.task_done()
+
+        if time.perf_counter() - last_expire_time >= EXPIRE_INTERVAL:
+            last_expire_time = time.perf_counter()
+            for expired_session in worker_sessions(worker_index):
+                pipeline = pipelines.get(expired_session)
+                try:
+                    if pipeline is None:
+                        continue
+                    if last_expire_time - pipeline.last_upload_time >= SESSION_TIMEOUT and work_queue.empty():
+                        close_session(expired_session)
+                    else:
+                        pipeline.expire()
+                except Exception as e:
+                    processing_errors.inc()
+                    print(f"Error while processing session {expired_session}: {e}")
+
+def drain():
+    """
+    Blocks until every upload in the queues has been processed and written to disk. Files still waiting for a missing
+    one are processed without it.
+    """
+
+    with session_workers_lock:
+        queued_sessions = list(session_workers.items())
+    for session_id, worker_index in queued_sessions:
+        worker_queues[worker_index].put((session_id, None, None, time.perf_counter()))
+    for work_queue in worker_queues:
+        work_queue.join()
+    if classifier is not None:
+        classifier.wait()
+    wait_for_writes()
+
+workers = [threading.Thread(target=processing_worker, args=(index,), daemon=True) for index in range(WORKER_COUNT)]
+for worker in workers:
+    worker.start()
+atexit.register(drain)  # Finish processing the received files on shutdown
 
 @app.route('/postdata', methods=['POST'])
 def upload_file():
+    """
+    Receives a file of a session. The session id is taken from the 'session' form field or query parameter or the
+    X-Session-Id header, uploads without one belong to the default session in data/live.
+    """
+
+    start_time = time.perf_counter()
+    session_id = (request.form.get('session') or request.args.get('session') or request.headers.get('X-Session-Id')
+                  or DEFAULT_SESSION)
+    if not is_valid_session(session_id):
+        uploads_rejected.inc(reason='session')
+        return f"Invalid session id {session_id}", 400
     file = request.files.get('file')
     if not file:
+        uploads_rejected.inc(reason='missing')
         return "No file part in the request", 400
-    filename = file.filename or "default_name.bin"
-    if filename.startswith("/"):
-        filename = filename[1:]  # Remove leading slash to ensure filenames are relative to UPLOAD_FOLDER
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    print(f"Received and saved file: {filename}")  # Print the name of the file
-    process_files()
+    filename = os.path.basename(file.filename or "")
+    try:
+        file_number = int(os.path.splitext(filename)[0])
+    except ValueError:
+        uploads_rejected.inc(reason='name')
+        return f"Invalid file name {filename}", 400
+
+    # The upload is processed straight from memory, it is written to disk in the background
+    raw_bytes = file.stream.read()
+    if len(raw_bytes) % (SENSOR_COUNT * 6 * 2) != 0:
+        uploads_rejected.inc(reason='size')
+        return f"File {filename} does not contain whole readings", 400
+    print(f"Received file: {filename}")  # Print the name of the file
+    chunks_received.inc()
+    bytes_received.inc(len(raw_bytes))
+    metrics.observe_stage('upload', time.perf_counter() - start_time)
+    try:
+        # Blocks while the queue is full, so a backed up pipeline slows down the uploads instead of growing forever
+        pipeline = open_session(session_id)  # Creates the pipeline of a new session before it is processed
+        with metrics.timed('enqueue'):
+            get_worker_queue(session_id).put((session_id, file_number, raw_bytes, time.perf_counter()),
+                                             timeout=QUEUE_TIMEOUT)
+    except queue.Full:
+        # Keep the data, it is processed in place of the file if the file is given up on, see Pipeline.save_unqueued
+        uploads_rejected.inc(reason='busy')
+        pipeline.save_unqueued(file_number, raw_bytes)
+        return f"File {filename} saved without processing, server is busy", 503
     return f"File {filename} uploaded successfully", 200
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Stage timings, counters and queue depths in the Prometheus text format, see metrics.py.
+    """
+
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stream')
+def stream():
+    """
+    Server-Sent Events stream of the processed samples and jumps of a session, see live_stream.py. The session is
+    selected with the 'session' query parameter, the default session is streamed without one.
+    """
+
+    session_id = request.args.get('session') or DEFAULT_SESSION
+    if not is_valid_session(session_id):
+        return f"Invalid session id {session_id}", 400
+    broadcaster, subscriber = subscribe(session_id)
+
+    def generate():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"  # Lets both sides notice a connection that was lost
+        finally:
+            unsubscribe(session_id, broadcaster, subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receive the data of the sensors and process it live.")
+    parser.add_argument('--trace', help="append the stage times of every file to this trace log, one JSON line each")
+    args = parser.parse_args()
+    if args.trace:
+        metrics.enable_trace(args.trace)
     app.run(host='0.0.0.0', port=5000, debug=True)
-
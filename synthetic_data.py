@@ -0,0 +1,127 @@
+import os
+import numpy as np
+import imu_codec
+
+'''
+Generates synthetic recordings of the five IMUs for benchmarks and tests. The signal imitates skating: gravity on the
+accelerometers, a stroke rhythm on the x-axis acceleration that stays below the takeoff threshold, sensor noise, and
+jumps at known times with a push-off spike, a low-acceleration flight phase with a constant x-axis rotation rate, and
+a landing spike.
+'''
+
+# Constants
+READINGS_PER_FILE = 100
+SENSOR_COUNT = 5
+CHANNELS = SENSOR_COUNT * 6
+SAMPLING_RATE = 100.0  # Hz of IMU sampling
+STROKE_FREQUENCY = 1.2  # Hz of the skating strokes
+STROKE_AMPLITUDE = 0.25  # Gs that the x-axis acceleration varies by while skating
+ACCEL_NOISE = 0.03  # Standard deviation of the accelerometer noise in Gs
+GYRO_NOISE = 2.0  # Standard deviation of the gyroscope noise in deg/second
+PUSH_OFF_ACCELERATION = 7.0  # Gs at takeoff, must be above MINIMUM_TAKEOFF_ACCELERATION of identify_jumps.py
+LANDING_ACCELERATION = 5.0  # Gs at landing
+IN_AIR_ACCELERATION = 0.1  # Gs while airborn
+SPIKE_DURATION = 0.05  # Seconds of the takeoff and landing spikes
+JUMP_AIRTIME = 0.5  # Seconds between takeoff and landing
+JUMP_ROTATION = 720  # Degrees rotated during a jump
+JUMP_INTERVAL = 8.0  # Seconds between jumps
+
+def jump_schedule(duration, interval=JUMP_INTERVAL, rotation=JUMP_ROTATION, airtime=JUMP_AIRTIME):
+    """
+    Places jumps at a regular interval through a session, leaving room for a full jump window at either end.
+
+    Args:
+        duration (float): Length of the session in seconds.
+        interval (float): Seconds between jumps.
+        rotation (float): Degrees rotated during every jump.
+        airtime (float): Seconds between takeoff and landing of every jump.
+
+    Returns:
+        list: (takeoff time in seconds, airtime, rotation) of every jump.
+    """
+
+    return [(t, airtime, rotation) for t in np.arange(interval / 2, duration - interval / 2, interval)]
+
+def generate_session(duration, jumps=None, sampling_rate=SAMPLING_RATE, seed=0):
+    """
+    Generates the raw readings of a session.
+
+    Args:
+        duration (float): Length of the session in seconds.
+        jumps (list): (takeoff time in seconds, airtime, rotation) of every jump, defaults to jump_schedule(duration).
+        sampling_rate (float): Hz of the generated readings.
+        seed (int): Seed of the noise, the same seed gives the same session.
+
+    Returns:
+        tuple: (data, truth). data is the int16 readings of shape (samples, 30), truth is a list of dicts with the
+            takeoff_sample, landing_sample and rotation of every jump.
+    """
+
+    if jumps is None:
+        jumps = jump_schedule(duration)
+    rng = np.random.default_rng(seed)
+    sample_count = int(round(duration * sampling_rate))
+    t = np.arange(sample_count) / sampling_rate
+
+    accel = rng.normal(0, ACCEL_NOISE, (sample_count, SENSOR_COUNT, 3))
+    gyro = rng.normal(0, GYRO_NOISE, (sample_count, SENSOR_COUNT, 3))
+    accel[:, :, 0] += 1 + STROKE_AMPLITUDE * np.sin(2 * np.pi * STROKE_FREQUENCY * t)[:, np.newaxis]
+    accel[:, :, 2] += 0.2  # Sensors are not mounted perfectly level
+
+    spike = max(1, int(round(SPIKE_DURATION * sampling_rate)))
+    truth = []
+    for takeoff_time, airtime, rotation in jumps:
+        takeoff = int(round(takeoff_time * sampling_rate))
+        landing = takeoff + int(round(airtime * sampling_rate))
+        if takeoff - spike < 0 or landing + spike > sample_count:
+            continue
+
+        # Push off, flight and landing of every sensor, the rotation is about the x-axis
+        accel[takeoff - spike + 1:takeoff + 1, :, :2] = PUSH_OFF_ACCELERATION
+        in_air_noise = rng.normal(0, ACCEL_NOISE, (landing - takeoff - 1, SENSOR_COUNT, 3))
+        accel[takeoff + 1:landing, :, :] = IN_AIR_ACCELERATION + in_air_noise
+        accel[landing:landing + spike, :, 0] = LANDING_ACCELERATION
+        gyro[takeoff + 1:landing + 1, :, 0] += rotation / ((landing - takeoff) / sampling_rate)
+        truth.append(dict(takeoff_sample=takeoff, landing_sample=landing, rotation=float(rotation)))
+
+    scaled = np.concatenate([accel, gyro], axis=2).reshape((sample_count, CHANNELS))
+    return imu_codec.to_counts(scaled), truth
+
+def write_session(data, data_dir, readings_per_file=READINGS_PER_FILE):
+    """
+    Splits a session into numbered files, the way the microcontroller uploads them.
+
+    Args:
+        data (numpy.array): The int16 readings of shape (samples, 30).
+        data_dir (str): Directory the files are written to, it is created if needed.
+        readings_per_file (int): Readings in each file, a last partial file is dropped.
+
+    Returns:
+        int: The number of files written.
+    """
+
+    os.makedirs(data_dir, exist_ok=True)
+    file_count = len(data) // readings_per_file
+    for file_number in range(file_count):
+        chunk = data[file_number * readings_per_file:(file_number + 1) * readings_per_file]
+        chunk.tofile(os.path.join(data_dir, f'{file_number}.bin'))
+    return file_count
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic recording as numbered raw data files.")
+    parser.add_argument('output', help="directory the raw data files are written to")
+    parser.add_argument('--duration', type=float, default=60, help="length of the session in seconds")
+    parser.add_argument('--rate', type=float, default=SAMPLING_RATE, help="sampling rate in Hz")
+    parser.add_argument('--rotation', type=float, default=JUMP_ROTATION, help="degrees rotated during every jump")
+    parser.add_argument('--interval', type=float, default=JUMP_INTERVAL, help="seconds between jumps")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data, truth = generate_session(args.duration, jump_schedule(args.duration, args.interval, args.rotation),
+                                   args.rate, args.seed)
+    file_count = write_session(data, args.output)
+    print(f"Wrote {file_count} files with {len(truth)} jumps to {args.output}")
+    for jump in truth:
+        print(f"    takeoff at sample {jump['takeoff_sample']}, landing at sample {jump['landing_sample']}")